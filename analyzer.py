@@ -6,7 +6,7 @@ import os.path
 import sys
 import time
 
-from bitshares_tradehistory_analyzer.ccgains_helper import BagQueue, TradeHistory
+from bitshares_tradehistory_analyzer.ccgains_helper import BagQueue, TradeHistory, TradeStream
 
 logger = logging.getLogger('ccgains')
 logger.setLevel(logging.DEBUG)
@@ -51,31 +51,45 @@ def main():
     parser.add_argument(
         '--short-only', action='store_true', default=False, help='generate only short report (skip detailed report)'
     )
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='read csv files lazily instead of loading them, files must be in chronological order',
+    )
     parser.add_argument('base_currency', help='BASE currency like USD/CNY/RUDEX.BTC')
     parser.add_argument('account', help='bitshares account name')
     args = parser.parse_args()
 
     bf = BagQueue(args.base_currency, None, mode=args.mode)
-    th = TradeHistory()
-    th.append_csv('transfers-{}.csv'.format(args.account))
-    th.append_csv('trades-{}.csv'.format(args.account))
+    csv_files = ['transfers-{}.csv'.format(args.account), 'trades-{}.csv'.format(args.account)]
+    if args.stream:
+        # Trades are loaded lazily, in chunks
+        trades = TradeStream(csv_files)
+    else:
+        th = TradeHistory()
+        th.append_csvs(csv_files)
+        trades = th.tlist
 
     status_filename = 'status-{}-{}-{}.json'.format(args.account, args.mode, args.base_currency)
     if os.path.isfile(status_filename):
         bf.load(status_filename)
 
     last_trade = 0
-    while last_trade < len(th.tlist) and th[last_trade].dtime <= bf._last_date:
-        last_trade += 1
-    if last_trade > 0:
-        logger.info("continuing with trade #%i" % (last_trade + 1))
 
     # Now, the calculation. This goes through your imported list of trades:
-    for i, trade in enumerate(th.tlist[last_trade:]):
+    for num, trade in enumerate(trades, start=1):
+        if num == last_trade + 1:
+            # Skip trades processed already
+            if trade.dtime <= bf._last_date:
+                last_trade += 1
+                continue
+            if last_trade > 0:
+                logger.info("continuing with trade #%i" % num)
+
         # Most of this is just the log output to the console and to the
         # file 'ccgains_<date-time>.log'
         # (check out this file for all gory calculation details!):
-        logger.info('TRADE #%i', i + last_trade + 1)
+        logger.info('TRADE #%i', num)
         logger.info(trade)
 
         # Don't try to process base currency transfers to avoid error from ccgains
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+import argparse
+import glob
+import timeit
+
+from ruamel.yaml import YAML
+
+from bitshares_tradehistory_analyzer import json_decoder
+
+
+def load_responses(pattern):
+    """Load history pages recorded in vcr cassettes"""
+    yaml = YAML(typ="safe")
+    responses = []
+    for filename in sorted(glob.glob(pattern)):
+        with open(filename) as fd:
+            cassette = yaml.load(fd)
+        for interaction in cassette['interactions']:
+            body = interaction['response']['body']['string']
+            if body.startswith('['):
+                responses.append(body.encode())
+    return responses
+
+
+def decode_pages(loads, responses):
+    """Decode pages and operation payloads the same way as downloader does"""
+    result = []
+    for response in responses:
+        for entry in loads(response):
+            history = entry['operation_history']
+            for field in ('op', 'operation_result'):
+                try:
+                    result.append(loads(history[field]))
+                except ValueError:
+                    result.append(None)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare JSON decoders on recorded wrapper responses')
+    parser.add_argument('-n', '--number', type=int, default=1000, help='number of runs')
+    parser.add_argument('--cassettes', default='tests/cassettes/*/*.yaml', help='glob pattern of vcr cassettes')
+    args = parser.parse_args()
+
+    responses = load_responses(args.cassettes)
+    entries = sum(len(json_decoder.DECODERS['json'](response)) for response in responses)
+    print('{} pages, {} entries, {} bytes'.format(len(responses), entries, sum(map(len, responses))))
+
+    reference = decode_pages(json_decoder.DECODERS['json'], responses)
+    baseline = None
+    for name, loads in json_decoder.DECODERS.items():
+        assert decode_pages(loads, responses) == reference, 'decoder {} gives different result'.format(name)
+        elapsed = timeit.timeit(lambda: decode_pages(loads, responses), number=args.number)
+        baseline = baseline or elapsed
+        print('{:>8}: {:.3f}ms per run, {:.2f}x'.format(name, elapsed / args.number * 1000, baseline / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+from bitshares.account import Account
+from bitshares.amount import Amount
+from bitshares.asset import Asset
+
+log = logging.getLogger(__name__)
+
+# Max number of object ids in single get_objects call
+GET_OBJECTS_BATCH_SIZE = 100
+
+
+def get_objects(bitshares_instance, object_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+    """Fetch several objects from the node using batched `get_objects` calls"""
+    objects = []
+    for start in range(0, len(object_ids), GET_OBJECTS_BATCH_SIZE):
+        end = start + GET_OBJECTS_BATCH_SIZE
+        objects.extend(bitshares_instance.rpc.get_objects(object_ids[start:end]))
+    return objects
+
+
+class LRUCache:
+    """Bounded in-memory cache of chain objects
+
+    In offline mode cache is filled from a snapshot with :meth:`load` and never queries the node.
+
+    :param BitShares bitshares_instance:
+    :param int maxsize: max number of objects in memory
+    """
+
+    def __init__(self, bitshares_instance, maxsize: int = 1024):
+        self.bitshares = bitshares_instance
+        self.maxsize = maxsize
+        self.offline = False
+        # Number of node requests made
+        self.lookups = 0
+        self._cache: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, object_id: str) -> bool:
+        return object_id in self._cache
+
+    def _get_cached(self, object_id: str) -> Optional[Dict[str, Any]]:
+        obj = self._cache.get(object_id)
+        if obj is not None:
+            self._cache.move_to_end(object_id)
+        return obj
+
+    def _put(self, obj: Dict[str, Any]):
+        self._cache[obj['id']] = obj
+        self._cache.move_to_end(obj['id'])
+        if not self.offline and len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def _fetch(self, object_id: str) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def _make(self, obj: Dict[str, Any]) -> Dict[str, Any]:
+        """Strip raw chain object to the fields kept in cache"""
+        raise NotImplementedError
+
+    def _on_fetched(self, obj: Dict[str, Any]):
+        """Hook called for every object fetched from the node"""
+
+    def _load_missing(self, object_ids: List[str]) -> List[str]:
+        """Hook to load objects from secondary storage, returns ids which are still missing"""
+        return object_ids
+
+    def get(self, object_id: str) -> Dict[str, Any]:
+        with self._lock:
+            obj = self._get_cached(object_id)
+            if obj is not None:
+                return obj
+            if self.offline:
+                raise KeyError('Object {} not found in snapshot'.format(object_id))
+            if self._load_missing([object_id]):
+                log.debug('Looking up object {}'.format(object_id))
+                self.lookups += 1
+                obj = self._make(self._fetch(object_id))
+                self._on_fetched(obj)
+                self._put(obj)
+            return self._cache[object_id]
+
+    def prefetch(self, object_ids: Iterable[str]):
+        """Resolve all not yet cached objects using single batched node request
+
+        :param object_ids: ids of objects which will be needed soon
+        """
+        if self.offline:
+            return
+        with self._lock:
+            missing = self._load_missing(sorted({object_id for object_id in object_ids if object_id not in self}))
+            if not missing:
+                return
+            log.debug('Prefetching {} objects'.format(len(missing)))
+            self.lookups += 1
+            for obj in get_objects(self.bitshares, missing):
+                # Unknown ids are left to regular lookup to raise proper error
+                if obj is not None:
+                    obj = self._make(obj)
+                    self._on_fetched(obj)
+                    self._put(obj)
+
+    def load(self, objects: Iterable[Dict[str, Any]]):
+        """Switch cache to offline mode and fill it with objects from snapshot"""
+        with self._lock:
+            self.offline = True
+            for obj in objects:
+                self._put(self._make(obj))
+
+    def dump(self) -> List[Dict[str, Any]]:
+        """Get all cached objects"""
+        with self._lock:
+            return sorted(self._cache.values(), key=lambda obj: obj['id'])
+
+
+class AssetCache(LRUCache):
+    """Asset metadata cache
+
+    Asset symbol and precision never change, so they are fetched from the node once and then kept in memory (LRU) and
+    in optional sqlite database which survives across runs.
+
+    :param BitShares bitshares_instance:
+    :param str filename: path to sqlite database, None to keep cache in memory only
+    :param int maxsize: max number of assets in memory
+    """
+
+    def __init__(self, bitshares_instance, filename: Optional[str] = None, maxsize: int = 1024):
+        super().__init__(bitshares_instance, maxsize=maxsize)
+        self._db = None
+        if filename is not None:
+            self._db = sqlite3.connect(filename, check_same_thread=False)
+            self._db.execute('CREATE TABLE IF NOT EXISTS assets (id TEXT PRIMARY KEY, symbol TEXT, precision INTEGER)')
+            self._db.commit()
+
+    def _load(self, asset_id: str) -> Optional[Dict[str, Any]]:
+        if self._db is None:
+            return None
+        row = self._db.execute('SELECT symbol, precision FROM assets WHERE id = ?', (asset_id,)).fetchone()
+        if row is None:
+            return None
+        return {'id': asset_id, 'symbol': row[0], 'precision': row[1]}
+
+    def _load_missing(self, asset_ids: List[str]) -> List[str]:
+        missing = []
+        for asset_id in asset_ids:
+            asset = self._load(asset_id)
+            if asset is None:
+                missing.append(asset_id)
+            else:
+                self._put(asset)
+        return missing
+
+    def _on_fetched(self, asset: Dict[str, Any]):
+        if self._db is None:
+            return
+        self._db.execute(
+            'INSERT OR REPLACE INTO assets VALUES (?, ?, ?)', (asset['id'], asset['symbol'], asset['precision'])
+        )
+        self._db.commit()
+
+    def _fetch(self, asset_id: str) -> Dict[str, Any]:
+        return Asset(asset_id, bitshares_instance=self.bitshares)
+
+    def _make(self, obj: Dict[str, Any]) -> Dict[str, Any]:
+        return {'id': obj['id'], 'symbol': obj['symbol'], 'precision': obj['precision']}
+
+    def dump(self) -> List[Dict[str, Any]]:
+        assets = {asset['id']: asset for asset in super().dump()}
+        if self._db is not None:
+            for asset_id, symbol, precision in self._db.execute('SELECT id, symbol, precision FROM assets'):
+                assets.setdefault(asset_id, {'id': asset_id, 'symbol': symbol, 'precision': precision})
+        return sorted(assets.values(), key=lambda asset: asset['id'])
+
+    def get(self, asset_id: str) -> Dict[str, Any]:
+        """Get asset metadata
+
+        :param str asset_id: asset id in 1.3.x form
+        :return: dict with `id`, `symbol` and `precision` keys
+        """
+        return super().get(asset_id)
+
+    def amount(self, amount: Dict[str, Any]) -> Amount:
+        """Get Amount object without node lookups
+
+        :param dict amount: raw amount, dict with `amount` and `asset_id` keys
+        """
+        asset = self.get(amount['asset_id'])
+        return Amount(
+            amount=int(amount['amount']) / 10 ** asset['precision'],
+            asset=dict(asset),
+            bitshares_instance=self.bitshares,
+        )
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+class AccountCache(LRUCache):
+    """Account names cache
+
+    :param BitShares bitshares_instance:
+    :param int maxsize: max number of accounts in memory
+    """
+
+    def __init__(self, bitshares_instance, maxsize: int = 10000):
+        super().__init__(bitshares_instance, maxsize=maxsize)
+
+    def _fetch(self, account_id: str) -> Dict[str, Any]:
+        return Account(account_id, bitshares_instance=self.bitshares)
+
+    def _make(self, obj: Dict[str, Any]) -> Dict[str, Any]:
+        return {'id': obj['id'], 'name': obj['name']}
+
+    def name(self, account_id: str) -> str:
+        """Get account name by id
+
+        :param str account_id: account id in 1.2.x form
+        """
+        if self.offline and account_id not in self:
+            # Names are used for logging only, so missing ones are not fatal
+            return account_id
+        return self.get(account_id)['name']
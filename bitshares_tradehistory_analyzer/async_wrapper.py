@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import time
+from json.decoder import JSONDecodeError
+
+import aiohttp
+
+from bitshares_tradehistory_analyzer import json_decoder
+from bitshares_tradehistory_analyzer.wrapper import RETRY_STATUS_CODES, BaseWrapper
+
+log = logging.getLogger(__name__)
+
+
+class AsyncWrapper(BaseWrapper):
+    """Asyncio client for bitshares elasticsearch wrapper
+
+    Provides the same API as :class:`~bitshares_tradehistory_analyzer.wrapper.Wrapper`, but query methods are
+    coroutines. Must be used as async context manager, which opens connection pool and detects wrapper version:
+
+    .. code-block:: python
+
+        async with AsyncWrapper(url, account_id) as wrapper:
+            trades = await wrapper.get_trades(from_date='2020-01-01')
+
+    :param int pool_size: max number of simultaneous connections
+
+    See :class:`~bitshares_tradehistory_analyzer.wrapper.BaseWrapper` for the rest of params.
+    """
+
+    def __init__(self, url, account_id, size=200, pool_size=10, **kwargs):
+        super().__init__(url, account_id, size=size, **kwargs)
+        self.pool_size = pool_size
+        self.session = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        connector = aiohttp.TCPConnector(limit=self.pool_size)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        await self.detect_version()
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def _request(self, url, payload):
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async()
+            start = time.monotonic()
+            error = True
+            try:
+                async with self.session.get(url, params=payload) as response:
+                    # Throw an exception if response was not 200
+                    response.raise_for_status()
+                    body = await response.text()
+                error = False
+            except aiohttp.ClientResponseError as e:
+                if e.status not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                    raise
+                log.warning('Got {} from {}, retrying'.format(e.status, url))
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt == self.max_retries:
+                    raise
+                log.warning('Request to {} failed: {}, retrying'.format(url, e))
+            finally:
+                latency = time.monotonic() - start
+                self.stats.add(latency, error=error)
+                log.debug('Request to {} took {:.3f}s'.format(url, latency))
+
+            if not error:
+                break
+            self._observe(payload, None, latency, 0, error=True)
+            self.stats.add_retry()
+            await asyncio.sleep(self._backoff(attempt))
+
+        try:
+            result = json_decoder.loads(body)
+        except JSONDecodeError:
+            print(str(response))
+            raise
+        self._observe(payload, result, latency, len(body))
+        return result
+
+    async def detect_version(self):
+        params = {'size': 1, 'account_id': '1.2.22'}
+        try:
+            await self._query(params)
+        except aiohttp.ClientResponseError as e:
+            if e.status == 404:
+                self.version = 2
+
+    async def _query(self, params, *args, **kwargs):
+        url, payload = self._build_query(params, **kwargs)
+        result = await self._request(url, payload)
+        self._save_page(url, payload, result)
+        return result
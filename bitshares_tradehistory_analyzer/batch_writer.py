@@ -0,0 +1,115 @@
+import logging
+import os
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple, Union
+
+from bitshares_tradehistory_analyzer.checkpoint import Checkpoint, save_checkpoint
+
+log = logging.getLogger(__name__)
+
+
+def drop_torn_line(filename: Union[str, Path]) -> bool:
+    """Truncate incomplete last line left by interrupted write
+
+    :param filename: csv file
+    :return: True if file was truncated
+    """
+    if not os.path.isfile(filename):
+        return False
+    with open(filename, 'r+b') as fd:
+        end = fd.seek(0, os.SEEK_END)
+        if end == 0:
+            return False
+        pos = end
+        while pos > 0:
+            step = min(4096, pos)
+            fd.seek(pos - step)
+            chunk = fd.read(step)
+            eol = chunk.rfind(b'\n')
+            if eol != -1:
+                pos = pos - step + eol + 1
+                break
+            pos -= step
+        if pos == end:
+            return False
+        log.warning('Dropping incomplete last line of {}'.format(filename))
+        fd.truncate(pos)
+    return True
+
+
+class BatchWriter:
+    """Appends lines to csv file in batches
+
+    Lines are buffered in memory and written with a single write followed by fsync, then the checkpoint of the last
+    written page is saved. So the checkpoint never points past data which is not on disk yet, and anything written
+    after it, e.g. a torn line, is discarded on resume.
+
+    :param filename: csv file
+    :param int flush_rows: flush when at least this number of lines is buffered, 0 to flush after every page
+    :param bool fsync: fsync file after each flush
+    """
+
+    def __init__(self, filename: Union[str, Path], flush_rows: int = 0, fsync: bool = True):
+        self.filename = filename
+        self.flush_rows = flush_rows
+        self.fsync = fsync
+        self.flushes = 0
+        self._fd = open(filename, 'ab')
+        self._buffer: List[bytes] = []
+        self._rows = 0
+        self._buffered = 0
+        # Checkpoint of the last buffered page and its end offset within the buffer
+        self._checkpoint: Optional[Tuple[Checkpoint, int]] = None
+
+    def write(self, lines: Iterable[str], checkpoint: Optional[Checkpoint] = None):
+        """Buffer lines of a page
+
+        :param lines: csv lines
+        :param Checkpoint checkpoint: continuation point after these lines, if any
+        """
+        lines = list(lines)
+        if lines:
+            data = ''.join(lines).encode('utf-8')
+            self._buffer.append(data)
+            self._rows += len(lines)
+            self._buffered += len(data)
+        if checkpoint is not None:
+            self._checkpoint = (checkpoint, self._buffered)
+        if self._rows >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        """Write buffered lines to disk and save the checkpoint"""
+        if not self._buffer and self._checkpoint is None:
+            return
+        start = self._fd.tell()
+        if self._buffer:
+            self._fd.write(b''.join(self._buffer))
+            self._fd.flush()
+            if self.fsync:
+                os.fsync(self._fd.fileno())
+            self.flushes += 1
+        if self._checkpoint is not None:
+            checkpoint, offset = self._checkpoint
+            checkpoint.size = start + offset
+            save_checkpoint(self.filename, checkpoint)
+        self._buffer = []
+        self._rows = 0
+        self._buffered = 0
+        self._checkpoint = None
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._fd.close()
+
+    def __enter__(self) -> 'BatchWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # Keep buffered lines out of the file, they are not covered by checkpoint anyway
+            self._fd.close()
@@ -1,3 +1,4 @@
+import heapq
 import logging
 from decimal import Decimal
 from enum import Enum
@@ -8,8 +9,19 @@ from ccgains import reports
 from ccgains.bags import is_short_term
 from dateutil import tz
 
+from bitshares_tradehistory_analyzer.csv_loader import (
+    TRADE_COLUMNS,
+    is_vectorizable,
+    iter_trades_frames,
+    load_trades_frame,
+)
+from bitshares_tradehistory_analyzer.merge import ensure_sorted, merge_sorted
+
 log = logging.getLogger('ccgains')
 
+# Number of rows loaded at once by TradeStream
+DEFAULT_CHUNKSIZE = 10000
+
 
 class TradeKind(Enum):
     DEPOSIT = "Deposit"
@@ -39,6 +51,36 @@ def _parse_trade(str_list, param_locs, default_timezone):
     return Trade(default_timezone=default_timezone, **pdict)
 
 
+def _to_decimal(amount):
+    """Convert amount the same way as Trade does"""
+    return Decimal(amount) if amount else Decimal()
+
+
+def trades_from_frame(frame, default_timezone=None):
+    """Make Trade objects from rows of :func:`~bitshares_tradehistory_analyzer.csv_loader.load_trades_frame`
+
+    Amounts are converted into Decimal once per column, and already parsed UTC dates are used as is, so trades are
+    made without parsing values again.
+
+    :param pandas.DataFrame frame: loaded trades, dates are already converted to UTC
+    :return: iterator over trades
+    """
+    if not len(frame):
+        return
+    if not isinstance(frame['dtime'].iloc[0], pd.Timestamp):
+        # Dates are not parsed by loader, e.g. they are set by param_locs, so let Trade handle them
+        for row in frame.itertuples(index=False, name=None):
+            yield Trade(*row, default_timezone=default_timezone)
+        return
+
+    columns = [frame[name].tolist() for name in TRADE_COLUMNS]
+    for name in ('buy_amount', 'sell_amount'):
+        position = TRADE_COLUMNS.index(name)
+        columns[position] = [_to_decimal(amount) for amount in columns[position]]
+    for row in zip(*columns):
+        yield Trade.from_parsed(*row)
+
+
 class Trade(ccgains.Trade):
     """Override handling of fee currency for bitshares"""
 
@@ -57,16 +99,76 @@ class Trade(ccgains.Trade):
         comment='',
         default_timezone=None,
     ):
-        self.kind = kind
-        if buy_amount:
-            self.buyval = Decimal(buy_amount)
+        self._set_values(
+            kind,
+            buy_currency,
+            _to_decimal(buy_amount),
+            sell_currency,
+            _to_decimal(sell_amount),
+            fee_currency,
+            fee_amount,
+            exchange,
+            mark,
+            comment,
+        )
+        # save the time as pandas.Timestamp object:
+        if isinstance(dtime, (float, int)):
+            # unix timestamp
+            self.dtime = pd.Timestamp(dtime, unit='s').tz_localize('UTC')
         else:
-            self.buyval = Decimal()
+            self.dtime = pd.Timestamp(dtime)
+        # add default timezone if not included:
+        if self.dtime.tzinfo is None:
+            self.dtime = self.dtime.tz_localize(tz.tzlocal() if default_timezone is None else default_timezone)
+        # internally, dtime is saved as UTC time:
+        self.dtime = self.dtime.tz_convert('UTC')
+        self._check_fee(buy_currency, sell_currency)
+
+    @classmethod
+    def from_parsed(
+        cls,
+        kind,
+        dtime,
+        buy_currency,
+        buy_amount,
+        sell_currency,
+        sell_amount,
+        fee_currency='',
+        fee_amount=0,
+        exchange='',
+        mark='',
+        comment='',
+    ):
+        """Make trade from already converted values, skipping parsing done by constructor
+
+        :param pandas.Timestamp dtime: time in UTC
+        :param Decimal buy_amount: amount converted the same way as constructor does
+        :param Decimal sell_amount: amount converted the same way as constructor does
+        """
+        trade = cls.__new__(cls)
+        trade._set_values(
+            kind,
+            buy_currency,
+            buy_amount,
+            sell_currency,
+            sell_amount,
+            fee_currency,
+            fee_amount,
+            exchange,
+            mark,
+            comment,
+        )
+        trade.dtime = dtime
+        trade._check_fee(buy_currency, sell_currency)
+        return trade
+
+    def _set_values(
+        self, kind, buy_currency, buyval, sell_currency, sellval, fee_currency, fee_amount, exchange, mark, comment
+    ):
+        self.kind = kind
+        self.buyval = buyval
         self.buycur = buy_currency
-        if sell_amount:
-            self.sellval = Decimal(sell_amount)
-        else:
-            self.sellval = Decimal()
+        self.sellval = sellval
         self.sellcur = sell_currency
         if self.sellval < 0 and self.buyval < 0:
             raise ValueError('Ambiguity: Only one of buy_amount or ' 'sell_amount may be negative')
@@ -88,18 +190,8 @@ class Trade(ccgains.Trade):
         self.exchange = exchange
         self.mark = mark
         self.comment = comment
-        # save the time as pandas.Timestamp object:
-        if isinstance(dtime, (float, int)):
-            # unix timestamp
-            self.dtime = pd.Timestamp(dtime, unit='s').tz_localize('UTC')
-        else:
-            self.dtime = pd.Timestamp(dtime)
-        # add default timezone if not included:
-        if self.dtime.tzinfo is None:
-            self.dtime = self.dtime.tz_localize(tz.tzlocal() if default_timezone is None else default_timezone)
-        # internally, dtime is saved as UTC time:
-        self.dtime = self.dtime.tz_convert('UTC')
 
+    def _check_fee(self, buy_currency, sell_currency):
         if self.feeval > 0 and self.feecur != buy_currency and self.feecur != sell_currency:
             # Pretend there is no fee
             # TODO: implement more elegant solution
@@ -108,7 +200,7 @@ class Trade(ccgains.Trade):
 
 
 class TradeHistory(ccgains.TradeHistory):
-    def append_csv(
+    def load_csv(
         self,
         file_name,
         param_locs=range(11),  # noqa: B008 - we're using similar interface as in ccgains
@@ -116,26 +208,114 @@ class TradeHistory(ccgains.TradeHistory):
         skiprows=1,
         default_timezone=None,
     ):
-        """1-1 copy from ccgains"""
-        with open(file_name) as f:
-            csvlines = f.readlines()
+        """Load trades from csv file, csv is parsed by :func:`load_trades_frame` unless `param_locs` has callables
 
+        :return: list of trades in file order
+        """
         if default_timezone is None:
             default_timezone = tz.tzlocal()
 
-        numtrades = len(self.tlist)
+        if is_vectorizable(param_locs):
+            frame = load_trades_frame(
+                file_name,
+                param_locs=param_locs,
+                delimiter=delimiter,
+                skiprows=skiprows,
+                default_timezone=default_timezone,
+            )
+            trades = list(trades_from_frame(frame, default_timezone))
+        else:
+            with open(file_name) as f:
+                csvlines = f.readlines()
+
+            # convert input lines to Trades:
+            trades = []
+            for csvline in csvlines[skiprows:]:
+                line = csvline.split(delimiter)
+                if not line:
+                    # ignore empty lines
+                    continue
+                trades.append(_parse_trade(line, param_locs, default_timezone))
+
+        log.info("Loaded %i transactions from %s", len(trades), file_name)
+        return trades
+
+    def append_csv(
+        self,
+        file_name,
+        param_locs=range(11),  # noqa: B008 - we're using similar interface as in ccgains
+        delimiter=',',
+        skiprows=1,
+        default_timezone=None,
+    ):
+        """Same as in ccgains, but trades are merged into already loaded ones instead of sorting all of them"""
+        self.append_csvs([file_name], param_locs, delimiter, skiprows, default_timezone)
+
+    def append_csvs(
+        self,
+        file_names,
+        param_locs=range(11),  # noqa: B008 - we're using similar interface as in ccgains
+        delimiter=',',
+        skiprows=1,
+        default_timezone=None,
+    ):
+        """Load several csv files at once
+
+        Files written by download_history.py are in chronological order already, so they are merged with loaded
+        trades in a single pass. Only files which are out of order get sorted.
+
+        :param list file_names: csv files
+        """
+        files = [self.load_csv(name, param_locs, delimiter, skiprows, default_timezone) for name in file_names]
+        # trades must be sorted, order of trades with equal keys is the same as with sort after every file
+        self.tlist[:] = merge_sorted([self.tlist] + files, key=self._trade_sort_key)
+
+
+class TradeStream:
+    """Trades of several csv files merged in time order, loaded lazily
+
+    Unlike :class:`TradeHistory`, only a chunk of every file is kept in memory, so files must be in chronological
+    order, as they are written by download_history.py. The stream can be iterated over several times, files are read
+    again each time.
 
-        # convert input lines to Trades:
-        for csvline in csvlines[skiprows:]:
-            line = csvline.split(delimiter)
-            if not line:
-                # ignore empty lines
-                continue
-            self.tlist.append(_parse_trade(line, param_locs, default_timezone))
+    :param list file_names: csv files
+    :param int chunksize: number of rows loaded from a file at once
+    :raises ValueError: during iteration, if a file is not in chronological order
+    """
+
+    def __init__(
+        self,
+        file_names,
+        param_locs=range(11),  # noqa: B008 - we're using similar interface as in ccgains
+        delimiter=',',
+        skiprows=1,
+        default_timezone=None,
+        chunksize=DEFAULT_CHUNKSIZE,
+    ):
+        self.file_names = list(file_names)
+        self.param_locs = param_locs
+        self.delimiter = delimiter
+        self.skiprows = skiprows
+        self.default_timezone = tz.tzlocal() if default_timezone is None else default_timezone
+        self.chunksize = chunksize
+        # Same order as in TradeHistory
+        self.key = TradeHistory()._trade_sort_key
+
+    def _iter_file(self, file_name):
+        frames = iter_trades_frames(
+            file_name,
+            param_locs=self.param_locs,
+            delimiter=self.delimiter,
+            skiprows=self.skiprows,
+            default_timezone=self.default_timezone,
+            chunksize=self.chunksize,
+        )
+        for frame in frames:
+            yield from trades_from_frame(frame, self.default_timezone)
 
-        log.info("Loaded %i transactions from %s", len(self.tlist) - numtrades, file_name)
-        # trades must be sorted:
-        self.tlist.sort(key=self._trade_sort_key, reverse=False)
+    def __iter__(self):
+        files = [ensure_sorted(self._iter_file(name), self.key, name) for name in self.file_names]
+        return heapq.merge(*files, key=self.key)
 
 
 class BagQueue(ccgains.BagQueue):
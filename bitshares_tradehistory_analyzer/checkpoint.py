@@ -0,0 +1,103 @@
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from bitshares_tradehistory_analyzer.parsed_op import ParsedOp
+
+log = logging.getLogger(__name__)
+
+# Fields of pending trade which are kept as strings to preserve exact Decimal values
+_DECIMAL_FIELDS = ('buy_amount', 'sell_amount', 'fee_amount', 'price', 'price_inverted')
+
+
+@dataclass
+class Checkpoint:
+    """Continuation point of output csv file
+
+    :param str from_date: block time of the last processed entry
+    :param str last_op_id: id of the last processed operation
+    :param int sequence: `account_history.sequence` of the last processed entry
+    :param int size: csv file size in bytes, everything past it was written after the checkpoint
+    :param dict pending: aggregated trade which is not finished yet, it's not included into `size`
+    """
+
+    from_date: str
+    last_op_id: str
+    sequence: Optional[int] = None
+    size: int = 0
+    pending: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_entry(cls, entry: Dict[str, Any]) -> 'Checkpoint':
+        """Make checkpoint pointing right after wrapper entry"""
+        return cls(
+            from_date=entry['block_data']['block_time'],
+            last_op_id=entry['account_history']['operation_id'],
+            sequence=entry['account_history'].get('sequence'),
+        )
+
+    def set_pending(self, trade: Optional[ParsedOp]):
+        if trade is None:
+            self.pending = None
+            return
+        self.pending = trade.as_dict()
+        for name in _DECIMAL_FIELDS:
+            self.pending[name] = str(self.pending[name])
+
+    def pending_trade(self) -> Optional[ParsedOp]:
+        if self.pending is None:
+            return None
+        data = dict(self.pending)
+        for name in _DECIMAL_FIELDS:
+            data[name] = Decimal(data[name])
+        return ParsedOp(**data)
+
+
+def checkpoint_path(filename: Union[str, Path]) -> Path:
+    """Get sidecar checkpoint file of csv file"""
+    return Path('{}.checkpoint'.format(filename))
+
+
+def save_checkpoint(filename: Union[str, Path], checkpoint: Checkpoint):
+    """Atomically replace checkpoint of csv file
+
+    :param filename: csv file
+    :param Checkpoint checkpoint:
+    """
+    path = checkpoint_path(filename)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w') as fd:
+        json.dump(asdict(checkpoint), fd)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(filename: Union[str, Path]) -> Optional[Checkpoint]:
+    """Load checkpoint of csv file
+
+    :param filename: csv file
+    :return: checkpoint, or None if there is no valid checkpoint for the file
+    """
+    path = checkpoint_path(filename)
+    if not path.is_file():
+        return None
+    try:
+        with open(path) as fd:
+            checkpoint = Checkpoint(**json.load(fd))
+    except (ValueError, TypeError):
+        log.warning('Ignoring broken checkpoint {}'.format(path))
+        return None
+    if not os.path.isfile(filename) or os.path.getsize(filename) < checkpoint.size:
+        log.warning('Checkpoint {} is ahead of {}, ignoring it'.format(path, filename))
+        return None
+    return checkpoint
+
+
+def remove_checkpoint(filename: Union[str, Path]):
+    try:
+        checkpoint_path(filename).unlink()
+    except FileNotFoundError:
+        pass
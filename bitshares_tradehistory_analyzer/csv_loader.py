@@ -0,0 +1,144 @@
+import csv
+import logging
+from typing import Any, Dict, Iterable, Iterator, Optional, Union
+
+import pandas as pd
+from dateutil import tz
+
+log = logging.getLogger(__name__)
+
+# Trade constructor arguments in ccGains csv columns order
+TRADE_COLUMNS = (
+    'kind',
+    'dtime',
+    'buy_currency',
+    'buy_amount',
+    'sell_currency',
+    'sell_amount',
+    'fee_currency',
+    'fee_amount',
+    'exchange',
+    'mark',
+    'comment',
+)
+
+# Format of dates written by download_history.py
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+# Characters stripped from every field, the same as ccgains does
+STRIP_CHARS = '" \n\t'
+
+
+def _param_locs_dict(param_locs: Union[Iterable[Any], Dict[str, Any]]) -> Dict[str, Any]:
+    if isinstance(param_locs, dict):
+        return param_locs
+    return {TRADE_COLUMNS[i]: loc for i, loc in enumerate(param_locs)}
+
+
+def is_vectorizable(param_locs: Union[Iterable[Any], Dict[str, Any]]) -> bool:
+    """Check whether columns mapping can be loaded by :func:`load_trades_frame`, callables need the whole line"""
+    return not any(callable(value) for value in _param_locs_dict(param_locs).values())
+
+
+def _parse_dates(dates: pd.Series, default_timezone) -> pd.Series:
+    """Convert date strings into UTC timestamps, naive dates are in `default_timezone`"""
+    try:
+        parsed = pd.to_datetime(dates, format=DATE_FORMAT)
+    except ValueError:
+        parsed = None
+    if parsed is not None:
+        return parsed.dt.tz_localize(default_timezone).dt.tz_convert('UTC')
+
+    # Dates in other formats or with timezone are parsed one by one, the same way as Trade does
+    def parse(value: str) -> pd.Timestamp:
+        dtime = pd.Timestamp(value)
+        if dtime.tzinfo is None:
+            dtime = dtime.tz_localize(default_timezone)
+        return dtime.tz_convert('UTC')
+
+    uniques = dates.unique()
+    parsed_uniques = pd.Series([parse(value) for value in uniques], index=uniques)
+    return dates.map(parsed_uniques)
+
+
+def _make_frame(raw: pd.DataFrame, locs: Dict[str, Any], default_timezone) -> pd.DataFrame:
+    frame = pd.DataFrame(index=raw.index)
+    for name in TRADE_COLUMNS:
+        value = locs.get(name, -1)
+        if isinstance(value, int) and value == -1:
+            frame[name] = ''
+        elif isinstance(value, int):
+            frame[name] = raw[value].str.strip(STRIP_CHARS)
+        else:
+            frame[name] = value
+
+    dtime_loc = locs.get('dtime', -1)
+    if len(frame) and isinstance(dtime_loc, int) and dtime_loc != -1:
+        frame['dtime'] = _parse_dates(frame['dtime'], default_timezone)
+    return frame
+
+
+def iter_trades_frames(
+    file_name: str,
+    param_locs: Union[Iterable[Any], Dict[str, Any]] = range(11),  # noqa: B008 - same interface as ccgains
+    delimiter: str = ',',
+    skiprows: int = 1,
+    default_timezone=None,
+    chunksize: Optional[int] = None,
+) -> Iterator[pd.DataFrame]:
+    """Load ccGains csv file in chunks
+
+    Fields are kept as strings, so amounts can be converted into Decimal without precision loss. Dates are parsed
+    as a whole column into UTC timestamps.
+
+    :param str file_name: csv file
+    :param param_locs: column number of every Trade argument, or dict of argument name to column number; -1 means
+        empty value, other non-integer values are used as is
+    :param str delimiter: csv fields delimiter
+    :param int skiprows: number of header lines
+    :param default_timezone: timezone of dates without timezone, local timezone by default
+    :param int chunksize: max number of rows in a chunk, whole file is loaded at once if not set
+    :return: iterator over DataFrames with :data:`TRADE_COLUMNS` columns
+    """
+    locs = _param_locs_dict(param_locs)
+    if not is_vectorizable(locs):
+        raise ValueError('Callable column mappings are not supported')
+    if default_timezone is None:
+        default_timezone = tz.tzlocal()
+
+    try:
+        reader = pd.read_csv(
+            file_name,
+            sep=delimiter,
+            header=None,
+            skiprows=skiprows,
+            dtype=str,
+            na_filter=False,
+            quoting=csv.QUOTE_NONE,
+            skip_blank_lines=True,
+            chunksize=chunksize,
+        )
+    except pd.errors.EmptyDataError:
+        # Nothing but header
+        log.debug('No rows in {}'.format(file_name))
+        return
+    chunks = [reader] if chunksize is None else reader
+    for raw in chunks:
+        yield _make_frame(raw, locs, default_timezone)
+
+
+def load_trades_frame(
+    file_name: str,
+    param_locs: Union[Iterable[Any], Dict[str, Any]] = range(11),  # noqa: B008 - same interface as ccgains
+    delimiter: str = ',',
+    skiprows: int = 1,
+    default_timezone=None,
+) -> pd.DataFrame:
+    """Load ccGains csv file in one pass, see :func:`iter_trades_frames` for params
+
+    :return: DataFrame with :data:`TRADE_COLUMNS` columns
+    """
+    frames = list(iter_trades_frames(file_name, param_locs, delimiter, skiprows, default_timezone))
+    frame = frames[0] if frames else pd.DataFrame(columns=list(TRADE_COLUMNS))
+    log.debug('Loaded {} rows from {}'.format(len(frame), file_name))
+    return frame
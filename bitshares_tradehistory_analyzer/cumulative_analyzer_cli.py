@@ -3,7 +3,7 @@
 import click
 import pandas as pd
 
-from bitshares_tradehistory_analyzer.cumulative_trade_analyzer import CumulativeAnalyzer
+from bitshares_tradehistory_analyzer.cumulative_trade_analyzer import ENGINES, CumulativeAnalyzer
 
 
 def fmt_price(price):
@@ -14,7 +14,22 @@ def fmt_price(price):
 @click.argument("csv_file", nargs=-1)
 @click.option("--start", help="Start analysis data, in pandas format e.g. '2021-06-01 12:00'")
 @click.option("--end", help="End analysis data, in pandas format e.g. '2021-06-01 12:00'")
-def main(csv_file, start, end):
+@click.option(
+    "--stream", is_flag=True, help="Read csv files lazily instead of loading them, files must be in chronological order"
+)
+@click.option(
+    "--table",
+    is_flag=True,
+    help="Keep trades in compact columnar table to save memory, files must be in chronological order",
+)
+@click.option(
+    "--engine",
+    type=click.Choice(ENGINES),
+    default="loop",
+    show_default=True,
+    help="How to compute stats: trade by trade, or with columnar groupby which is faster on large histories",
+)
+def main(csv_file, start, end, stream, table, engine):
     """Script to analyze transfers and trades to produce a summary.
 
     Useful for those who wants to get summary overview of what happened to their asset, what sold and bought,
@@ -25,12 +40,20 @@ def main(csv_file, start, end):
     """
     if len(csv_file) < 1:
         raise click.BadParameter(message="At least one csv file expected")
+    if stream and table:
+        raise click.BadParameter(message="--stream and --table cannot be used together")
     analyzer = CumulativeAnalyzer()
-    for single_file in csv_file:
-        analyzer.append_csv(single_file)
+    if stream:
+        analyzer.stream_csvs(csv_file)
+    elif table:
+        analyzer.load_table(csv_file)
+    else:
+        analyzer.append_csvs(csv_file)
 
     analyzer.run_analysis(
-        start=pd.Timestamp(start, tz="UTC") if start else None, end=pd.Timestamp(end, tz="UTC") if end else None
+        start=pd.Timestamp(start, tz="UTC") if start else None,
+        end=pd.Timestamp(end, tz="UTC") if end else None,
+        engine=engine,
     )
 
     click.echo("Asset transfer stats:")
@@ -1,33 +1,63 @@
-import copy
+import asyncio
 import logging
 import os.path
-import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from decimal import Decimal
+from functools import cached_property, partial
+from itertools import islice
 from pathlib import Path
-from typing import Optional, Tuple, Union
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
 from bitshares import BitShares
 
-from bitshares_tradehistory_analyzer.consts import HEADER, LINE_DICT_TEMPLATE, LINE_TEMPLATE
-from bitshares_tradehistory_analyzer.parser import Parser, UnsupportedSettleEntry
+from bitshares_tradehistory_analyzer.asset_cache import AssetCache
+from bitshares_tradehistory_analyzer.async_wrapper import AsyncWrapper
+from bitshares_tradehistory_analyzer.batch_writer import BatchWriter, drop_torn_line
+from bitshares_tradehistory_analyzer.checkpoint import Checkpoint, load_checkpoint, remove_checkpoint
+from bitshares_tradehistory_analyzer.consts import HEADER
+from bitshares_tradehistory_analyzer.multi_wrapper import MultiWrapper
+from bitshares_tradehistory_analyzer.page_cache import PageCache, ReplayWrapper
+from bitshares_tradehistory_analyzer.page_parser import (
+    ProcessParser,
+    parse_settlements,
+    parse_trades,
+    parse_transfers,
+)
+from bitshares_tradehistory_analyzer.pagination import HistoryCursor, PageSizer, SequenceCursor
+from bitshares_tradehistory_analyzer.parsed_op import ParsedOp
+from bitshares_tradehistory_analyzer.parser import Parser
+from bitshares_tradehistory_analyzer.pipeline import Pipeline
 from bitshares_tradehistory_analyzer.wrapper import Wrapper
 
 log = logging.getLogger(__name__)
 
 
+# Date before any history on the blockchain
+HISTORY_START_DATE = '2010-10-10'
+# Format of `block_time` field in wrapper entries
+BLOCK_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
 SELL_LOG_TEMPLATE = (
     'Sold {sell_amount} {sell_cur} for {buy_amount} {buy_cur} @ {price:.{prec}} {buy_cur}/{sell_cur}'
     ' ({price_inverted:.{prec}f} {sell_cur}/{buy_cur})'
 )
 
 
+def log_trade(trade: ParsedOp):
+    if log.isEnabledFor(logging.INFO):
+        log.info(SELL_LOG_TEMPLATE.format(**trade.as_dict()))
+
+
 def get_continuation_point(filename: Union[str, Path]) -> Tuple[str, Optional[str]]:
     """Check csv-file for number of records and last op id
 
     :param filename: path to the file to check
     :return: datetime string of last record and last op id
     """
-    dtime = '2010-10-10'
+    dtime = HISTORY_START_DATE
     last_op_id = None
 
     if os.path.isfile(filename) and os.path.getsize(filename) > 0:
@@ -52,14 +82,117 @@ def get_continuation_point(filename: Union[str, Path]) -> Tuple[str, Optional[st
     return dtime, last_op_id
 
 
+def split_time_range(start: str, end: datetime, parts: int) -> List[Tuple[str, Optional[str]]]:
+    """Split time range into equal windows
+
+    :param str start: block time of range start
+    :param datetime end: range end
+    :param int parts: number of windows
+    :return: list of (from_date, to_date) block time pairs, last window is open-ended
+    """
+    start_dt = datetime.strptime(start, BLOCK_TIME_FORMAT)
+    step = max(end - start_dt, timedelta(0)) / parts
+    bounds = [(start_dt + step * i).strftime(BLOCK_TIME_FORMAT) for i in range(parts)]
+    # Windows may collapse on very short ranges
+    bounds = sorted(set(bounds))
+    return list(zip(bounds, bounds[1:] + [None]))
+
+
+def op_id_num(entry: Dict[str, Any]) -> int:
+    return int(entry['account_history']['operation_id'].split('.')[-1])
+
+
+class TradeAggregator:
+    """Aggregates consecutive fills of the same order into a single line
+
+    :param ParsedOp pending: aggregated line to continue with, e.g. restored from checkpoint
+    """
+
+    def __init__(self, pending: Optional[ParsedOp] = None):
+        self.line = pending
+
+    def add(self, trade: ParsedOp) -> Optional[ParsedOp]:
+        """Add parsed trade entry
+
+        :param ParsedOp trade: parsed trade entry, aggregated in place
+        :return: previous aggregated line if it's complete and should be written
+        """
+        if self.line is None:
+            # Aggregated line is empty, store current entry data
+            self.line = trade
+        elif self.line.order_id == trade.order_id:
+            # If selling same asset at the same rate, just aggregate the trades
+            self.line.date = trade.date
+            self.line.sell_amount += trade.sell_amount
+            self.line.buy_amount += trade.buy_amount
+            self.line.fee_amount += trade.fee_amount
+            self.line.comment += ' {}'.format(trade.comment)
+            # Prevent division by zero
+            price = Decimal('0')
+            price_inverted = Decimal('0')
+            if self.line.sell_amount and self.line.buy_amount:
+                price = self.line.buy_amount / self.line.sell_amount
+                price_inverted = self.line.sell_amount / self.line.buy_amount
+            self.line.price = price
+            self.line.price_inverted = price_inverted
+        else:
+            log_trade(trade)
+            # Return current aggregated line and save current entry into new aggregation object
+            completed, self.line = self.line, trade
+            return completed
+        return None
+
+    def flush(self) -> Optional[ParsedOp]:
+        """Get remaining aggregated line, if any"""
+        if self.line is None:
+            return None
+        log_trade(self.line)
+        completed, self.line = self.line, None
+        return completed
+
+
 class HistoryDownloader:
+    """Downloads account history from ES wrapper and writes it into csv files
+
+    :param str account: account name
+    :param wrapper_url: ES wrapper url, or list of urls to balance and fail over between them
+    :param api_node: BitShares node url or list of urls
+    :param bool no_aggregate: do not aggregate trades by same order
+    :param str output_directory: where to place csv files
+    :param dict wrapper_options: extra keyword arguments for :class:`Wrapper` and :class:`AsyncWrapper`
+    :param dict failover_options: extra keyword arguments for :class:`MultiWrapper`, used with several wrapper urls
+    :param int backfill_shards: split first-time trades download into this number of time windows fetched in
+        parallel
+    :param int backfill_jobs: max number of windows fetched at once, fetched windows are kept in memory until written
+    :param bool strict_cursor: paginate by entries sequence instead of re-scanning pages from last entry date
+    :param str asset_cache_file: sqlite database to keep assets metadata across runs
+    :param str snapshot_file: parse entries using metadata snapshot instead of connecting to `api_node`
+    :param str page_cache_dir: save raw wrapper pages into this directory
+    :param bool replay: rebuild csv files from scratch using pages from `page_cache_dir` instead of wrapper
+    :param int queue_size: max number of pages waiting between pipeline stages
+    :param int parse_workers: parse pages in this number of worker processes, 0 or 1 to parse in main process
+    :param int flush_rows: write csv lines to disk in batches of at least this number of lines, 0 to write every page
+    """
+
     def __init__(
         self,
         account: str,
-        wrapper_url: str,
+        wrapper_url: Union[str, Sequence[str]],
         api_node: str,
         no_aggregate: bool = False,
         output_directory: Optional[str] = None,
+        wrapper_options: Optional[Dict[str, Any]] = None,
+        failover_options: Optional[Dict[str, Any]] = None,
+        backfill_shards: int = 1,
+        backfill_jobs: int = 4,
+        strict_cursor: bool = False,
+        asset_cache_file: Optional[str] = None,
+        snapshot_file: Optional[str] = None,
+        page_cache_dir: Optional[str] = None,
+        replay: bool = False,
+        queue_size: int = 2,
+        parse_workers: int = 0,
+        flush_rows: int = 0,
     ):
         self.account = account
 
@@ -69,154 +202,390 @@ class HistoryDownloader:
         self.trades_file = out_dir / f"trades-{self.account}.csv"
         self.global_settlements_file = out_dir / f"gs-{self.account}.csv"
 
-        bitshares = BitShares(node=api_node)
-        self.parser = Parser(bitshares, self.account)
-        self.wrapper = Wrapper(wrapper_url, account_id=self.parser.account["id"])
+        if snapshot_file is not None:
+            self.parser = Parser.from_snapshot(snapshot_file)
+            if self.parser.account['name'] != self.account:
+                raise ValueError(
+                    'Snapshot {} is made for account {}'.format(snapshot_file, self.parser.account['name'])
+                )
+        else:
+            bitshares = BitShares(node=api_node)
+            self.parser = Parser(bitshares, self.account, asset_cache=AssetCache(bitshares, filename=asset_cache_file))
+        # Node connection is not thread-safe, so parsing is serialized when streams are fetched in parallel
+        self.parser_lock = threading.Lock()
+        self.wrapper_urls = [wrapper_url] if isinstance(wrapper_url, str) else list(wrapper_url)
+        self.wrapper_url = self.wrapper_urls[0]
+        self.wrapper_options = dict(wrapper_options or {})
+        self.failover_options = dict(failover_options or {})
+        self.page_cache = PageCache(page_cache_dir) if page_cache_dir is not None else None
+        self.replay = replay
+        if replay and self.page_cache is None:
+            raise ValueError('Page cache directory is required to replay history')
+        if self.page_cache is not None and not replay:
+            self.wrapper_options['page_cache'] = self.page_cache
 
         self.no_aggregate = no_aggregate
-
-    def fetch_transfers(self):
-        dtime, last_op_id = get_continuation_point(self.transfers_file)
+        self.backfill_shards = backfill_shards
+        self.backfill_jobs = backfill_jobs
+        self.strict_cursor = strict_cursor
+        self.queue_size = queue_size
+        self.parse_workers = parse_workers
+        self.flush_rows = flush_rows
+        self.pipelines: List[Pipeline] = []
+
+    @cached_property
+    def wrapper(self) -> Union[Wrapper, MultiWrapper, ReplayWrapper]:
+        if self.replay:
+            return ReplayWrapper(self.page_cache, account_id=self.parser.account["id"], **self.wrapper_options)
+        if len(self.wrapper_urls) > 1:
+            return MultiWrapper(
+                self.wrapper_urls, account_id=self.parser.account["id"], **self.wrapper_options, **self.failover_options
+            )
+        return Wrapper(self.wrapper_url, account_id=self.parser.account["id"], **self.wrapper_options)
+
+    def close(self):
+        """Close wrapper connections and request threads, wrapper is created again if needed"""
+        wrapper = self.__dict__.pop('wrapper', None)
+        if isinstance(wrapper, (Wrapper, MultiWrapper)):
+            wrapper.close()
+
+    def _make_cursor(
+        self, from_date: str, last_op_id: Optional[str] = None, sequence: Optional[int] = None
+    ) -> HistoryCursor:
+        if self.strict_cursor:
+            return SequenceCursor(from_date, last_op_id, sequence=sequence)
+        return HistoryCursor(from_date, last_op_id)
+
+    def _open_output(self, filename: Path) -> Tuple[HistoryCursor, Optional[ParsedOp]]:
+        """Prepare output file and get cursor to continue from
+
+        Sidecar checkpoint is used when it's available, anything written after the checkpoint is discarded. Otherwise
+        continuation point is found from the last line of the file.
+
+        :return: cursor and pending aggregated trade
+        """
+        checkpoint = None if self.replay else load_checkpoint(filename)
+        if checkpoint is not None:
+            with open(filename, 'r+b') as fd:
+                fd.truncate(checkpoint.size)
+            log.info(
+                'Continuing {} from checkpoint {}, op id: {}'.format(
+                    filename, checkpoint.from_date, checkpoint.last_op_id
+                )
+            )
+            cursor = self._make_cursor(checkpoint.from_date, checkpoint.last_op_id, checkpoint.sequence)
+            return cursor, checkpoint.pending_trade()
+
+        if self.replay:
+            # Replay rebuilds the whole file
+            dtime, last_op_id = HISTORY_START_DATE, None
+        else:
+            drop_torn_line(filename)
+            dtime, last_op_id = get_continuation_point(filename)
         if not (dtime and last_op_id):
-            with open(self.transfers_file, 'w') as fd:
+            with open(filename, 'w') as fd:
                 fd.write(HEADER)
+            remove_checkpoint(filename)
+        return self._make_cursor(dtime, last_op_id), None
+
+    def _writer(self, filename: Path) -> BatchWriter:
+        return BatchWriter(filename, flush_rows=self.flush_rows)
+
+    @staticmethod
+    def _page_checkpoint(entries: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Optional[Checkpoint]]:
+        """Attach checkpoint pointing after the page, None for empty page"""
+        return entries, Checkpoint.from_entry(entries[-1]) if entries else None
+
+    @staticmethod
+    def _iter_pages(
+        query: Callable, cursor: HistoryCursor, page_size: Callable[[], int]
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Iterate over pages of new history entries
+
+        :param query: wrapper method to get history page
+        :param HistoryCursor cursor: continuation point
+        :param page_size: callable returning page size for the next request
+        """
+        sizer = PageSizer(page_size, cursor)
+        size = page_size()
+        history = query(cursor=cursor, size=size)
+        while history:
+            entries = cursor.consume(history)
+            yield entries
+
+            # Break `while` loop on least history chunk
+            if len(history) < size:
+                break
+
+            # Get next data chunk
+            size = sizer.next_size(size, entries)
+            history = query(cursor=cursor, size=size)
+
+    @staticmethod
+    async def _aiter_pages(
+        query: Callable, cursor: HistoryCursor, page_size: Callable[[], int]
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Async version of :meth:`_iter_pages`"""
+        sizer = PageSizer(page_size, cursor)
+        size = page_size()
+        history = await query(cursor=cursor, size=size)
+        while history:
+            entries = cursor.consume(history)
+            yield entries
+
+            if len(history) < size:
+                break
+
+            size = sizer.next_size(size, entries)
+            history = await query(cursor=cursor, size=size)
+
+    def _fetch_window(self, query: Callable, from_date: str, to_date: Optional[str]) -> List[Dict[str, Any]]:
+        """Fetch all entries in [from_date, to_date) time window"""
+        if to_date is not None:
+            query = partial(query, to_date=to_date)
+        entries = []
+        for page in self._iter_pages(query, self._make_cursor(from_date), self.wrapper.page_size):
+            # Wrapper includes entries matching to_date, they belong to the next window
+            entries.extend(entry for entry in page if to_date is None or entry['block_data']['block_time'] < to_date)
+        entries.sort(key=op_id_num)
+        log.debug('Fetched {} entries from {} to {}'.format(len(entries), from_date, to_date))
+        return entries
+
+    def _iter_sharded_pages(self, query: Callable) -> Iterator[List[Dict[str, Any]]]:
+        """Fetch whole history splitting it into time windows, which are downloaded in parallel
+
+        :param query: wrapper method to get history page
+        :return: iterator over windows entries, in operation_id order
+        """
+        history = query(from_date=HISTORY_START_DATE, size=1)
+        if not history:
+            return
+        windows = split_time_range(history[0]['block_data']['block_time'], datetime.utcnow(), self.backfill_shards)
+        jobs = min(len(windows), self.backfill_jobs)
+        log.info('Fetching history in {} windows, {} at once'.format(len(windows), jobs))
+        remaining = iter(windows)
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            pending = deque(executor.submit(self._fetch_window, query, *window) for window in islice(remaining, jobs))
+            # Windows are yielded in order, next window is started once the earliest one is taken, so at most `jobs`
+            # windows are held in memory
+            while pending:
+                entries = pending.popleft().result()
+                for window in islice(remaining, 1):
+                    pending.append(executor.submit(self._fetch_window, query, *window))
+                yield entries
+
+    def _transfer_lines(self, entries: List[Dict[str, Any]]) -> List[str]:
+        self.parser.prefetch(entries)
+        return parse_transfers(self.parser, entries)
+
+    def _parse_trades(self, entries: List[Dict[str, Any]]) -> List[ParsedOp]:
+        self.parser.prefetch(entries)
+        return parse_trades(self.parser, entries)
+
+    def _aggregate_trades(self, trades: List[ParsedOp], aggregator: TradeAggregator) -> List[str]:
+        lines = []
+        if self.no_aggregate and aggregator.line is not None:
+            # Aggregated line restored from checkpoint
+            lines.append(aggregator.flush().to_csv_line())
+        for trade in trades:
+            if self.no_aggregate:
+                log_trade(trade)
+                lines.append(trade.to_csv_line())
+                continue
+
+            completed = aggregator.add(trade)
+            if completed:
+                # Write current aggregated line
+                lines.append(completed.to_csv_line())
+        return lines
+
+    def _aggregate_page(
+        self, item: Tuple[List[ParsedOp], Optional[Checkpoint]], aggregator: TradeAggregator
+    ) -> Tuple[List[str], Optional[Checkpoint]]:
+        trades, checkpoint = item
+        lines = self._aggregate_trades(trades, aggregator)
+        if checkpoint is not None:
+            # Unfinished line is written at the end, but it's kept in checkpoint to continue aggregation on resume
+            checkpoint.set_pending(aggregator.line)
+        return lines, checkpoint
+
+    @staticmethod
+    def _trade_tail_lines(aggregator: TradeAggregator) -> List[str]:
+        # At the end, write remaining line
+        completed = aggregator.flush()
+        return [completed.to_csv_line()] if completed else []
+
+    def _settlement_lines(self, entries: List[Dict[str, Any]]) -> List[str]:
+        self.parser.prefetch(entries)
+        return parse_settlements(self.parser, entries)
+
+    def _locked(self, func: Callable) -> Callable:
+        """Wrap parsing function to hold parser lock"""
+
+        def wrapped(*args):
+            with self.parser_lock:
+                return func(*args)
+
+        return wrapped
+
+    @staticmethod
+    def _keep_checkpoint(func: Callable) -> Callable:
+        """Wrap function to apply it to (page, checkpoint) items"""
+
+        def wrapped(item):
+            page, checkpoint = item
+            return func(page), checkpoint
+
+        return wrapped
+
+    def _parse_in_processes(self, kind: str, items: Iterable[Tuple[List[Dict[str, Any]], Optional[Checkpoint]]]):
+        checkpoints: deque = deque()
+
+        def pages():
+            for entries, checkpoint in items:
+                checkpoints.append(checkpoint)
+                yield entries
+
+        # Results are ordered, and every page is taken before its result is yielded
+        for parsed in self.process_parser.imap(kind, pages()):
+            yield parsed, checkpoints.popleft()
+
+    @cached_property
+    def process_parser(self) -> ProcessParser:
+        return ProcessParser(self.parser, self.parse_workers, lock=self.parser_lock)
+
+    def _run_pipeline(
+        self,
+        kind: str,
+        pages: Iterable[List[Dict[str, Any]]],
+        filename: Path,
+        parse: Callable[[List[Dict[str, Any]]], List[Any]],
+        *stages: Tuple,
+    ):
+        """Run fetch -> parse -> ... -> write pipeline
+
+        :param str kind: history kind: transfers, trades or settlements
+        :param pages: iterator over pages of entries, runs in fetch stage
+        :param Path filename: output file
+        :param parse: function to parse a page in current process
+        :param stages: (name, func, finish) tuples of stages after parsing, they are passed (page, checkpoint) items
+        """
+        pipeline = Pipeline(kind, maxsize=self.queue_size)
+        self.pipelines.append(pipeline)
+        stage = pipeline.stage('fetch', pages, self._page_checkpoint)
+        if self.parse_workers > 1:
+            stage = pipeline.stage('parse', self._parse_in_processes(kind, stage))
+        else:
+            stage = pipeline.stage('parse', stage, self._keep_checkpoint(self._locked(parse)))
+        for stage_name, func, finish in stages:
+            stage = pipeline.stage(stage_name, stage, func, finish)
+        with self._writer(filename) as writer:
+            pipeline.run('write', stage, lambda item: writer.write(*item))
+        log.debug(str(pipeline))
 
-        with open(self.transfers_file, "a") as fd:
-            history = self.wrapper.get_transfers(from_date=dtime)
-            while history:
-                for entry in history:
-                    op_id = entry['account_history']['operation_id']
-                    op_date = entry['block_data']['block_time']
-                    # Skip entries until last_op_id found
-                    if last_op_id and op_id != last_op_id:
-                        log.debug('skipping entry {}'.format(entry))
-                        continue
-                    elif last_op_id and op_id == last_op_id:
-                        # Ok, last_op_id found, let's start to write entries from the next one
-                        last_op_id = None
-                        log.debug('skipping entry {}'.format(entry))
-                        continue
-
-                    parsed_data = self.parser.parse_transfer_entry(entry)
-                    fd.write(LINE_TEMPLATE.format(**parsed_data))
-
-                # Remember last op id for the next chunk
-                last_op_id = op_id
-
-                # Break `while` loop on least history chunk
-                if len(history) < self.wrapper.size:
-                    break
-
-                # Get next data chunk
-                history = self.wrapper.get_transfers(from_date=op_date)
+    def fetch_transfers(self):
+        cursor, _ = self._open_output(self.transfers_file)
+        pages = self._iter_pages(self.wrapper.get_transfers, cursor, self.wrapper.page_size)
+        self._run_pipeline('transfers', pages, self.transfers_file, self._transfer_lines)
 
     def fetch_trades(self):
-        dtime, last_op_id = get_continuation_point(self.trades_file)
-        if not (dtime and last_op_id):
-            with open(self.trades_file, 'w') as fd:
-                fd.write(HEADER)
-
-        with open(self.trades_file, "a") as fd:
-            history = self.wrapper.get_trades(from_date=dtime)
-            aggregated_line = copy.deepcopy(LINE_DICT_TEMPLATE)
-            while history:
-                for entry in history:
-                    op = self.parser.load_op(entry)
-                    op_id = entry['account_history']['operation_id']
-                    op_date = entry['block_data']['block_time']
-
-                    log.debug('Processing op {} @ {}'.format(op_date, op_id))
-                    # Skip entries until last_op_id found
-                    if last_op_id and op_id != last_op_id:
-                        log.debug('skipping earlier op {} < {}'.format(op_id, last_op_id))
-                        continue
-                    elif last_op_id and op_id == last_op_id:
-                        last_op_id = None
-                        continue
-
-                    line_dict = self.parser.parse_trade_entry(entry)
-
-                    if self.no_aggregate:
-                        log.info(SELL_LOG_TEMPLATE.format(**line_dict))
-                        fd.write(LINE_TEMPLATE.format(**line_dict))
-                        continue
-
-                    if not aggregated_line['order_id']:
-                        # Aggregated line is empty, store current entry data
-                        aggregated_line = line_dict
-                    elif aggregated_line['order_id'] == op['order_id']:
-                        # If selling same asset at the same rate, just aggregate the trades
-                        aggregated_line['date'] = line_dict['date']
-                        aggregated_line['sell_amount'] += line_dict['sell_amount']
-                        aggregated_line['buy_amount'] += line_dict['buy_amount']
-                        aggregated_line['fee_amount'] += line_dict['fee_amount']
-                        aggregated_line['comment'] += ' {}'.format(op_id)
-                        # Prevent division by zero
-                        price = Decimal('0')
-                        price_inverted = Decimal('0')
-                        if aggregated_line['sell_amount'] and aggregated_line['buy_amount']:
-                            price = aggregated_line['buy_amount'] / aggregated_line['sell_amount']
-                            price_inverted = aggregated_line['sell_amount'] / aggregated_line['buy_amount']
-                        aggregated_line['price'] = price
-                        aggregated_line['price_inverted'] = price_inverted
-                    else:
-                        log.info(SELL_LOG_TEMPLATE.format(**line_dict))
-                        # Write current aggregated line
-                        fd.write(LINE_TEMPLATE.format(**aggregated_line))
-                        aggregated_line = copy.deepcopy(LINE_DICT_TEMPLATE)
-                        # Save current entry into new aggregation object
-                        aggregated_line = line_dict
-
-                # Remember last op id for the next chunk
-                last_op_id = op_id
-
-                # Break `while` loop on least history chunk
-                if len(history) < self.wrapper.size:
-                    break
-
-                # Get next data chunk
-                time.sleep(1)
-                history = self.wrapper.get_trades(from_date=op_date)
-
-            # At the end, write remaining line
-            if aggregated_line['order_id']:
-                log.info(SELL_LOG_TEMPLATE.format(**aggregated_line))
-                fd.write(LINE_TEMPLATE.format(**aggregated_line))
+        cursor, pending = self._open_output(self.trades_file)
+        aggregator = TradeAggregator(pending)
+        if self.backfill_shards > 1 and cursor.last_op_id is None:
+            pages = self._iter_sharded_pages(self.wrapper.get_trades)
+        else:
+            pages = self._iter_pages(self.wrapper.get_trades, cursor, self.wrapper.page_size)
+        self._run_pipeline(
+            'trades',
+            pages,
+            self.trades_file,
+            self._parse_trades,
+            (
+                'aggregate',
+                partial(self._aggregate_page, aggregator=aggregator),
+                lambda: (self._trade_tail_lines(aggregator), None),
+            ),
+        )
 
     def fetch_settlements_in_gs_state(self):
-        dtime, last_op_id = get_continuation_point(self.global_settlements_file)
-        if not (dtime and last_op_id):
-            with open(self.global_settlements_file, 'w') as fd:
-                fd.write(HEADER)
-
-        with open(self.global_settlements_file, "a") as fd:
-            history = self.wrapper.get_global_settlements(from_date=dtime)
-            while history:
-                for entry in history:
-                    op_id = entry['account_history']['operation_id']
-                    op_date = entry['block_data']['block_time']
-                    # Skip entries until last_op_id found
-                    if last_op_id and op_id != last_op_id:
-                        log.debug('skipping entry {}'.format(entry))
-                        continue
-                    elif last_op_id and op_id == last_op_id:
-                        # Ok, last_op_id found, let's start to write entries from the next one
-                        last_op_id = None
-                        log.debug('skipping entry {}'.format(entry))
-                        continue
-
-                    try:
-                        parsed_data = self.parser.parse_settle_entry(entry)
-                    except UnsupportedSettleEntry:
-                        continue
-                    fd.write(LINE_TEMPLATE.format(**parsed_data))
-
-                # Remember last op id for the next chunk
-                last_op_id = op_id
-
-                # Break `while` loop on least history chunk
-                if len(history) < self.wrapper.size:
-                    break
-
-                # Get next data chunk
-                history = self.wrapper.get_global_settlements(from_date=op_date)
+        cursor, _ = self._open_output(self.global_settlements_file)
+        pages = self._iter_pages(self.wrapper.get_global_settlements, cursor, self.wrapper.page_size)
+        self._run_pipeline('settlements', pages, self.global_settlements_file, self._settlement_lines)
+
+    def fetch_all(self, jobs: int = 1):
+        """Download transfers, trades and settlements
+
+        Each stream has its own output file and continuation point, so streams can be fetched in parallel.
+
+        :param int jobs: number of streams to fetch simultaneously
+        """
+        streams = [self.fetch_transfers, self.fetch_trades, self.fetch_settlements_in_gs_state]
+        if self.parse_workers > 1:
+            # Start workers before fetching streams in parallel
+            log.debug('Parsing history in {} processes'.format(self.process_parser.workers))
+        try:
+            if jobs <= 1:
+                for stream in streams:
+                    stream()
+                return
+
+            # Make sure wrapper is initialized once before spawning workers
+            log.debug('Fetching history in {} jobs using wrapper {}'.format(jobs, self.wrapper.url))
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                futures = [executor.submit(stream) for stream in streams]
+            for future in futures:
+                # Re-raise exceptions from workers
+                future.result()
+        finally:
+            if 'process_parser' in self.__dict__:
+                self.process_parser.close()
+                del self.process_parser
+
+    async def _aparse(self, parse: Callable[[List[Dict[str, Any]]], List[Any]], entries: List[Dict[str, Any]]):
+        """Parse page in a thread, parsing may query node and would block other streams otherwise"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._locked(parse), entries)
+
+    async def afetch_transfers(self, wrapper: AsyncWrapper):
+        cursor, _ = self._open_output(self.transfers_file)
+        with self._writer(self.transfers_file) as writer:
+            async for entries in self._aiter_pages(wrapper.get_transfers, cursor, wrapper.page_size):
+                entries, checkpoint = self._page_checkpoint(entries)
+                writer.write(await self._aparse(self._transfer_lines, entries), checkpoint)
+
+    async def afetch_trades(self, wrapper: AsyncWrapper):
+        cursor, pending = self._open_output(self.trades_file)
+        aggregator = TradeAggregator(pending)
+        with self._writer(self.trades_file) as writer:
+            async for entries in self._aiter_pages(wrapper.get_trades, cursor, wrapper.page_size):
+                entries, checkpoint = self._page_checkpoint(entries)
+                trades = await self._aparse(self._parse_trades, entries)
+                writer.write(*self._aggregate_page((trades, checkpoint), aggregator))
+            writer.write(self._trade_tail_lines(aggregator))
+
+    async def afetch_settlements_in_gs_state(self, wrapper: AsyncWrapper):
+        cursor, _ = self._open_output(self.global_settlements_file)
+        with self._writer(self.global_settlements_file) as writer:
+            async for entries in self._aiter_pages(wrapper.get_global_settlements, cursor, wrapper.page_size):
+                entries, checkpoint = self._page_checkpoint(entries)
+                writer.write(await self._aparse(self._settlement_lines, entries), checkpoint)
+
+    async def afetch_all(self):
+        """Download transfers, trades and settlements concurrently within single event loop
+
+        Async client works with single wrapper, so the first one is used when several urls are given, and trades are
+        not sharded.
+        """
+        if len(self.wrapper_urls) > 1:
+            log.warning('Failover is not supported by async client, using only {}'.format(self.wrapper_url))
+        if self.backfill_shards > 1:
+            log.warning('Sharded backfill is not supported by async client, fetching trades sequentially')
+        async with AsyncWrapper(
+            self.wrapper_url, account_id=self.parser.account["id"], **self.wrapper_options
+        ) as wrapper:
+            await asyncio.gather(
+                self.afetch_transfers(wrapper),
+                self.afetch_trades(wrapper),
+                self.afetch_settlements_in_gs_state(wrapper),
+            )
+            log.info('Wrapper requests: {}'.format(wrapper.stats))
@@ -0,0 +1,54 @@
+import json
+import logging
+from typing import Any, Callable, Dict, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+log = logging.getLogger(__name__)
+
+# orjson silently turns integers beyond 64 bits into floats, while stdlib json keeps them exact. Such integers have
+# at least 19 digits. Searching for a digit run with regex is slower than decoding itself, so digits are mapped to
+# '0' and everything else to ' ', and the run is searched as a plain substring.
+_DIGITS_TABLE = bytes(ord('0') if ord('0') <= i <= ord('9') else ord(' ') for i in range(256))
+_LONG_NUMBER = b'0' * 19
+
+
+def _orjson_loads(data: Union[str, bytes]) -> Any:
+    raw = data.encode() if isinstance(data, str) else data
+    if _LONG_NUMBER in raw.translate(_DIGITS_TABLE):
+        return json.loads(data)
+    # orjson.JSONDecodeError is a subclass of json.JSONDecodeError
+    return orjson.loads(data)
+
+
+DECODERS: Dict[str, Callable[[Union[str, bytes]], Any]] = {'json': json.loads}
+if orjson is not None:
+    DECODERS['orjson'] = _orjson_loads
+
+_decoder = DECODERS.get('orjson', json.loads)
+
+
+def set_decoder(name: str):
+    """Choose JSON decoder
+
+    :param str name: decoder name, one of :data:`DECODERS` keys
+    """
+    global _decoder
+    try:
+        _decoder = DECODERS[name]
+    except KeyError:
+        raise ValueError('Unknown JSON decoder {}, available: {}'.format(name, ', '.join(DECODERS)))
+    log.debug('Using {} JSON decoder'.format(name))
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """Decode JSON document using orjson when installed, or stdlib json
+
+    Both decoders give the same values, see :func:`set_decoder` to choose one explicitly.
+
+    :raises json.JSONDecodeError: on invalid document
+    """
+    return _decoder(data)
@@ -0,0 +1,48 @@
+import heapq
+import logging
+from typing import Any, Callable, Iterable, Iterator, List, Sequence
+
+log = logging.getLogger(__name__)
+
+
+def is_sorted(items: Sequence[Any], key: Callable[[Any], Any]) -> bool:
+    """Check whether items are in non-decreasing order of `key`"""
+    keys = [key(item) for item in items]
+    return all(prev <= cur for prev, cur in zip(keys, keys[1:]))
+
+
+def merge_sorted(sequences: Sequence[Sequence[Any]], key: Callable[[Any], Any]) -> Iterator[Any]:
+    """Merge sequences which are usually sorted already
+
+    Result is the same as of stable sort of all sequences concatenated: items with equal keys keep sequences order.
+    Only sequences which are out of order get sorted, the rest are merged with a heap.
+
+    :param sequences: sequences of items
+    :param key: sort key function
+    :return: iterator over merged items
+    """
+    sorted_sequences: List[Sequence[Any]] = []
+    for num, sequence in enumerate(sequences):
+        if not is_sorted(sequence, key):
+            log.debug('Sequence {} is not sorted, sorting it'.format(num))
+            sequence = sorted(sequence, key=key)
+        sorted_sequences.append(sequence)
+    # heapq.merge() prefers earlier iterables on equal keys, so it's stable
+    return heapq.merge(*sorted_sequences, key=key)
+
+
+def ensure_sorted(items: Iterable[Any], key: Callable[[Any], Any], name: str) -> Iterator[Any]:
+    """Pass items through, checking that they are in non-decreasing order of `key`
+
+    :param items: iterable of items
+    :param key: sort key function
+    :param str name: name of items source for error message
+    :raises ValueError: when an item is out of order
+    """
+    prev = None
+    for num, item in enumerate(items):
+        cur = key(item)
+        if num and cur < prev:
+            raise ValueError('{} is not sorted: item {} goes before the previous one'.format(name, num))
+        prev = cur
+        yield item
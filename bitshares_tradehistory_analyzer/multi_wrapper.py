@@ -0,0 +1,163 @@
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+
+from bitshares_tradehistory_analyzer.wrapper import BaseWrapper, Wrapper, make_session
+
+log = logging.getLogger(__name__)
+
+
+class Endpoint:
+    """Single ES wrapper endpoint with health state
+
+    :param str url: ES wrapper url
+    :param str account_id: account id in 1.2.x form
+    :param float cooldown: how long to avoid the endpoint after failure, in seconds
+    :param kwargs: :class:`~bitshares_tradehistory_analyzer.wrapper.Wrapper` options
+    """
+
+    def __init__(self, url: str, account_id: str, cooldown: float = 60, **kwargs):
+        self.url = url
+        self.account_id = account_id
+        self.cooldown = cooldown
+        self.wrapper_options = kwargs
+        self.wrapper: Optional[Wrapper] = None
+        self.failed_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def healthy(self) -> bool:
+        return self.failed_at is None or time.monotonic() - self.failed_at > self.cooldown
+
+    @property
+    def latency(self) -> float:
+        """Typical latency of the endpoint, endpoints without stats are considered the fastest to get them probed"""
+        if self.wrapper is None:
+            return 0
+        return self.wrapper.stats.percentile(50) or 0
+
+    def mark_failed(self):
+        log.warning('Wrapper {} failed, avoiding it for {}s'.format(self.url, self.cooldown))
+        self.failed_at = time.monotonic()
+
+    def get_wrapper(self) -> Wrapper:
+        # Version detection makes a request, so wrapper is created on first use
+        with self._lock:
+            if self.wrapper is None:
+                self.wrapper = Wrapper(self.url, self.account_id, **self.wrapper_options)
+            return self.wrapper
+
+    def query(self, params: Dict[str, Any], kwargs: Dict[str, Any]) -> Any:
+        try:
+            result = self.get_wrapper()._query(params, **kwargs)
+        except Exception:
+            self.mark_failed()
+            raise
+        self.failed_at = None
+        return result
+
+
+class MultiWrapper(BaseWrapper):
+    """Client querying several ES wrappers
+
+    Every request is routed to the fastest healthy endpoint. When a request takes longer than usual for the endpoint
+    (latency percentile), a hedged duplicate is sent to the next endpoint and first result wins. Failed endpoints are
+    skipped for a cooldown period and the request is repeated on the next one, so the caller's cursor is kept intact.
+
+    :param list urls: ES wrapper urls
+    :param str account_id: account id in 1.2.x form
+    :param int size: page size
+    :param int pool_size: max number of keep-alive connections per endpoint
+    :param float hedge_percentile: latency percentile of endpoint after which hedged request is sent, None to disable
+    :param int hedge_min_requests: don't hedge until endpoint has this number of requests made
+    :param float cooldown: how long to avoid failed endpoint, in seconds
+    :param kwargs: :class:`~bitshares_tradehistory_analyzer.wrapper.Wrapper` options applied to every endpoint
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        account_id: str,
+        size: int = 200,
+        pool_size: int = 10,
+        hedge_percentile: Optional[float] = 95,
+        hedge_min_requests: int = 5,
+        cooldown: float = 60,
+        **kwargs,
+    ):
+        super().__init__(urls[0], account_id, size=size)
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_requests = hedge_min_requests
+        self.session = make_session(pool_size)
+        self.endpoints = [
+            Endpoint(url, account_id, cooldown=cooldown, size=size, session=self.session, **kwargs) for url in urls
+        ]
+        self.executor = ThreadPoolExecutor(max_workers=pool_size)
+
+    def close(self):
+        """Stop request threads and close connections
+
+        Losing hedged requests which are still in flight are not waited for, their threads exit once requests finish.
+        """
+        self.executor.shutdown(wait=False)
+        self.session.close()
+
+    def ranked_endpoints(self) -> List[Endpoint]:
+        """Get endpoints ordered by preference: healthy first, then by latency"""
+        return sorted(self.endpoints, key=lambda endpoint: (not endpoint.healthy, endpoint.latency))
+
+    def page_size(self) -> int:
+        endpoint = self.ranked_endpoints()[0]
+        if endpoint.wrapper is None:
+            return self.size
+        return endpoint.wrapper.page_size()
+
+    def _hedge_delay(self, endpoint: Endpoint) -> Optional[float]:
+        if self.hedge_percentile is None or endpoint.wrapper is None:
+            return None
+        if endpoint.wrapper.stats.requests < self.hedge_min_requests:
+            return None
+        return endpoint.wrapper.stats.percentile(self.hedge_percentile)
+
+    def _query(self, params, *args, **kwargs):
+        start = time.monotonic()
+        candidates = iter(self.ranked_endpoints())
+        pending: Dict[Any, Endpoint] = {}
+        hedged = False
+        error: Optional[Exception] = None
+
+        def submit() -> bool:
+            endpoint = next(candidates, None)
+            if endpoint is None:
+                return False
+            pending[self.executor.submit(endpoint.query, params, kwargs)] = endpoint
+            return True
+
+        submit()
+        while pending:
+            primary = next(iter(pending.values()))
+            timeout = None if hedged else self._hedge_delay(primary)
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # Request is slower than usual, send hedged duplicate to the next endpoint
+                hedged = True
+                if submit():
+                    log.debug('Hedging slow request to {}'.format(primary.url))
+                continue
+
+            for future in done:
+                endpoint = pending.pop(future)
+                if future.exception() is None:
+                    self.stats.add(time.monotonic() - start)
+                    return future.result()
+                error = future.exception()
+                log.warning('Request to {} failed: {}'.format(endpoint.url, error))
+
+            if not pending and submit():
+                # Failed over to the next endpoint
+                self.stats.add_retry()
+
+        self.stats.add(time.monotonic() - start, error=True)
+        raise error or ValueError('No wrapper endpoints configured')
@@ -0,0 +1,109 @@
+import copy
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+from bitshares_tradehistory_analyzer.wrapper import BaseWrapper
+
+log = logging.getLogger(__name__)
+
+
+class PageCache:
+    """On-disk cache of raw ES wrapper pages
+
+    Every page is stored as gzipped json under `<directory>/<account_id>/<endpoint>/<operation_type>/`, file name is
+    derived from the cursor part of the query (date, offset and size).
+
+    :param str directory: cache directory
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    @staticmethod
+    def _endpoint_dir(url: str) -> str:
+        return re.sub(r'[^\w.-]+', '_', url).strip('_')
+
+    def _page_path(self, url: str, payload: Dict[str, Any]) -> Path:
+        cursor = {key: value for key, value in payload.items() if key not in ('account_id', 'operation_type')}
+        key = hashlib.blake2b(json.dumps(cursor, sort_keys=True).encode(), digest_size=20).hexdigest()
+        return (
+            self.directory
+            / payload['account_id']
+            / self._endpoint_dir(url)
+            / str(payload['operation_type'])
+            / '{}.json.gz'.format(key)
+        )
+
+    def put(self, url: str, payload: Dict[str, Any], page: List[Dict[str, Any]]):
+        """Save page
+
+        :param str url: wrapper query url
+        :param dict payload: query params
+        :param list page: wrapper response
+        """
+        path = self._page_path(url, payload)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write into temporary file first, so interrupted writes don't leave broken pages
+        tmp_path = path.with_name('{}.{}.tmp'.format(path.name, threading.get_ident()))
+        with gzip.open(tmp_path, 'wt') as fd:
+            json.dump({'url': url, 'payload': payload, 'page': page}, fd)
+        os.replace(tmp_path, path)
+
+    def iter_entries(self, account_id: str, operation_type: int) -> Iterator[Dict[str, Any]]:
+        """Iterate over entries of all cached pages from all endpoints, entries may repeat"""
+        for path in sorted(self.directory.glob('{}/*/{}/*.json.gz'.format(account_id, operation_type))):
+            with gzip.open(path, 'rt') as fd:
+                yield from json.load(fd)['page']
+
+
+class ReplayWrapper(BaseWrapper):
+    """Serves history from page cache the same way as ES wrapper does, without network requests
+
+    All cached pages are merged, so history can be replayed with any page size and cursor.
+
+    :param PageCache page_cache: cache to replay
+    :param str account_id: account id in 1.2.x form
+    :param int size: page size
+    """
+
+    def __init__(self, page_cache: PageCache, account_id: str, size: int = 200, **kwargs):
+        super().__init__('replay', account_id, size=size)
+        self.source = page_cache
+        self._entries: Dict[int, List[Dict[str, Any]]] = {}
+        # Block times of entries, to find pages by bisection
+        self._block_times: Dict[int, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def entries(self, operation_type: int) -> List[Dict[str, Any]]:
+        """Get deduplicated cached entries of given type ordered by sequence"""
+        with self._lock:
+            if operation_type not in self._entries:
+                unique = {}
+                for entry in self.source.iter_entries(self.account_id, operation_type):
+                    unique[entry['account_history']['operation_id']] = entry
+                entries = sorted(unique.values(), key=lambda entry: entry['account_history']['sequence'])
+                self._entries[operation_type] = entries
+                self._block_times[operation_type] = [entry['block_data']['block_time'] for entry in entries]
+                log.info('Replaying {} cached entries of type {}'.format(len(unique), operation_type))
+            return self._entries[operation_type]
+
+    def _query(self, params, *args, **kwargs):
+        _, payload = self._build_query(params, **kwargs)
+        entries = self.entries(payload['operation_type'])
+        # Entries ordered by sequence are ordered by block time as well
+        block_times = self._block_times[payload['operation_type']]
+        low = bisect_left(block_times, payload.get('from_date', ''))
+        high = bisect_right(block_times, payload.get('to_date', '9999'))
+        start = low + payload.get('from_', 0)
+        end = min(start + payload['size'], high)
+        self.stats.add(0)
+        # Only the page is copied, so parsing can't change cached entries
+        return copy.deepcopy(entries[start:end])
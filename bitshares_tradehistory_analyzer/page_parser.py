@@ -0,0 +1,185 @@
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from bitshares_tradehistory_analyzer.parsed_op import ParsedOp
+from bitshares_tradehistory_analyzer.parser import Parser, UnsupportedSettleEntry
+
+log = logging.getLogger(__name__)
+
+
+def parse_transfers(parser: Parser, entries: List[Dict[str, Any]]) -> List[str]:
+    """Parse page of transfers into csv lines"""
+    return [parser.parse_transfer_entry(entry).to_csv_line() for entry in entries]
+
+
+def parse_trades(parser: Parser, entries: List[Dict[str, Any]]) -> List[ParsedOp]:
+    """Parse page of trades into records, which are to be aggregated"""
+    trades = []
+    for entry in entries:
+        op_id = entry['account_history']['operation_id']
+        op_date = entry['block_data']['block_time']
+        log.debug('Processing op {} @ {}'.format(op_date, op_id))
+        trades.append(parser.parse_trade_entry(entry))
+    return trades
+
+
+def parse_settlements(parser: Parser, entries: List[Dict[str, Any]]) -> List[str]:
+    """Parse page of settlements into csv lines, skipping settlements which are not in GS state"""
+    lines = []
+    for entry in entries:
+        try:
+            parsed_op = parser.parse_settle_entry(entry)
+        except UnsupportedSettleEntry:
+            continue
+        lines.append(parsed_op.to_csv_line())
+    return lines
+
+
+PAGE_PARSERS: Dict[str, Callable[[Parser, List[Dict[str, Any]]], List[Any]]] = {
+    'transfers': parse_transfers,
+    'trades': parse_trades,
+    'settlements': parse_settlements,
+}
+
+# Offline parser of worker process
+_worker_parser: Optional[Parser] = None
+# Number of assets learned by main process which worker has loaded
+_worker_learned = 0
+
+
+class _MainProcessHandler(logging.Handler):
+    """Passes log records of workers to the loggers of main process"""
+
+    def emit(self, record: logging.LogRecord):
+        logging.getLogger(record.name).handle(record)
+
+
+def _init_worker(snapshot: Dict[str, Any], log_queue, log_level: int):
+    global _worker_parser
+    # Spawned workers don't inherit logging setup, so records are sent to main process
+    root = logging.getLogger()
+    root.handlers = [QueueHandler(log_queue)]
+    logging.getLogger('bitshares_tradehistory_analyzer').setLevel(log_level)
+    _worker_parser = Parser.from_snapshot_data(snapshot)
+
+
+def _parse_page(
+    kind: str, entries: List[Dict[str, Any]], learned_from: int, assets: List[Dict[str, Any]]
+) -> Tuple[int, int, Optional[List[Any]]]:
+    """Parse page in worker process
+
+    :param str kind: page kind, key of :data:`PAGE_PARSERS`
+    :param list entries: page entries
+    :param int learned_from: number of learned assets preceding `assets`, every worker has loaded them already
+    :param list assets: assets learned by main process since `learned_from`
+    :return: worker pid, number of learned assets loaded by worker, and parsed page or None if page references
+        assets unknown to worker
+    """
+    global _worker_learned
+    assert _worker_parser is not None
+    assert learned_from <= _worker_learned
+    already_loaded = _worker_learned - learned_from
+    _worker_parser.assets.load(assets[already_loaded:])
+    _worker_learned = max(_worker_learned, learned_from + len(assets))
+    pid = os.getpid()
+    asset_ids: Set[str] = set()
+    _worker_parser.collect_ids(entries, asset_ids)
+    if any(asset_id not in _worker_parser.assets for asset_id in asset_ids):
+        return pid, _worker_learned, None
+    return pid, _worker_learned, PAGE_PARSERS[kind](_worker_parser, entries)
+
+
+class ProcessParser:
+    """Parses pages of entries in a pool of worker processes
+
+    Every worker gets an offline copy of the parser built from metadata snapshot, so workers don't connect to the
+    node. Pages referencing assets which workers don't know yet are parsed by the main process parser, and newly
+    learned assets are sent to workers along with the next pages, until every worker reports it has them. Parsed
+    pages are yielded in the original order. Log records of workers are handled by main process loggers.
+
+    Only assets are sent to workers, so workers log account names which are not in the snapshot as 1.2.x ids.
+
+    :param Parser parser: main process parser
+    :param int workers: number of worker processes
+    :param lock: lock to hold while using main process parser
+    :param int window: max number of pages being parsed at once, default is twice the number of workers
+    """
+
+    def __init__(
+        self, parser: Parser, workers: int, lock: Optional[threading.Lock] = None, window: Optional[int] = None
+    ):
+        self.parser = parser
+        self.workers = workers
+        self.lock = lock or threading.Lock()
+        self.window = window or workers * 2
+        with self.lock:
+            snapshot = parser.snapshot()
+        self._known = {asset['id'] for asset in snapshot['assets']}
+        self._learned: List[Dict[str, Any]] = []
+        # Number of learned assets loaded by every worker, by worker pid
+        self._worker_learned: Dict[int, int] = {}
+        context = get_context('spawn')
+        self._log_queue = context.Queue()
+        self._log_listener = QueueListener(self._log_queue, _MainProcessHandler())
+        self._log_listener.start()
+        log_level = logging.getLogger('bitshares_tradehistory_analyzer').getEffectiveLevel()
+        # Spawned workers don't inherit threads and node connection of the main process
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(snapshot, self._log_queue, log_level),
+        )
+
+    def _parse_locally(self, kind: str, entries: List[Dict[str, Any]]) -> List[Any]:
+        with self.lock:
+            asset_ids = self.parser.prefetch(entries)
+            result = PAGE_PARSERS[kind](self.parser, entries)
+            # Page was parsed, so all its assets are resolved
+            for asset_id in sorted(asset_ids - self._known):
+                self._known.add(asset_id)
+                self._learned.append(self.parser.assets.get(asset_id))
+        return result
+
+    def imap(self, kind: str, pages: Iterable[List[Dict[str, Any]]]) -> Iterator[List[Any]]:
+        """Parse pages in worker processes
+
+        :param str kind: page kind: transfers, trades or settlements
+        :param pages: iterable of pages
+        :return: iterator over parsed pages, in the same order
+        """
+        pending: deque = deque()
+
+        def complete():
+            entries, future = pending.popleft()
+            pid, learned, result = future.result()
+            self._worker_learned[pid] = max(self._worker_learned.get(pid, 0), learned)
+            if result is None:
+                log.debug('Page references unknown assets, parsing in main process')
+                result = self._parse_locally(kind, entries)
+            return result
+
+        for entries in pages:
+            # Any worker may get the page, so send assets which some worker may not have yet
+            learned_from = self._learned_by_all()
+            future = self.executor.submit(_parse_page, kind, entries, learned_from, self._learned[learned_from:])
+            pending.append((entries, future))
+            if len(pending) >= self.window:
+                yield complete()
+        while pending:
+            yield complete()
+
+    def _learned_by_all(self) -> int:
+        if len(self._worker_learned) < self.workers:
+            return 0
+        return min(self._worker_learned.values())
+
+    def close(self):
+        self.executor.shutdown()
+        self._log_listener.stop()
@@ -0,0 +1,142 @@
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+
+class HistoryCursor:
+    """Continuation point of account history stream
+
+    Wrapper allows to query history starting from some date, so follow-up pages are requested from the date of the
+    last seen entry. Entries which are already processed are skipped until last seen op id is found.
+
+    :param str from_date: datetime string to start from
+    :param str last_op_id: id of last processed operation, if any
+    """
+
+    def __init__(self, from_date: str, last_op_id: Optional[str] = None):
+        self.from_date = from_date
+        self.last_op_id = last_op_id
+
+    def params(self) -> Dict[str, Any]:
+        """Get query params to request next page"""
+        return {'from_date': self.from_date}
+
+    def consume(self, history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Get not yet processed entries from the page and move cursor to the end of the page
+
+        :param list history: page of wrapper entries
+        :return: list of new entries
+        """
+        entries = []
+        for entry in history:
+            op_id = entry['account_history']['operation_id']
+            # Skip entries until last_op_id found
+            if self.last_op_id and op_id != self.last_op_id:
+                log.debug('skipping entry {}'.format(entry))
+                continue
+            elif self.last_op_id and op_id == self.last_op_id:
+                # Ok, last_op_id found, let's take entries from the next one
+                self.last_op_id = None
+                log.debug('skipping entry {}'.format(entry))
+                continue
+            entries.append(entry)
+
+        # Keep looking for last_op_id when the page ended before it was found
+        if history and self.last_op_id is None:
+            # Remember last op id for the next chunk
+            self.last_op_id = history[-1]['account_history']['operation_id']
+            self.from_date = history[-1]['block_data']['block_time']
+
+        return entries
+
+
+class SequenceCursor(HistoryCursor):
+    """Strict cursor which makes each entry to be transferred exactly once
+
+    Entries are sorted by `account_history.sequence`, so the position in the stream is defined by date of the last
+    seen entry plus the number of already seen entries having that date, which is passed as `from_` offset. Wrapper
+    doesn't support search-after queries directly, so sequence of the last seen entry is used as a safety net to drop
+    entries seen already.
+
+    :param str from_date: datetime string to start from
+    :param str last_op_id: id of last processed operation, used when sequence is not known
+    :param int sequence: `account_history.sequence` of last processed entry
+    :param int offset: number of already processed entries at `from_date`
+    """
+
+    def __init__(
+        self, from_date: str, last_op_id: Optional[str] = None, sequence: Optional[int] = None, offset: int = 0
+    ):
+        super().__init__(from_date, last_op_id)
+        self.sequence = sequence
+        self.offset = offset
+
+    def params(self) -> Dict[str, Any]:
+        params: Dict[str, Any] = {'from_date': self.from_date}
+        if self.offset:
+            params['from_'] = self.offset
+        return params
+
+    def consume(self, history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        entries = []
+        for entry in history:
+            op_id = entry['account_history']['operation_id']
+            sequence = entry['account_history']['sequence']
+            if self.sequence is not None:
+                if sequence <= self.sequence:
+                    log.debug('skipping already seen entry {}'.format(op_id))
+                    continue
+            elif self.last_op_id:
+                # Continuing from op id only, skip entries until it's found
+                if op_id == self.last_op_id:
+                    self.sequence = sequence
+                log.debug('skipping entry {}'.format(op_id))
+                continue
+            entries.append(entry)
+            self.sequence = sequence
+
+        for entry in history:
+            op_date = entry['block_data']['block_time']
+            if op_date == self.from_date:
+                self.offset += 1
+            else:
+                self.from_date = op_date
+                self.offset = 1
+
+        if history and self.sequence is not None:
+            self.last_op_id = history[-1]['account_history']['operation_id']
+
+        return entries
+
+
+class PageSizer:
+    """Chooses size of the next page, making sure that pagination moves forward
+
+    Pages are requested from the date of the last seen entry, so when more entries share a block time than fit into a
+    page, e.g. after adaptive page size has shrunk, a full page has no new entries. Page size is doubled then until
+    the busy block is passed.
+
+    :param page_size: callable returning desired page size
+    :param HistoryCursor cursor: cursor of the paginated stream
+    """
+
+    def __init__(self, page_size: Callable[[], int], cursor: HistoryCursor):
+        self.page_size = page_size
+        self.cursor = cursor
+        self.min_size = 0
+        self.busy_date: Optional[str] = None
+
+    def next_size(self, size: int, entries: List[Dict[str, Any]]) -> int:
+        """Get size of the next page
+
+        :param int size: size of the last page, which was full
+        :param list entries: new entries of the last page
+        """
+        if not entries:
+            self.min_size = size * 2
+            self.busy_date = self.cursor.from_date
+            log.warning('No new entries at {}, increasing page size to {}'.format(self.busy_date, self.min_size))
+        elif self.cursor.from_date != self.busy_date:
+            self.min_size = 0
+        return max(self.page_size(), self.min_size)
@@ -0,0 +1,93 @@
+from decimal import Decimal
+from typing import Any, Dict, Union
+
+Number = Union[Decimal, float, int]
+
+# Same columns as consts.HEADER, ccGains generic format
+CSV_LINE_TEMPLATE = '{},{},{},{},{},{},{},{},{},{},{}\n'
+
+
+class ParsedOp:
+    """Parsed operation which becomes a single csv line
+
+    Trades have `order_id`, `prec`, `price` and `price_inverted` set, they are used for aggregation and logging only.
+    """
+
+    __slots__ = (
+        'kind',
+        'date',
+        'buy_cur',
+        'buy_amount',
+        'sell_cur',
+        'sell_amount',
+        'fee_cur',
+        'fee_amount',
+        'exchange',
+        'mark',
+        'comment',
+        'order_id',
+        'prec',
+        'price',
+        'price_inverted',
+    )
+
+    def __init__(
+        self,
+        kind: str = '',
+        date: str = '',
+        buy_cur: str = '',
+        buy_amount: Number = 0,
+        sell_cur: str = '',
+        sell_amount: Number = 0,
+        fee_cur: str = '',
+        fee_amount: Number = 0,
+        exchange: str = 'Bitshares',
+        mark: int = -1,
+        comment: str = '',
+        order_id: str = '',
+        prec: int = 0,
+        price: Number = 0,
+        price_inverted: Number = 0,
+    ):
+        self.kind = kind
+        self.date = date
+        self.buy_cur = buy_cur
+        self.buy_amount = buy_amount
+        self.sell_cur = sell_cur
+        self.sell_amount = sell_amount
+        self.fee_cur = fee_cur
+        self.fee_amount = fee_amount
+        self.exchange = exchange
+        self.mark = mark
+        self.comment = comment
+        self.order_id = order_id
+        self.prec = prec
+        self.price = price
+        self.price_inverted = price_inverted
+
+    def to_csv_line(self) -> str:
+        """Serialize into ccGains csv line"""
+        return CSV_LINE_TEMPLATE.format(
+            self.kind,
+            self.date,
+            self.buy_cur,
+            self.buy_amount,
+            self.sell_cur,
+            self.sell_amount,
+            self.fee_cur,
+            self.fee_amount,
+            self.exchange,
+            self.mark,
+            self.comment,
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, ParsedOp):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return 'ParsedOp({})'.format(', '.join('{}={!r}'.format(key, value) for key, value in self.as_dict().items()))
@@ -1,18 +1,40 @@
-import copy
 import json
 import logging
+import os
 from decimal import Decimal
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List, Optional, Set
 
+from bitshares import BitShares
 from bitshares.account import Account
-from bitshares.amount import Amount
-from bitshares.asset import Asset
 
-from .consts import LINE_DICT_TEMPLATE
+from . import json_decoder
+from .asset_cache import AccountCache, AssetCache
+from .parsed_op import ParsedOp
 
 log = logging.getLogger(__name__)
 
 
+def collect_object_ids(data: Any, asset_ids: Set[str], account_ids: Optional[Set[str]] = None):
+    """Recursively collect asset and account ids referenced by operation data
+
+    :param data: operation data
+    :param set asset_ids: set to add asset ids to
+    :param set account_ids: set to add account ids to, None to skip accounts
+    """
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if key == 'asset_id':
+                asset_ids.add(value)
+            elif key in ('from', 'to') and isinstance(value, str):
+                if account_ids is not None:
+                    account_ids.add(value)
+            else:
+                collect_object_ids(value, asset_ids, account_ids)
+    elif isinstance(data, list):
+        for value in data:
+            collect_object_ids(value, asset_ids, account_ids)
+
+
 class ParserError(Exception):
     pass
 
@@ -26,19 +48,71 @@ class Parser:
 
     :param BitShares bitshares_instance:
     :param Account account:
+    :param AssetCache asset_cache: asset metadata cache, in-memory cache is used if not set
     """
 
-    def __init__(self, bitshares_instance, account):
+    def __init__(self, bitshares_instance, account, asset_cache: Optional[AssetCache] = None):
         self.bitshares = bitshares_instance
         self.account = Account(account, bitshares_instance=self.bitshares)
+        self.assets = asset_cache if asset_cache is not None else AssetCache(self.bitshares)
+        self.accounts = AccountCache(self.bitshares)
+        # Operations and results decoded by collect_ids(), by operation id
+        self._decoded_ops: Dict[str, Any] = {}
+        self._decoded_results: Dict[str, Any] = {}
+
+    @classmethod
+    def from_snapshot(cls, filename: str) -> 'Parser':
+        """Create parser which works without node connection using metadata snapshot
+
+        :param str filename: snapshot file written by :meth:`export_snapshot`
+        """
+        with open(filename) as fd:
+            return cls.from_snapshot_data(json.load(fd))
+
+    @classmethod
+    def from_snapshot_data(cls, snapshot: Dict[str, Any]) -> 'Parser':
+        """Create offline parser from snapshot dict, see :meth:`snapshot`"""
+        parser = cls.__new__(cls)
+        # Offline instance is needed to construct Amount objects
+        parser.bitshares = BitShares(node=None, offline=True)
+        parser.account = snapshot['account']
+        parser.assets = AssetCache(parser.bitshares)
+        parser.assets.load(snapshot['assets'])
+        parser.accounts = AccountCache(parser.bitshares)
+        parser.accounts.load(snapshot['accounts'])
+        parser._decoded_ops = {}
+        parser._decoded_results = {}
+        return parser
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get our account and all known assets and accounts metadata"""
+        return {
+            'account': {'id': self.account['id'], 'name': self.account['name']},
+            'assets': self.assets.dump(),
+            'accounts': self.accounts.dump(),
+        }
+
+    def export_snapshot(self, filename: str):
+        """Save metadata snapshot into file
+
+        :param str filename: path to snapshot file
+        """
+        tmp_filename = '{}.tmp'.format(filename)
+        with open(tmp_filename, 'w') as fd:
+            json.dump(self.snapshot(), fd, indent=2)
+        os.replace(tmp_filename, filename)
 
     def load_op(self, entry):
         """Try to load operation from account history entry
 
         :param dict entry:
         """
+        if self._decoded_ops:
+            op = self._decoded_ops.get(entry['account_history']['operation_id'])
+            if op is not None:
+                return op
         try:
-            op = json.loads(entry['operation_history']['op'])[1]
+            op = json_decoder.loads(entry['operation_history']['op'])[1]
         except json.decoder.JSONDecodeError:
             try:
                 op = entry['operation_history']['op_object']
@@ -47,84 +121,119 @@ class Parser:
         return op
 
     def load_operation_result(self, entry: Dict[str, Any]) -> List[Any]:
+        if self._decoded_results:
+            result = self._decoded_results.get(entry['account_history']['operation_id'])
+            if result is not None:
+                return result
         try:
-            op = json.loads(entry['operation_history']['operation_result'])
+            op = json_decoder.loads(entry['operation_history']['operation_result'])
         except json.decoder.JSONDecodeError:
             raise ValueError(f'Could not find operation result data in entry: {entry}')
         return op
 
-    def parse_transfer_entry(self, entry):
-        """Parse single transfer entry into a dict object suitable for writing line
+    def collect_ids(
+        self, entries: Iterable[Dict[str, Any]], asset_ids: Set[str], account_ids: Optional[Set[str]] = None
+    ):
+        """Collect asset and account ids referenced by entries
+
+        Decoded operations are kept until the next call, so parsing the same entries doesn't decode them again.
+
+        :param list entries: elastic wrapper entries
+        :param set asset_ids: set to add asset ids to
+        :param set account_ids: set to add account ids to, None to skip accounts
+        """
+        self._decoded_ops = {}
+        self._decoded_results = {}
+        ops = {}
+        results = {}
+        for entry in entries:
+            try:
+                op_id = entry['account_history']['operation_id']
+                op = ops[op_id] = self.load_op(entry)
+                collect_object_ids(op, asset_ids, account_ids)
+                result = results[op_id] = self.load_operation_result(entry)
+                collect_object_ids(result, asset_ids, account_ids)
+            except (ValueError, KeyError, TypeError):
+                # Entry will be reported when parsed
+                pass
+        self._decoded_ops = ops
+        self._decoded_results = results
+
+    def prefetch(self, entries: Iterable[Dict[str, Any]]) -> Set[str]:
+        """Resolve all assets and accounts referenced by entries using batched node requests
+
+        Call before parsing a page of entries to avoid node round trip per entry.
+
+        :param list entries: elastic wrapper entries
+        :return: ids of assets referenced by entries
+        """
+        asset_ids: Set[str] = set()
+        # Account names are resolved for logging only
+        account_ids: Optional[Set[str]] = set() if log.isEnabledFor(logging.INFO) else None
+        self.collect_ids(entries, asset_ids, account_ids)
+        self.assets.prefetch(asset_ids)
+        if account_ids:
+            self.accounts.prefetch(account_ids)
+        return asset_ids
+
+    def parse_transfer_entry(self, entry) -> ParsedOp:
+        """Parse single transfer entry into a record suitable for writing line
 
         :param dict entry: elastic wrapper entry
-        :return: dict object suitable for writing line
+        :return: parsed operation
         """
 
         op_id = entry['account_history']['operation_id']
         op_date = entry['block_data']['block_time']
         op = self.load_op(entry)
 
-        data = copy.deepcopy(LINE_DICT_TEMPLATE)
+        data = ParsedOp(comment=op_id, date=op_date)
 
         raw_amount = op['amount'] if 'amount' in op else op['amount_']
-        amount = Amount(raw_amount, bitshares_instance=self.bitshares)
-        from_account = Account(op['from'], bitshares_instance=self.bitshares)
-        to_account = Account(op['to'], bitshares_instance=self.bitshares)
-        fee = Amount(op['fee'], bitshares_instance=self.bitshares)
-        log.info('Transfer: {} -> {}, {}'.format(from_account.name, to_account.name, amount))
-
-        if from_account.name == self.account.name:
-            data['kind'] = 'Withdrawal'
-            data['sell_cur'] = amount.symbol
-            data['sell_amount'] = amount.amount
-            data['fee_cur'] = fee.symbol
-            data['fee_amount'] = fee.amount
+        amount = self.assets.amount(raw_amount)
+        fee = self.assets.amount(op['fee'])
+        if log.isEnabledFor(logging.INFO):
+            # Account names are needed only for logging
+            log.info(
+                'Transfer: {} -> {}, {}'.format(self.accounts.name(op['from']), self.accounts.name(op['to']), amount)
+            )
+
+        if op['from'] == self.account['id']:
+            data.kind = 'Withdrawal'
+            data.sell_cur = amount.symbol
+            data.sell_amount = amount.amount
+            data.fee_cur = fee.symbol
+            data.fee_amount = fee.amount
         else:
-            data['kind'] = 'Deposit'
-            data['buy_cur'] = amount.symbol
-            data['buy_amount'] = amount.amount
-
-        data['comment'] = op_id
-        data['date'] = op_date
+            data.kind = 'Deposit'
+            data.buy_cur = amount.symbol
+            data.buy_amount = amount.amount
 
         return data
 
-    def parse_trade_entry(self, entry):
-        """Parse single trade entry (fill order) into a dict object suitable for writing line
+    def parse_trade_entry(self, entry) -> ParsedOp:
+        """Parse single trade entry (fill order) into a record suitable for writing line
 
         :param dict entry: elastic wrapper entry
-        :return: dict object suitable for writing line
+        :return: parsed operation
         """
 
         op_id = entry['account_history']['operation_id']
         op = self.load_op(entry)
 
-        data = copy.deepcopy(LINE_DICT_TEMPLATE)
-
-        sell_asset = Asset(op['pays']['asset_id'], bitshares_instance=self.bitshares)
+        sell_asset = self.assets.get(op['pays']['asset_id'])
         sell_amount = Decimal(op['pays']['amount']).scaleb(-sell_asset['precision'])
-        buy_asset = Asset(op['receives']['asset_id'], bitshares_instance=self.bitshares)
+        buy_asset = self.assets.get(op['receives']['asset_id'])
         buy_amount = Decimal(op['receives']['amount']).scaleb(-buy_asset['precision'])
-        fee_asset = Asset(op['fee']['asset_id'], bitshares_instance=self.bitshares)
+        fee_asset = self.assets.get(op['fee']['asset_id'])
         fee_amount = Decimal(op['fee']['amount']).scaleb(-fee_asset['precision'])
 
         # Subtract fee from buy_amount
         # For ccgains, any fees for the transaction should already have been subtracted from *amount*, but included
         # in *cost*.
-        if fee_asset.symbol == buy_asset.symbol:
+        if fee_asset['symbol'] == buy_asset['symbol']:
             buy_amount -= fee_amount
 
-        data['kind'] = 'Trade'
-        data['sell_cur'] = sell_asset.symbol
-        data['sell_amount'] = sell_amount
-        data['buy_cur'] = buy_asset.symbol
-        data['buy_amount'] = buy_amount
-        data['fee_cur'] = fee_asset.symbol
-        data['fee_amount'] = fee_amount
-        data['comment'] = op_id
-        data['order_id'] = op['order_id']
-        data['prec'] = max(sell_asset['precision'], buy_asset['precision'])
-
         # Prevent division by zero
         price = Decimal('0')
         price_inverted = Decimal('0')
@@ -132,13 +241,23 @@ class Parser:
             price = buy_amount / sell_amount
             price_inverted = sell_amount / buy_amount
 
-        data['price'] = price
-        data['price_inverted'] = price_inverted
-        data['date'] = entry['block_data']['block_time']
-
-        return data
+        return ParsedOp(
+            kind='Trade',
+            date=entry['block_data']['block_time'],
+            buy_cur=buy_asset['symbol'],
+            buy_amount=buy_amount,
+            sell_cur=sell_asset['symbol'],
+            sell_amount=sell_amount,
+            fee_cur=fee_asset['symbol'],
+            fee_amount=fee_amount,
+            comment=op_id,
+            order_id=op['order_id'],
+            prec=max(sell_asset['precision'], buy_asset['precision']),
+            price=price,
+            price_inverted=price_inverted,
+        )
 
-    def parse_settle_entry(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+    def parse_settle_entry(self, entry: Dict[str, Any]) -> ParsedOp:
         op_id = entry['account_history']['operation_id']
         op = self.load_op(entry)
         operation_result = self.load_operation_result(entry)
@@ -150,12 +269,12 @@ class Parser:
                 # New-style regular settlement, results are filled orders and available as trade
                 raise UnsupportedSettleEntry
             # TODO: is it possible to have more than 1 entry in 'paid'/'received'???
-            sell_amount = Amount(op_result_data['paid'][0], bitshares_instance=self.bitshares)
-            buy_amount = Amount(op_result_data['received'][0], bitshares_instance=self.bitshares)
+            sell_amount = self.assets.amount(op_result_data['paid'][0])
+            buy_amount = self.assets.amount(op_result_data['received'][0])
         elif op_number_in_result == 2:
             # Old-style GS settle
-            sell_amount = Amount(op['amount_'], bitshares_instance=self.bitshares)
-            buy_amount = Amount(op_result_data, bitshares_instance=self.bitshares)
+            sell_amount = self.assets.amount(op['amount_'])
+            buy_amount = self.assets.amount(op_result_data)
         else:
             # We are not interested in regular settlements, because their results are filled orders
             raise UnsupportedSettleEntry
@@ -164,7 +283,7 @@ class Parser:
         )
 
         # TODO: can we also expect non-0 fee from operation_result?
-        fee = Amount(op['fee'], bitshares_instance=self.bitshares)
+        fee = self.assets.amount(op['fee'])
 
         # Subtract fee from buy_amount
         # For ccgains, any fees for the transaction should already have been subtracted from *amount*, but included
@@ -172,17 +291,6 @@ class Parser:
         if fee.symbol == buy_amount.symbol:
             buy_amount -= fee
 
-        data = copy.deepcopy(LINE_DICT_TEMPLATE)
-        data['kind'] = 'Trade'
-        data['sell_cur'] = sell_amount.symbol
-        data['sell_amount'] = sell_amount.amount
-        data['buy_cur'] = buy_amount.symbol
-        data['buy_amount'] = buy_amount.amount
-        data['fee_cur'] = fee.symbol
-        data['fee_amount'] = fee.amount
-        data['comment'] = op_id
-        data['prec'] = max(sell_amount.asset['precision'], buy_amount.asset['precision'])
-
         # Prevent division by zero
         price = Decimal('0')
         price_inverted = Decimal('0')
@@ -190,8 +298,17 @@ class Parser:
             price = buy_amount.amount / sell_amount.amount
             price_inverted = sell_amount.amount / buy_amount.amount
 
-        data['price'] = price
-        data['price_inverted'] = price_inverted
-        data['date'] = entry['block_data']['block_time']
-
-        return data
+        return ParsedOp(
+            kind='Trade',
+            date=entry['block_data']['block_time'],
+            buy_cur=buy_amount.symbol,
+            buy_amount=buy_amount.amount,
+            sell_cur=sell_amount.symbol,
+            sell_amount=sell_amount.amount,
+            fee_cur=fee.symbol,
+            fee_amount=fee.amount,
+            comment=op_id,
+            prec=max(sell_amount.asset['precision'], buy_amount.asset['precision']),
+            price=price,
+            price_inverted=price_inverted,
+        )
@@ -0,0 +1,231 @@
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+
+log = logging.getLogger(__name__)
+
+# Marks end of stage output
+_DONE = object()
+
+
+class _Failure:
+    """Exception raised inside stage thread, re-raised in consumer"""
+
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+class StageStats:
+    """Stage counters
+
+    :param str name: stage name
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        # Time spent producing items
+        self.busy = 0.0
+        # Time spent waiting for input from previous stage
+        self.starved = 0.0
+        # Time spent waiting for space in output queue
+        self.blocked = 0.0
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def throughput(self) -> float:
+        """Items per second"""
+        elapsed = self.elapsed
+        return self.items / elapsed if elapsed else 0.0
+
+    def __str__(self):
+        return '{}: {} items, {:.1f}/s, busy {:.2f}s, starved {:.2f}s, blocked {:.2f}s'.format(
+            self.name, self.items, self.throughput, self.busy, self.starved, self.blocked
+        )
+
+
+class Stage:
+    """Pipeline stage which runs in a background thread and passes results through bounded queue
+
+    Stage takes items from `source`, applies `func` to each of them and can be iterated over to get the results, in
+    the same order. When `source` is another stage, the stages run concurrently, e.g. next page is fetched while the
+    current one is being parsed.
+
+    :param str name: stage name
+    :param source: iterable of input items
+    :param func: function to apply to every item, items are passed as is if not set
+    :param finish: function called after the last item, its result is emitted as the last item
+    :param int maxsize: max number of items waiting in output queue
+    """
+
+    def __init__(
+        self,
+        name: str,
+        source: Iterable,
+        func: Optional[Callable[[Any], Any]] = None,
+        finish: Optional[Callable[[], Any]] = None,
+        maxsize: int = 2,
+    ):
+        self.source = source
+        self.func = func
+        self.finish = finish
+        self.maxsize = maxsize
+        self.stats = StageStats(name)
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def name(self) -> str:
+        return self.stats.name
+
+    @property
+    def depth(self) -> int:
+        """Number of items waiting in output queue"""
+        return self._queue.qsize()
+
+    def _put(self, item: Any) -> bool:
+        start = time.monotonic()
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            self.stats.blocked += time.monotonic() - start
+            return True
+        return False
+
+    def _run(self):
+        self.stats.started = time.monotonic()
+        source = iter(self.source)
+        # Waiting for upstream stage is starvation, while reading plain iterator is the stage work itself
+        upstream = isinstance(self.source, Stage)
+        try:
+            while True:
+                start = time.monotonic()
+                try:
+                    item = next(source)
+                except StopIteration:
+                    break
+                fetched = time.monotonic()
+                if upstream:
+                    self.stats.starved += fetched - start
+                else:
+                    self.stats.busy += fetched - start
+                if self.func is not None:
+                    item = self.func(item)
+                    self.stats.busy += time.monotonic() - fetched
+                self.stats.items += 1
+                if not self._put(item):
+                    return
+            if self.finish is not None:
+                start = time.monotonic()
+                item = self.finish()
+                self.stats.busy += time.monotonic() - start
+                if not self._put(item):
+                    return
+            self._put(_DONE)
+        except BaseException as exc:
+            self._put(_Failure(exc))
+        finally:
+            self.stats.finished = time.monotonic()
+            # Stop upstream stages, also when they are wrapped into a generator
+            close = getattr(self.source, 'close', None)
+            if close is not None:
+                close()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='stage-{}'.format(self.name), daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """Stop the stage, e.g. when consumer is not interested in the rest of items"""
+        self._stopped.set()
+
+    def __iter__(self) -> Iterator[Any]:
+        self.start()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.exc
+                yield item
+        finally:
+            self.close()
+
+
+class Pipeline:
+    """Chain of stages connected by bounded queues
+
+    .. code-block:: python
+
+        pipeline = Pipeline('trades')
+        pages = pipeline.stage('fetch', iter_pages())
+        lines = pipeline.stage('parse', pages, parse_page)
+        pipeline.run('write', lines, fd.writelines)
+
+    :param str name: pipeline name
+    :param int maxsize: output queue size of every stage
+    """
+
+    def __init__(self, name: str, maxsize: int = 2):
+        self.name = name
+        self.maxsize = maxsize
+        self.stages: List[Stage] = []
+        self.sink: Optional[StageStats] = None
+
+    def stage(
+        self,
+        name: str,
+        source: Iterable,
+        func: Optional[Callable[[Any], Any]] = None,
+        finish: Optional[Callable[[], Any]] = None,
+    ) -> Stage:
+        """Add stage running in background thread"""
+        stage = Stage(name, source, func=func, finish=finish, maxsize=self.maxsize)
+        self.stages.append(stage)
+        return stage
+
+    def run(self, name: str, source: Stage, func: Callable[[Any], Any]):
+        """Consume the last stage output in current thread
+
+        :param str name: sink stage name
+        :param Stage source: stage to consume
+        :param func: function to call for every item
+        """
+        self.sink = stats = StageStats(name)
+        stats.started = time.monotonic()
+        items = iter(source)
+        try:
+            while True:
+                start = time.monotonic()
+                try:
+                    item = next(items)
+                except StopIteration:
+                    break
+                fetched = time.monotonic()
+                stats.starved += fetched - start
+                func(item)
+                stats.busy += time.monotonic() - fetched
+                stats.items += 1
+        finally:
+            stats.finished = time.monotonic()
+            source.close()
+
+    def __str__(self):
+        stages = ['{}, queue {}/{}'.format(stage.stats, stage.depth, stage.maxsize) for stage in self.stages]
+        if self.sink is not None:
+            stages.append(str(self.sink))
+        return '{} pipeline: {}'.format(self.name, '; '.join(stages))
@@ -0,0 +1,73 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, Tuple
+
+log = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket rate limiter
+
+    Thread-safe, can be shared between sync and async clients.
+
+    :param float rate: number of requests allowed per second
+    :param int burst: max number of requests which can be made at once after idle period
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError('Rate must be positive')
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token
+
+        :return: how many seconds caller must wait before making a request
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Tokens may go negative, which means there is a queue of callers waiting for them
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        """Block until request is allowed"""
+        delay = self.reserve()
+        if delay:
+            log.debug('Rate limited, sleeping {:.3f}s'.format(delay))
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """Wait until request is allowed without blocking event loop"""
+        delay = self.reserve()
+        if delay:
+            log.debug('Rate limited, sleeping {:.3f}s'.format(delay))
+            await asyncio.sleep(delay)
+
+
+_limiters: Dict[Tuple[str, float, int], TokenBucket] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(url: str, rate: float, burst: int = 1) -> TokenBucket:
+    """Get rate limiter shared by all clients of the same wrapper url within the process
+
+    :param str url: wrapper url
+    :param float rate: number of requests allowed per second
+    :param int burst: max number of requests which can be made at once
+    """
+    key = (url, rate, burst)
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = TokenBucket(rate, burst=burst)
+        return _limiters[key]
@@ -0,0 +1,86 @@
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import List, Optional
+
+import requests
+
+from bitshares_tradehistory_analyzer.wrapper import Wrapper, make_session
+
+log = logging.getLogger(__name__)
+
+# Account used to probe wrappers
+PROBE_ACCOUNT_ID = '1.2.22'
+
+
+@dataclass
+class WrapperScore:
+    url: str
+    alive: bool
+    version: Optional[int] = None
+    requests: int = 0
+    errors: int = 0
+    p50: Optional[float] = None
+    p95: Optional[float] = None
+    checked_at: str = ''
+
+
+def probe_wrapper(url: str, probes: int = 5, timeout: float = 5) -> WrapperScore:
+    """Measure wrapper latency by making several small history queries
+
+    :param str url: ES wrapper url
+    :param int probes: number of queries to make
+    :param float timeout: timeout for a single request, in seconds
+    """
+    checked_at = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S')
+    try:
+        wrapper = Wrapper(url, PROBE_ACCOUNT_ID, timeout=timeout, max_retries=0, session=make_session(1))
+        for _ in range(probes):
+            wrapper.get_transfers(size=1)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        log.debug('Wrapper {} failed: {}'.format(url, e))
+        return WrapperScore(url=url, alive=False, checked_at=checked_at)
+
+    return WrapperScore(
+        url=url,
+        alive=True,
+        version=wrapper.version,
+        requests=wrapper.stats.requests,
+        errors=wrapper.stats.errors,
+        p50=wrapper.stats.percentile(50),
+        p95=wrapper.stats.percentile(95),
+        checked_at=checked_at,
+    )
+
+
+def probe_wrappers(urls: List[str], probes: int = 5, timeout: float = 5) -> List[WrapperScore]:
+    """Probe all wrappers concurrently
+
+    :return: scores ordered from the best to the worst
+    """
+    if not urls:
+        return []
+    with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+        scores = list(executor.map(lambda url: probe_wrapper(url, probes=probes, timeout=timeout), urls))
+    return sorted(scores, key=lambda score: (not score.alive, score.p50 if score.p50 is not None else float('inf')))
+
+
+def save_scoreboard(filename: str, scores: List[WrapperScore]):
+    tmp_filename = '{}.tmp'.format(filename)
+    with open(tmp_filename, 'w') as fd:
+        json.dump([asdict(score) for score in scores], fd, indent=2)
+    os.replace(tmp_filename, filename)
+
+
+def load_scoreboard(filename: str) -> List[WrapperScore]:
+    with open(filename) as fd:
+        return [WrapperScore(**score) for score in json.load(fd)]
+
+
+def rank_wrappers(scores: List[WrapperScore]) -> List[str]:
+    """Get urls of alive wrappers, fastest first"""
+    alive = [score for score in scores if score.alive]
+    return [score.url for score in sorted(alive, key=lambda score: score.p50 or 0)]
@@ -0,0 +1,228 @@
+from array import array
+from decimal import Decimal, getcontext
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# Trade attributes kept as interned codes
+CODE_COLUMNS = ('kind', 'buycur', 'sellcur', 'feecur', 'exchange', 'mark')
+# Trade attributes kept as scaled integers
+AMOUNT_COLUMNS = ('buyval', 'sellval', 'feeval')
+
+_INT64_MIN = -(2**63)
+_INT64_MAX = 2**63 - 1
+_INT8_MIN = -128
+_INT8_MAX = 127
+
+
+def split_decimal(value: Any) -> Tuple[int, int]:
+    """Split number into integer mantissa and decimal exponent, so that value == mantissa * 10 ** exponent
+
+    Exponent is kept as is, e.g. Decimal('1.50') is (150, -2), so the value is restored exactly by
+    :func:`join_decimal`.
+    """
+    sign, digits, exponent = Decimal(value).as_tuple()
+    if not isinstance(exponent, int):
+        raise ValueError('Cannot store {} in TradeTable'.format(value))
+    mantissa = int(''.join(map(str, digits))) if digits else 0
+    return -mantissa if sign else mantissa, exponent
+
+
+def join_decimal(mantissa: int, exponent: int) -> Decimal:
+    return Decimal(int(mantissa)).scaleb(int(exponent))
+
+
+def sum_decimals(mantissas: np.ndarray, exponents: np.ndarray, groups: np.ndarray, n_groups: int) -> List[Decimal]:
+    """Sum amounts by groups, result is the same as of adding group amounts one by one to Decimal('0')
+
+    Decimal addition keeps the smallest exponent of addends, so amounts of a group are scaled to the smallest exponent
+    and summed as integers. Groups whose sum doesn't fit into Decimal context precision, or which have negative amounts,
+    are summed one by one to get the same rounding.
+
+    :param mantissas: amount mantissas, see :meth:`TradeTable.amounts`
+    :param exponents: amount exponents
+    :param groups: group number of every amount, from 0 to `n_groups` - 1
+    :param int n_groups: number of groups
+    :return: sums of groups, Decimal('0') for empty groups
+    """
+    exponents = exponents.astype(np.int64)
+    min_exponents = np.zeros(n_groups, dtype=np.int64)
+    np.minimum.at(min_exponents, groups, exponents)
+    shifts = exponents - min_exponents[groups]
+
+    # Sum as int64 when it surely doesn't overflow, as python ints otherwise
+    estimates = np.zeros(n_groups)
+    np.add.at(estimates, groups, np.abs(mantissas).astype(np.float64) * np.power(10.0, shifts))
+    if mantissas.dtype == object or (len(shifts) and (shifts.max() > 18 or estimates.max() >= 2**62)):
+        scaled = mantissas.astype(object) * np.array([10**shift for shift in shifts.tolist()], dtype=object)
+        sums = np.zeros(n_groups, dtype=object)
+    else:
+        scaled = mantissas * np.power(10, shifts, dtype=np.int64)
+        sums = np.zeros(n_groups, dtype=np.int64)
+    np.add.at(sums, groups, scaled)
+
+    negative = np.zeros(n_groups, dtype=bool)
+    negative[groups[(mantissas < 0).astype(bool)]] = True
+    precision = getcontext().prec
+    result = []
+    for group, (total, exponent) in enumerate(zip(sums.tolist(), min_exponents.tolist())):
+        if negative[group] or len(str(abs(total))) > precision:
+            total = Decimal('0')
+            for index in np.flatnonzero(groups == group):
+                total += join_decimal(mantissas[index], exponents[index])
+            result.append(total)
+        else:
+            result.append(join_decimal(total, exponent))
+    return result
+
+
+class TradeRow:
+    """Read-only view of a TradeTable row, has the same attributes as :class:`ccgains_helper.Trade`"""
+
+    __slots__ = ('_table', '_index')
+
+    def __init__(self, table: 'TradeTable', index: int):
+        self._table = table
+        self._index = index
+
+    @property
+    def dtime(self) -> pd.Timestamp:
+        return pd.Timestamp(self._table._dtime[self._index], tz='UTC')
+
+    @property
+    def comment(self) -> str:
+        return self._table._comments[self._index]
+
+    def __getattr__(self, name: str) -> Any:
+        table = self._table
+        if name in CODE_COLUMNS:
+            return table.values[table._codes[name][self._index]]
+        if name in AMOUNT_COLUMNS:
+            mantissa, exponent = table._amounts[name]
+            return join_decimal(mantissa[self._index], exponent[self._index])
+        raise AttributeError(name)
+
+    def __repr__(self):
+        return '<TradeRow {}: {} {} {} -> {} {} @ {}>'.format(
+            self._index, self.kind, self.sellval, self.sellcur, self.buyval, self.buycur, self.dtime
+        )
+
+
+class TradeTable:
+    """Columnar storage of trades
+
+    Dates are int64 nanoseconds since epoch in UTC, currencies and other repeating strings are interned and stored as
+    int32 codes, amounts are int64 mantissas with int8 decimal exponents, so Decimal values including their exponents
+    are restored exactly. A row takes about 60 bytes plus the comment string, while a Trade object takes about 1 KB.
+    Once an amount with more than 18 digits is added, mantissas of its column are kept as python ints instead.
+
+    Rows are accessed as :class:`TradeRow` objects, which can be used instead of trades, columns are accessed with
+    :meth:`column` and :meth:`amounts` for vectorized processing.
+    """
+
+    def __init__(self):
+        # Interned values and their codes
+        self.values: List[Any] = []
+        self._value_codes: Dict[Any, int] = {}
+        self._dtime = array('q')
+        self._codes = {name: array('i') for name in CODE_COLUMNS}
+        self._amounts: Dict[str, Tuple[Union[array, List[int]], array]] = {
+            name: (array('q'), array('b')) for name in AMOUNT_COLUMNS
+        }
+        self._comments: List[str] = []
+
+    @classmethod
+    def from_trades(cls, trades: Iterable[Any]) -> 'TradeTable':
+        """Build table from trades, e.g. from :class:`ccgains_helper.TradeStream`"""
+        table = cls()
+        table.extend(trades)
+        return table
+
+    def code(self, value: Any) -> int:
+        """Get code of interned value, adding it if needed"""
+        code = self._value_codes.get(value)
+        if code is None:
+            code = self._value_codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def append(self, trade: Any):
+        """Add trade as the last row
+
+        :raises ValueError: if an amount can't be stored, the table is not changed then
+        """
+        # Everything is checked before the first column is changed, so columns always have the same length
+        dtime = trade.dtime.value
+        amounts = [split_decimal(getattr(trade, name)) for name in AMOUNT_COLUMNS]
+        for name, (mantissa, exponent) in zip(AMOUNT_COLUMNS, amounts):
+            if not _INT8_MIN <= exponent <= _INT8_MAX:
+                raise ValueError('Cannot store {} {} in TradeTable'.format(name, getattr(trade, name)))
+        values = [getattr(trade, name) for name in CODE_COLUMNS]
+        comment = trade.comment
+
+        self._dtime.append(dtime)
+        for name, value in zip(CODE_COLUMNS, values):
+            self._codes[name].append(self.code(value))
+        for name, (mantissa, exponent) in zip(AMOUNT_COLUMNS, amounts):
+            mantissas, exponents = self._amounts[name]
+            if isinstance(mantissas, array) and not _INT64_MIN <= mantissa <= _INT64_MAX:
+                mantissas = list(mantissas)
+                self._amounts[name] = (mantissas, exponents)
+            mantissas.append(mantissa)
+            exponents.append(exponent)
+        self._comments.append(comment)
+
+    def extend(self, trades: Iterable[Any]):
+        for trade in trades:
+            self.append(trade)
+
+    def __len__(self) -> int:
+        return len(self._dtime)
+
+    def __getitem__(self, index: int) -> TradeRow:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('TradeTable index out of range')
+        return TradeRow(self, index)
+
+    def __iter__(self) -> Iterator[TradeRow]:
+        return (TradeRow(self, index) for index in range(len(self)))
+
+    def column(self, name: str) -> np.ndarray:
+        """Get copy of a column
+
+        :param str name: `dtime` for datetime64 array, `comment` for object array, one of :data:`CODE_COLUMNS`
+            for array of codes, use :attr:`values` to decode them
+        """
+        if name == 'dtime':
+            return np.array(self._dtime, dtype=np.int64).view('datetime64[ns]')
+        if name == 'comment':
+            return np.array(self._comments, dtype=object)
+        return np.array(self._codes[name], dtype=np.int32)
+
+    def amounts(self, name: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Get mantissas and exponents of amounts column, one of :data:`AMOUNT_COLUMNS`
+
+        Mantissas are int64, or python ints in object array if the column has amounts with more than 18 digits
+        """
+        mantissas, exponents = self._amounts[name]
+        dtype = np.int64 if isinstance(mantissas, array) else object
+        return np.array(mantissas, dtype=dtype), np.array(exponents, dtype=np.int8)
+
+    def values_of(self, name: str) -> np.ndarray:
+        """Get decoded values of interned column"""
+        return np.array(self.values, dtype=object)[self.column(name)]
+
+    def find_code(self, value: Any) -> Optional[int]:
+        """Get code of value without adding it, None if it's not in the table"""
+        return self._value_codes.get(value)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory taken by columns, without comment strings"""
+        arrays = [self._dtime] + list(self._codes.values())
+        arrays += [column for pair in self._amounts.values() for column in pair]
+        # Lists are counted by pointer size only
+        return sum(getattr(column, 'itemsize', 8) * len(column) for column in arrays) + 8 * len(self._comments)
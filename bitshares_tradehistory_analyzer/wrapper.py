@@ -1,62 +1,216 @@
+import logging
+import random
+import threading
+import time
 import urllib.parse
+from collections import deque
 from json.decoder import JSONDecodeError
+from typing import Optional
 
 import requests
+from requests.adapters import HTTPAdapter
 
+from bitshares_tradehistory_analyzer import json_decoder
+from bitshares_tradehistory_analyzer.rate_limiter import get_rate_limiter
 
-class Wrapper:
-    """Wrapper for querying bitshares elasticsearch wrapper"""
+log = logging.getLogger(__name__)
 
-    def __init__(self, url, account_id, size=200):
+# Server-side errors which are worth retrying
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+# Requests per second to a wrapper when no rate limit is configured, public wrappers are shared by everyone
+DEFAULT_RATE_LIMIT = 1.0
+
+
+def make_session(pool_size: int = 10) -> requests.Session:
+    """Create HTTP session with keep-alive connection pool
+
+    :param pool_size: max number of connections kept open per host
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class RequestStats:
+    """Latency statistics of requests made to the wrapper
+
+    :param int maxlen: how many latest latencies to keep for percentiles calculation
+    """
+
+    def __init__(self, maxlen: int = 1000):
+        self.latencies: deque = deque(maxlen=maxlen)
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_time = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, latency: float, error: bool = False):
+        with self._lock:
+            self.requests += 1
+            self.total_time += latency
+            self.latencies.append(latency)
+            if error:
+                self.errors += 1
+
+    def add_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    @property
+    def last(self) -> Optional[float]:
+        """Latency of the most recent request, in seconds"""
+        return self.latencies[-1] if self.latencies else None
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Get latency percentile over recent requests
+
+        :param percent: percentile in 0..100 range
+        """
+        with self._lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(round(percent / 100 * (len(latencies) - 1))))
+        return latencies[index]
+
+    def __str__(self):
+        if not self.requests:
+            return 'no requests'
+        return '{} requests, {} errors, {} retries, avg {:.3f}s, p50 {:.3f}s, p95 {:.3f}s'.format(
+            self.requests,
+            self.errors,
+            self.retries,
+            self.total_time / self.requests,
+            self.percentile(50),
+            self.percentile(95),
+        )
+
+
+class PageSizeController:
+    """Adapts page size to observed wrapper performance
+
+    Page size grows while full pages are fetched fast, and shrinks on slow responses, large payloads and server
+    errors, staying within configured bounds.
+
+    :param int size: initial page size
+    :param int min_size: lower bound of page size
+    :param int max_size: upper bound of page size
+    :param float target_latency: desired request latency, in seconds
+    :param int max_bytes: desired upper bound of response payload size
+    """
+
+    grow_factor = 1.5
+    shrink_factor = 0.5
+
+    def __init__(self, size=200, min_size=20, max_size=2000, target_latency=2.0, max_bytes=4 * 1024 * 1024):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_latency = target_latency
+        self.max_bytes = max_bytes
+        self._size = self._clamp(size)
+        self._lock = threading.Lock()
+
+    def _clamp(self, size: float) -> int:
+        return max(self.min_size, min(self.max_size, int(size)))
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def observe(self, size: int, count: int, latency: float, nbytes: int, error: bool = False):
+        """Account result of a request
+
+        :param int size: requested page size
+        :param int count: number of entries received
+        :param float latency: request duration, in seconds
+        :param int nbytes: response payload size
+        :param bool error: whether request has failed
+        """
+        with self._lock:
+            if error or latency > self.target_latency or nbytes > self.max_bytes:
+                new_size = self._clamp(min(self._size, size) * self.shrink_factor)
+            elif count >= size and latency < self.target_latency / 2 and nbytes < self.max_bytes / 2:
+                # Only full pages tell that there is more data to fetch
+                new_size = self._clamp(max(self._size, size) * self.grow_factor)
+            else:
+                return
+            if new_size != self._size:
+                log.debug('Page size changed {} -> {}'.format(self._size, new_size))
+                self._size = new_size
+
+
+class BaseWrapper:
+    """Common part of sync and async ES wrapper clients: query building and request policy
+
+    :param str url: ES wrapper url
+    :param str account_id: account id in 1.2.x form
+    :param int size: page size
+    :param float timeout: timeout for a single HTTP request, in seconds
+    :param int max_retries: how many times to retry a request on connection errors and 5xx responses
+    :param float backoff_factor: base delay between retries, grows exponentially and jittered
+    :param dict adaptive_size: enable adaptive page size, dict contains :class:`PageSizeController` options
+    :param float rate_limit: max number of requests per second to the wrapper, shared by all clients of the same url,
+        :data:`DEFAULT_RATE_LIMIT` if not set, 0 to disable
+    :param int rate_burst: max number of requests which can be made at once
+    :param dict rate_limits: per-url rate limits overriding `rate_limit`
+    :param PageCache page_cache: save raw pages into this cache
+    """
+
+    def __init__(
+        self,
+        url,
+        account_id,
+        size=200,
+        timeout=30,
+        max_retries=3,
+        backoff_factor=0.5,
+        adaptive_size=None,
+        rate_limit=None,
+        rate_burst=1,
+        rate_limits=None,
+        page_cache=None,
+    ):
         self.url = url
         self.account_id = account_id
         self.size = size
         self.version = 1
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.stats = RequestStats()
+        self.size_controller = None
+        if adaptive_size is not None:
+            self.size_controller = PageSizeController(size=size, **adaptive_size)
+        if rate_limit is None:
+            rate_limit = DEFAULT_RATE_LIMIT
+        rate_limit = (rate_limits or {}).get(url, rate_limit)
+        self.rate_limiter = get_rate_limiter(url, rate_limit, burst=rate_burst) if rate_limit else None
+        self.page_cache = page_cache
 
-        self.detect_version()
-
-    @staticmethod
-    def _request(url, payload):
-        response = requests.get(url, params=payload)
-        # Throw an exception if response was not 200
-        response.raise_for_status()
-        try:
-            result = response.json()
-        except JSONDecodeError:
-            print(str(response))
-            raise
-        return result
-
-    @staticmethod
-    def is_alive(url, endpoint="is_alive"):
-        """Check built-it ES wrapper metric to check whether it's alive"""
-        # Note: not usable for new BitShares Insight API
-        url = urllib.parse.urljoin(url, endpoint)
-        try:
-            response = requests.get(url, timeout=5)
-        except requests.exceptions.ConnectionError:
-            return False
-
-        if response.status_code == requests.codes.ok:
-            try:
-                return response.json().get('status') == 'ok'
-            except JSONDecodeError:
-                print(str(response))
-                return False
+    def page_size(self) -> int:
+        """Get page size for the next request"""
+        if self.size_controller is not None:
+            return self.size_controller.size
+        return self.size
 
-        return False
+    def _observe(self, payload, result, latency: float, nbytes: int, error: bool = False):
+        """Feed request results into page size controller"""
+        if self.size_controller is None or payload.get('size', 0) <= 1:
+            return
+        count = len(result) if isinstance(result, list) else 0
+        self.size_controller.observe(payload['size'], count, latency, nbytes, error=error)
 
-    @staticmethod
-    def is_alive_v2(url):
-        return Wrapper.is_alive(url, endpoint="status")
+    def _save_page(self, url, payload, result):
+        # Version detection and probes are not history pages
+        if self.page_cache is not None and payload.get('size', 0) > 1 and isinstance(result, list):
+            self.page_cache.put(url, payload, result)
 
-    def detect_version(self):
-        params = {'size': 1, 'account_id': '1.2.22'}
-        try:
-            self._query(params)
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 404:
-                self.version = 2
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, self.backoff_factor * 2**attempt)  # noqa: DUO102
 
     def get_transfers(self, *args, **kwargs):
         params = {'operation_type': 0}
@@ -74,7 +228,12 @@ class Wrapper:
         params = {'operation_type': 17}
         return self._query(params, *args, **kwargs)
 
-    def _query(self, params, *args, **kwargs):
+    def _build_query(self, params, cursor=None, **kwargs):
+        """Get url and payload for account history query
+
+        :param dict params: query params
+        :param HistoryCursor cursor: position in history stream to request page from
+        """
         if self.version == 1:
             url = urllib.parse.urljoin(self.url, 'get_account_history')
         elif self.version == 2:
@@ -92,7 +251,112 @@ class Wrapper:
         }
         payload.update(params)
 
+        if cursor is not None:
+            payload.update(cursor.params())
+
         if kwargs:
             payload.update(kwargs)
 
-        return self._request(url, payload)
+        return url, payload
+
+    def _query(self, params, *args, **kwargs):
+        raise NotImplementedError
+
+
+class Wrapper(BaseWrapper):
+    """Wrapper for querying bitshares elasticsearch wrapper
+
+    :param int pool_size: max number of keep-alive connections
+    :param requests.Session session: use existing session instead of creating a new one
+
+    See :class:`BaseWrapper` for the rest of params.
+    """
+
+    def __init__(self, url, account_id, size=200, pool_size=10, session=None, **kwargs):
+        super().__init__(url, account_id, size=size, **kwargs)
+        # Shared session is closed by its owner
+        self._own_session = session is None
+        self.session = session if session is not None else make_session(pool_size)
+
+        self.detect_version()
+
+    def close(self):
+        """Close keep-alive connections"""
+        if self._own_session:
+            self.session.close()
+
+    def _request(self, url, payload):
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            start = time.monotonic()
+            error = True
+            try:
+                response = self.session.get(url, params=payload, timeout=self.timeout)
+                # Throw an exception if response was not 200
+                response.raise_for_status()
+                error = False
+            except requests.exceptions.HTTPError as e:
+                if e.response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                    raise
+                log.warning('Got {} from {}, retrying'.format(e.response.status_code, url))
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                log.warning('Request to {} failed: {}, retrying'.format(url, e))
+            finally:
+                latency = time.monotonic() - start
+                self.stats.add(latency, error=error)
+                log.debug('Request to {} took {:.3f}s'.format(url, latency))
+
+            if not error:
+                break
+            self._observe(payload, None, latency, 0, error=True)
+            self.stats.add_retry()
+            time.sleep(self._backoff(attempt))
+
+        try:
+            result = json_decoder.loads(response.content)
+        except JSONDecodeError:
+            print(str(response))
+            raise
+        self._observe(payload, result, latency, len(response.content))
+        return result
+
+    @staticmethod
+    def is_alive(url, endpoint="is_alive", session=None, timeout=5):
+        """Check built-it ES wrapper metric to check whether it's alive"""
+        # Note: not usable for new BitShares Insight API
+        url = urllib.parse.urljoin(url, endpoint)
+        get = session.get if session is not None else requests.get
+        try:
+            response = get(url, timeout=timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            return False
+
+        if response.status_code == requests.codes.ok:
+            try:
+                return response.json().get('status') == 'ok'
+            except JSONDecodeError:
+                print(str(response))
+                return False
+
+        return False
+
+    @staticmethod
+    def is_alive_v2(url, session=None, timeout=5):
+        return Wrapper.is_alive(url, endpoint="status", session=session, timeout=timeout)
+
+    def detect_version(self):
+        params = {'size': 1, 'account_id': '1.2.22'}
+        try:
+            self._query(params)
+        except requests.exceptions.HTTPError as e:
+            if e.response.status_code == 404:
+                self.version = 2
+
+    def _query(self, params, *args, **kwargs):
+        url, payload = self._build_query(params, **kwargs)
+        result = self._request(url, payload)
+        self._save_page(url, payload, result)
+        return result
@@ -5,18 +5,25 @@ import logging
 
 from ruamel.yaml import YAML
 
-from bitshares_tradehistory_analyzer.wrapper import Wrapper
+from bitshares_tradehistory_analyzer.scoreboard import probe_wrappers, save_scoreboard
 
 log = logging.getLogger('bitshares_tradehistory_analyzer')
 
 
+def fmt_latency(latency):
+    return '{:.3f}s'.format(latency) if latency is not None else '-'
+
+
 def main():
     parser = argparse.ArgumentParser(
-        description='Analyze bitshares trading history using FIFO/LIFO/LPFO accounting methods',
+        description='Check configured elasticsearch wrappers and rank them by latency',
         epilog='Report bugs to: https://github.com/bitfag/bitshares-tradehistory-analyzer/issues',
     )
     parser.add_argument('-d', '--debug', action='store_true', help='enable debug output'),
     parser.add_argument('-c', '--config', default='./config.yml', help='specify custom path for config file')
+    parser.add_argument('-n', '--probes', type=int, default=5, help='number of requests to make to each wrapper')
+    parser.add_argument('-t', '--timeout', type=float, default=5, help='single request timeout, seconds')
+    parser.add_argument('-o', '--output', help='scoreboard file, overrides `scoreboard` config setting')
     args = parser.parse_args()
 
     # create logger
@@ -34,9 +41,20 @@ def main():
     with open(args.config, 'r') as ymlfile:
         conf = yaml.load(ymlfile)
 
-    for url in conf.get('wrappers', []):
-        alive = Wrapper.is_alive(url)
-        print('Wrapper {} is {}'.format(url, 'alive' if alive else 'not alive'))
+    scores = probe_wrappers(conf.get('wrappers', []), probes=args.probes, timeout=args.timeout)
+    for score in scores:
+        if score.alive:
+            print(
+                'Wrapper {} is alive, API v{}, p50 {}, p95 {}, {} errors'.format(
+                    score.url, score.version, fmt_latency(score.p50), fmt_latency(score.p95), score.errors
+                )
+            )
+        else:
+            print('Wrapper {} is not alive'.format(score.url))
+
+    scoreboard = args.output or conf.get('scoreboard', 'wrappers-scoreboard.json')
+    save_scoreboard(scoreboard, scores)
+    log.info('Scoreboard saved to {}'.format(scoreboard))
 
 
 if __name__ == '__main__':
@@ -1,16 +1,39 @@
 #!/usr/bin/env python
 
 import argparse
+import asyncio
 import logging
+import os.path
 import random
 
 from ruamel.yaml import YAML
 
 from bitshares_tradehistory_analyzer.history_downloader import HistoryDownloader
+from bitshares_tradehistory_analyzer.scoreboard import load_scoreboard, rank_wrappers
 
 log = logging.getLogger(__name__)
 
 
+def ranked_wrappers(conf):
+    """Get configured wrappers ordered by scoreboard written by check_elastic.py, fastest first
+
+    Wrappers which are not on the scoreboard are appended in random order, wrappers known to be dead are dropped
+    unless no alive wrapper left.
+    """
+    wrappers = list(conf['wrappers'])
+    random.shuffle(wrappers)  # noqa: DUO102
+    scoreboard = conf.get('scoreboard', 'wrappers-scoreboard.json')
+    if not os.path.exists(scoreboard):
+        return wrappers
+
+    scores = load_scoreboard(scoreboard)
+    log.info('Using wrappers scoreboard from {}'.format(scores[0].checked_at if scores else scoreboard))
+    scored = {score.url for score in scores}
+    ranked = [url for url in rank_wrappers(scores) if url in wrappers]
+    ranked += [url for url in wrappers if url not in scored]
+    return ranked or wrappers
+
+
 def main():
 
     parser = argparse.ArgumentParser(
@@ -20,9 +43,61 @@ def main():
     parser.add_argument('-d', '--debug', action='store_true', help='enable debug output'),
     parser.add_argument('-c', '--config', default='./config.yml', help='specify custom path for config file')
     parser.add_argument('-u', '--url', help='override URL of elasticsearch wrapper plugin')
+    parser.add_argument(
+        '--failover', action='store_true', help='use all configured wrappers, routing requests to the fastest one'
+    )
     parser.add_argument('--no-aggregate', action='store_true', help='do not aggregate trades by same order')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=1, help='number of history streams (transfers/trades/gs) to fetch in parallel'
+    )
+    parser.add_argument(
+        '--shards',
+        type=int,
+        default=1,
+        help='split first-time trades download into this number of time windows fetched in parallel',
+    )
+    parser.add_argument(
+        '--shard-jobs', type=int, default=4, help='max number of --shards windows fetched and kept in memory at once'
+    )
+    parser.add_argument(
+        '--strict-cursor',
+        action='store_true',
+        help='paginate by entries sequence, so every operation is downloaded exactly once',
+    )
+    parser.add_argument(
+        '--asyncio', action='store_true', help='download all history streams concurrently using asyncio client'
+    )
+    parser.add_argument(
+        '--offline', metavar='SNAPSHOT', help='parse history using metadata snapshot file instead of BitShares node'
+    )
+    parser.add_argument(
+        '--export-snapshot',
+        metavar='SNAPSHOT',
+        help='save assets and accounts metadata needed for parsing into file, for later use with --offline',
+    )
+    parser.add_argument(
+        '--parse-workers',
+        type=int,
+        default=0,
+        help='parse history in this number of processes, useful for large accounts when parsing is the bottleneck',
+    )
+    parser.add_argument(
+        '--flush-rows',
+        type=int,
+        default=0,
+        help='write csv lines to disk in batches of at least this number of lines instead of after every page',
+    )
+    parser.add_argument(
+        '--replay',
+        action='store_true',
+        help='rebuild csv files from raw pages saved in `page_cache` directory, without requests to wrapper',
+    )
     parser.add_argument('account')
     args = parser.parse_args()
+    if args.asyncio and args.failover:
+        parser.error('--failover is not supported together with --asyncio')
+    if args.asyncio and args.shards > 1:
+        parser.error('--shards is not supported together with --asyncio')
 
     # create logger
     library_logger = logging.getLogger("bitshares_tradehistory_analyzer")
@@ -43,18 +118,48 @@ def main():
     with open(args.config, 'r') as ymlfile:
         conf = yaml.load(ymlfile)
 
+    wrapper_options = dict(conf.get('http') or {})
+    failover_options = {}
     if args.url:
         wrapper_url = args.url
+    elif args.failover:
+        wrapper_url = ranked_wrappers(conf)
+        failover_options = dict(conf.get('failover') or {})
     else:
-        wrapper_url = random.choice(conf['wrappers'])  # noqa: DUO102
+        wrapper_url = ranked_wrappers(conf)[0]
     log.info('Using wrapper {}'.format(wrapper_url))
 
     downloader = HistoryDownloader(
-        account=args.account, wrapper_url=wrapper_url, api_node=conf["nodes"], no_aggregate=args.no_aggregate
+        account=args.account,
+        wrapper_url=wrapper_url,
+        api_node=conf["nodes"],
+        no_aggregate=args.no_aggregate,
+        wrapper_options=wrapper_options,
+        failover_options=failover_options,
+        backfill_shards=args.shards,
+        backfill_jobs=args.shard_jobs,
+        strict_cursor=args.strict_cursor,
+        asset_cache_file=conf.get('asset_cache', 'assets-cache.sqlite'),
+        snapshot_file=args.offline,
+        page_cache_dir=conf.get('page_cache'),
+        replay=args.replay,
+        parse_workers=args.parse_workers,
+        flush_rows=args.flush_rows,
     )
-    downloader.fetch_transfers()
-    downloader.fetch_trades()
-    downloader.fetch_settlements_in_gs_state()
+    if args.asyncio and not args.replay:
+        asyncio.run(downloader.afetch_all())
+    else:
+        try:
+            downloader.fetch_all(jobs=args.jobs)
+            log.info('Wrapper requests: {}'.format(downloader.wrapper.stats))
+            for pipeline in downloader.pipelines:
+                log.info(str(pipeline))
+        finally:
+            downloader.close()
+
+    if args.export_snapshot:
+        downloader.parser.export_snapshot(args.export_snapshot)
+        log.info('Metadata snapshot saved to {}'.format(args.export_snapshot))
 
 
 if __name__ == '__main__':
@@ -1,6 +1,8 @@
 import pytest
 from bitshares import BitShares
 
+from bitshares_tradehistory_analyzer import wrapper
+
 
 @pytest.fixture(scope='session')
 def bitshares():
@@ -9,3 +11,9 @@ def bitshares():
     bitshares = BitShares(node="wss://eu.nodes.bitshares.ws")
 
     return bitshares
+
+
+@pytest.fixture(autouse=True)
+def no_default_rate_limit(monkeypatch):
+    """Don't throttle requests to mocked wrappers, tests of rate limiting set limits explicitly"""
+    monkeypatch.setattr(wrapper, 'DEFAULT_RATE_LIMIT', 0)
@@ -0,0 +1,98 @@
+import pytest
+from bitshares import BitShares
+
+from bitshares_tradehistory_analyzer import asset_cache
+from bitshares_tradehistory_analyzer.asset_cache import AssetCache
+
+ASSETS = {
+    '1.3.0': {'id': '1.3.0', 'symbol': 'BTS', 'precision': 5},
+    '1.3.121': {'id': '1.3.121', 'symbol': 'USD', 'precision': 4},
+    '1.3.113': {'id': '1.3.113', 'symbol': 'CNY', 'precision': 4},
+}
+
+
+@pytest.fixture()
+def lookups(monkeypatch):
+    """Replace node lookups with static assets, collecting looked up ids"""
+    looked_up = []
+
+    def fake_asset(asset_id, bitshares_instance=None):
+        looked_up.append(asset_id)
+        return ASSETS[asset_id]
+
+    monkeypatch.setattr(asset_cache, 'Asset', fake_asset)
+    return looked_up
+
+
+@pytest.fixture(scope='module')
+def offline_bitshares():
+    return BitShares(node=None, offline=True)
+
+
+def test_lru(lookups, offline_bitshares):
+    cache = AssetCache(offline_bitshares, maxsize=2)
+    assert cache.get('1.3.0')['symbol'] == 'BTS'
+    cache.get('1.3.121')
+    cache.get('1.3.0')
+    # 1.3.121 is least recently used and gets evicted
+    cache.get('1.3.113')
+    cache.get('1.3.0')
+    cache.get('1.3.121')
+    assert lookups == ['1.3.0', '1.3.121', '1.3.113', '1.3.121']
+
+
+def test_persistent_cache(lookups, offline_bitshares, tmp_path):
+    filename = str(tmp_path / 'assets.sqlite')
+    cache = AssetCache(offline_bitshares, filename=filename)
+    cache.get('1.3.0')
+    cache.get('1.3.121')
+    cache.close()
+
+    cache = AssetCache(offline_bitshares, filename=filename)
+    assert cache.get('1.3.0') == ASSETS['1.3.0']
+    assert cache.get('1.3.121') == ASSETS['1.3.121']
+    assert cache.lookups == 0
+    assert lookups == ['1.3.0', '1.3.121']
+
+
+def test_amount(lookups, offline_bitshares):
+    cache = AssetCache(offline_bitshares)
+    amount = cache.amount({'amount': 123456789, 'asset_id': '1.3.121'})
+    assert amount.symbol == 'USD'
+    assert amount.amount == 123456789 / 10**4
+    assert amount.asset['precision'] == 4
+    amount -= cache.amount({'amount': '6789', 'asset_id': '1.3.121'})
+    assert str(amount) == '12,345.0000 USD'
+
+
+class FakeRPC:
+    def __init__(self):
+        self.calls = []
+
+    def get_objects(self, object_ids):
+        self.calls.append(object_ids)
+        return [ASSETS.get(object_id) for object_id in object_ids]
+
+
+class FakeBitShares:
+    def __init__(self):
+        self.rpc = FakeRPC()
+
+
+def test_prefetch(lookups, tmp_path):
+    bitshares = FakeBitShares()
+    filename = str(tmp_path / 'assets.sqlite')
+    cache = AssetCache(bitshares, filename=filename)
+    cache.get('1.3.0')
+    cache.prefetch(['1.3.121', '1.3.0', '1.3.113', '1.3.121', '1.3.999'])
+    # Already known and unknown assets are not requested again
+    cache.prefetch(['1.3.121', '1.3.113', '1.3.0'])
+    assert bitshares.rpc.calls == [['1.3.113', '1.3.121', '1.3.999']]
+    assert cache.get('1.3.113') == ASSETS['1.3.113']
+    assert lookups == ['1.3.0']
+    cache.close()
+
+    # Prefetched assets are persisted
+    cache = AssetCache(FakeBitShares(), filename=filename)
+    cache.prefetch(['1.3.121', '1.3.113'])
+    assert cache.lookups == 0
@@ -0,0 +1,57 @@
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from bitshares_tradehistory_analyzer.async_wrapper import AsyncWrapper
+
+
+def run_with_server(handler, coro_factory):
+    """Run coroutine against local HTTP server answering by `handler`"""
+
+    async def _run():
+        app = web.Application()
+        app.router.add_get('/{endpoint}', handler)
+        server = TestServer(app)
+        await server.start_server()
+        try:
+            return await coro_factory(str(server.make_url('/')))
+        finally:
+            await server.close()
+
+    return asyncio.run(_run())
+
+
+def test_version_autodetect_2():
+    async def handler(request):
+        if request.match_info['endpoint'] == 'get_account_history':
+            raise web.HTTPNotFound()
+        return web.json_response([])
+
+    async def check(url):
+        async with AsyncWrapper(url, '1.2.222') as wrapper:
+            return wrapper.version
+
+    assert run_with_server(handler, check) == 2
+
+
+def test_retry_on_server_error():
+    calls = []
+
+    async def handler(request):
+        calls.append(dict(request.query))
+        if len(calls) == 2:
+            raise web.HTTPBadGateway()
+        return web.json_response([{'foo': 'bar'}])
+
+    async def check(url):
+        async with AsyncWrapper(url, '1.2.222', size=5, backoff_factor=0) as wrapper:
+            trades = await wrapper.get_trades(from_date='2020-01-01')
+            return wrapper, trades
+
+    wrapper, trades = run_with_server(handler, check)
+    assert trades == [{'foo': 'bar'}]
+    assert wrapper.stats.retries == 1
+    assert calls[-1]['operation_type'] == '4'
+    assert calls[-1]['from_date'] == '2020-01-01'
+    assert calls[-1]['size'] == '5'
@@ -0,0 +1,61 @@
+import pytest
+
+from bitshares_tradehistory_analyzer.batch_writer import BatchWriter, drop_torn_line
+from bitshares_tradehistory_analyzer.checkpoint import Checkpoint, load_checkpoint
+
+
+def make_checkpoint(op_num):
+    return Checkpoint(from_date='2020-01-01T00:00:00', last_op_id='1.11.{}'.format(op_num))
+
+
+def test_flush_every_page(tmp_path):
+    filename = tmp_path / 'out.csv'
+    filename.write_text('header\n')
+    with BatchWriter(filename) as writer:
+        writer.write(['a\n', 'b\n'], make_checkpoint(1))
+        assert filename.read_text() == 'header\na\nb\n'
+        assert load_checkpoint(filename).size == len('header\na\nb\n')
+        # Lines without checkpoint don't move it
+        writer.write(['tail\n'])
+    assert filename.read_text() == 'header\na\nb\ntail\n'
+    assert load_checkpoint(filename).last_op_id == '1.11.1'
+    assert load_checkpoint(filename).size == len('header\na\nb\n')
+
+
+def test_flush_rows(tmp_path):
+    filename = tmp_path / 'out.csv'
+    filename.write_text('header\n')
+    with BatchWriter(filename, flush_rows=3) as writer:
+        writer.write(['a\n'], make_checkpoint(1))
+        writer.write(['b\n'], make_checkpoint(2))
+        assert filename.read_text() == 'header\n'
+        assert load_checkpoint(filename) is None
+        writer.write(['c\n', 'd\n'], make_checkpoint(3))
+        assert filename.read_text() == 'header\na\nb\nc\nd\n'
+        writer.write(['e\n'], make_checkpoint(4))
+        writer.write(['tail\n'])
+    assert writer.flushes == 2
+    assert filename.read_text() == 'header\na\nb\nc\nd\ne\ntail\n'
+    assert load_checkpoint(filename).last_op_id == '1.11.4'
+    assert load_checkpoint(filename).size == len('header\na\nb\nc\nd\ne\n')
+
+
+def test_buffer_is_dropped_on_error(tmp_path):
+    filename = tmp_path / 'out.csv'
+    filename.write_text('header\n')
+    with pytest.raises(RuntimeError):
+        with BatchWriter(filename, flush_rows=10) as writer:
+            writer.write(['a\n'], make_checkpoint(1))
+            raise RuntimeError
+    assert filename.read_text() == 'header\n'
+
+
+@pytest.mark.parametrize(
+    'content, expected',
+    [('header\nline\n', 'header\nline\n'), ('header\nline\ntorn', 'header\nline\n'), ('', ''), ('torn', '')],
+)
+def test_drop_torn_line(tmp_path, content, expected):
+    filename = tmp_path / 'out.csv'
+    filename.write_text(content)
+    assert drop_torn_line(filename) == (content != expected)
+    assert filename.read_text() == expected
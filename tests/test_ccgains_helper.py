@@ -0,0 +1,87 @@
+import pytest
+from dateutil import tz
+
+from bitshares_tradehistory_analyzer.ccgains_helper import TradeHistory, TradeStream, _parse_trade
+from bitshares_tradehistory_analyzer.consts import HEADER
+
+LINES = [
+    'Deposit,2020-01-01T00:00:01,BTS,950.0,,0,,0,Bitshares,-1,1.11.100\n',
+    'Trade,2020-02-01T00:00:01,USD,0.0013,BTS,0.00205,USD,0.0001,Bitshares,-1,1.11.204 1.11.205\n',
+    'Withdrawal,2020-03-01T00:00:00,,0,BTS,10,BTS,0.1,Bitshares,-1,1.11.101\n',
+]
+# Rows which Trade normalizes: negative buy amount, empty amounts and fee in foreign currency
+ODD_LINES = [
+    'Trade,2020-04-01T00:00:00,USD,-0.50,BTS,,USD,,Bitshares,-1,1.11.300\n',
+    'Trade,2020-04-01T00:00:00,USD,,BTS,0.000,CNY,0.1,Bitshares,-1,1.11.301\n',
+    'Trade,2020-04-01T00:00:00,USD,1,BTS,-2,BTS,0,Bitshares,-1,1.11.302\n',
+]
+ATTRIBUTES = (
+    'kind',
+    'dtime',
+    'buycur',
+    'buyval',
+    'sellcur',
+    'sellval',
+    'feecur',
+    'feeval',
+    'exchange',
+    'mark',
+    'comment',
+)
+
+
+def test_append_csv_same_as_line_by_line(tmp_path):
+    filename = tmp_path / 'trades.csv'
+    filename.write_text(HEADER + ''.join(LINES + ODD_LINES))
+    th = TradeHistory()
+    th.append_csv(str(filename))
+
+    expected = [_parse_trade(line.split(','), range(11), tz.tzlocal()) for line in LINES + ODD_LINES]
+    assert len(th.tlist) == len(expected)
+    for trade, expected_trade in zip(th.tlist, expected):
+        for name in ATTRIBUTES:
+            assert str(getattr(trade, name)) == str(getattr(expected_trade, name))
+
+
+def test_append_csvs_same_as_sort(tmp_path):
+    transfers = tmp_path / 'transfers.csv'
+    transfers.write_text(HEADER + LINES[0] + LINES[2])
+    trades = tmp_path / 'trades.csv'
+    # Unsorted file is sorted before merging
+    trades.write_text(HEADER + LINES[1] + LINES[0].replace('Deposit', 'Trade'))
+
+    th = TradeHistory()
+    th.append_csv(str(transfers))
+    th.append_csvs([str(trades)])
+
+    expected = th.load_csv(str(transfers)) + th.load_csv(str(trades))
+    expected.sort(key=th._trade_sort_key)
+    assert [(trade.kind, trade.dtime, trade.comment) for trade in th.tlist] == [
+        (trade.kind, trade.dtime, trade.comment) for trade in expected
+    ]
+
+
+def test_trade_stream_same_as_trade_history(tmp_path):
+    transfers = tmp_path / 'transfers.csv'
+    transfers.write_text(HEADER + LINES[0] + LINES[2])
+    trades = tmp_path / 'trades.csv'
+    trades.write_text(HEADER + LINES[1])
+    empty = tmp_path / 'empty.csv'
+    empty.write_text(HEADER)
+    files = [str(transfers), str(trades), str(empty)]
+
+    th = TradeHistory()
+    th.append_csvs(files)
+    stream = TradeStream(files, chunksize=1)
+    # Stream can be consumed several times
+    for _ in range(2):
+        assert [(trade.kind, trade.dtime, trade.comment) for trade in stream] == [
+            (trade.kind, trade.dtime, trade.comment) for trade in th.tlist
+        ]
+
+
+def test_trade_stream_unsorted(tmp_path):
+    trades = tmp_path / 'trades.csv'
+    trades.write_text(HEADER + LINES[1] + LINES[0])
+    with pytest.raises(ValueError, match='trades.csv is not sorted'):
+        list(TradeStream([str(trades)]))
@@ -0,0 +1,55 @@
+from decimal import Decimal
+
+from bitshares_tradehistory_analyzer.checkpoint import (
+    Checkpoint,
+    checkpoint_path,
+    load_checkpoint,
+    remove_checkpoint,
+    save_checkpoint,
+)
+from bitshares_tradehistory_analyzer.parsed_op import ParsedOp
+
+
+def test_save_load(tmp_path):
+    filename = tmp_path / 'trades.csv'
+    filename.write_text('header\nline\n')
+    assert load_checkpoint(filename) is None
+
+    trade = ParsedOp(
+        kind='Trade',
+        buy_amount=Decimal('1.2300'),
+        sell_amount=Decimal('1E-8'),
+        fee_amount=Decimal('0.0000'),
+        order_id='1.7.1',
+        price=Decimal('123000000'),
+        price_inverted=Decimal('8.130081300813008130081300813E-9'),
+    )
+    checkpoint = Checkpoint(from_date='2020-02-01T00:00:00', last_op_id='1.11.205', sequence=205, size=7)
+    checkpoint.set_pending(trade)
+    save_checkpoint(filename, checkpoint)
+
+    loaded = load_checkpoint(filename)
+    assert loaded == checkpoint
+    restored = loaded.pending_trade()
+    assert restored == trade
+    assert [str(getattr(restored, name)) for name in ParsedOp.__slots__] == [
+        str(getattr(trade, name)) for name in ParsedOp.__slots__
+    ]
+
+    remove_checkpoint(filename)
+    assert not checkpoint_path(filename).exists()
+    remove_checkpoint(filename)
+
+
+def test_checkpoint_ahead_of_file(tmp_path):
+    filename = tmp_path / 'trades.csv'
+    filename.write_text('header\n')
+    save_checkpoint(filename, Checkpoint(from_date='2020-02-01T00:00:00', last_op_id='1.11.205', size=100))
+    assert load_checkpoint(filename) is None
+
+
+def test_broken_checkpoint(tmp_path):
+    filename = tmp_path / 'trades.csv'
+    filename.write_text('header\n')
+    checkpoint_path(filename).write_text('{"from_date": ')
+    assert load_checkpoint(filename) is None
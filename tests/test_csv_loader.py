@@ -0,0 +1,85 @@
+import pandas as pd
+import pytest
+from dateutil import tz
+
+from bitshares_tradehistory_analyzer.consts import HEADER
+from bitshares_tradehistory_analyzer.csv_loader import (
+    TRADE_COLUMNS,
+    is_vectorizable,
+    iter_trades_frames,
+    load_trades_frame,
+)
+
+LINES = [
+    'Trade,2020-02-01T00:00:01,1.3.1,0.0013,1.3.0,0.00205,1.3.1,0.0001,Bitshares,-1,1.11.204 1.11.205\n',
+    'Deposit,2020-03-29T04:30:00,BTS,950.0,,0,,0,Bitshares,-1,1.11.100\n',
+    'Withdrawal, 2020-10-25T04:30:00 ,"USD",1.230000000000000000001,BTS,10,BTS,0.1,Bitshares,-1,1.11.101\n',
+]
+
+
+@pytest.fixture()
+def csv_file(tmp_path):
+    filename = tmp_path / 'trades.csv'
+    filename.write_text(HEADER + ''.join(LINES))
+    return str(filename)
+
+
+def expected_dtime(value, default_timezone):
+    dtime = pd.Timestamp(value)
+    if dtime.tzinfo is None:
+        dtime = dtime.tz_localize(default_timezone)
+    return dtime.tz_convert('UTC')
+
+
+@pytest.mark.parametrize('default_timezone', [tz.UTC, tz.gettz('Europe/Berlin'), None])
+def test_same_as_line_by_line(csv_file, default_timezone):
+    frame = load_trades_frame(csv_file, default_timezone=default_timezone)
+    assert list(frame.columns) == list(TRADE_COLUMNS)
+    assert len(frame) == len(LINES)
+    for row, line in zip(frame.itertuples(index=False), LINES):
+        fields = [field.strip('" \n\t') for field in line.split(',')]
+        timezone = tz.tzlocal() if default_timezone is None else default_timezone
+        assert row.dtime == expected_dtime(fields[1], timezone)
+        assert [getattr(row, name) for name in TRADE_COLUMNS if name != 'dtime'] == fields[:1] + fields[2:]
+    # Amounts are kept exact
+    assert frame['buy_amount'][2] == '1.230000000000000000001'
+
+
+def test_dates_with_timezone(tmp_path):
+    filename = tmp_path / 'trades.csv'
+    filename.write_text(HEADER + LINES[0] + LINES[1].replace('2020-03-29T04:30:00', '2020-03-29 04:30:00+03:00'))
+    frame = load_trades_frame(str(filename), default_timezone=tz.UTC)
+    assert list(frame['dtime']) == [
+        pd.Timestamp('2020-02-01T00:00:01', tz='UTC'),
+        pd.Timestamp('2020-03-29T01:30:00', tz='UTC'),
+    ]
+
+
+def test_param_locs(csv_file):
+    param_locs = {'kind': 0, 'dtime': 1, 'buy_currency': 2, 'buy_amount': 3, 'exchange': 'DEX', 'comment': -1}
+    frame = load_trades_frame(csv_file, param_locs=param_locs, default_timezone=tz.UTC)
+    assert list(frame['exchange']) == ['DEX'] * len(LINES)
+    assert list(frame['comment']) == [''] * len(LINES)
+    assert list(frame['sell_amount']) == [''] * len(LINES)
+
+    callable_locs = dict(param_locs, comment=lambda fields: fields[-1])
+    assert not is_vectorizable(callable_locs)
+    with pytest.raises(ValueError, match='Callable column mappings'):
+        load_trades_frame(csv_file, param_locs=callable_locs)
+
+
+def test_header_only(tmp_path):
+    filename = tmp_path / 'trades.csv'
+    filename.write_text(HEADER)
+    frame = load_trades_frame(str(filename))
+    assert list(frame.columns) == list(TRADE_COLUMNS)
+    assert len(frame) == 0
+    assert list(iter_trades_frames(str(filename), chunksize=2)) == []
+
+
+def test_chunks(csv_file):
+    chunks = list(iter_trades_frames(csv_file, default_timezone=tz.UTC, chunksize=2))
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    frame = load_trades_frame(csv_file, default_timezone=tz.UTC)
+    assert list(pd.concat(chunks)['dtime']) == list(frame['dtime'])
+    assert list(pd.concat(chunks)['comment']) == list(frame['comment'])
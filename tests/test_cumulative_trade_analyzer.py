@@ -1,3 +1,4 @@
+import random
 from decimal import Decimal
 
 import pandas as pd
@@ -5,6 +6,7 @@ import pytest
 
 from bitshares_tradehistory_analyzer.ccgains_helper import Trade, TradeKind
 from bitshares_tradehistory_analyzer.cumulative_trade_analyzer import (
+    ENGINES,
     ZERO,
     AssetTransferStats,
     CumulativeAnalyzer,
@@ -18,6 +20,12 @@ def analyzer():
     return CumulativeAnalyzer()
 
 
+@pytest.fixture(params=ENGINES)
+def engine(request):
+    """Tests using this fixture are the shared suite which every engine must pass"""
+    return request.param
+
+
 def test_pair_trade_stats_dict_access():
     stats1 = PairTradeStats(spent_asset="USDT", acquired_asset="BTC")
     stats2 = PairTradeStats(spent_asset="USDT", acquired_asset="ETH")
@@ -124,7 +132,7 @@ def test_trade_results(analyzer):
     assert btc_result["Spent Amount"].item() == Decimal("9000")
 
 
-def test_run_analysis_time_ranged(analyzer):
+def test_run_analysis_time_ranged(analyzer, engine):
     start = pd.Timestamp("2021-01-01", tz="UTC")
     end = pd.Timestamp("2021-06-01", tz="UTC")
     trade_ts_before_start = start - pd.Timedelta(hours=1)
@@ -140,12 +148,139 @@ def test_run_analysis_time_ranged(analyzer):
             sell_amount=ZERO,
         )
         analyzer.th.tlist.append(trade)
-    analyzer.run_analysis(start, end)
+    analyzer.run_analysis(start, end, engine=engine)
     stats = analyzer.transfer_stats["BTC"]
     assert stats.deposit_amount == Decimal("0.2")
     assert stats.last_transfer_timestamp == trade_ts_in_between
 
 
+def test_run_analysis_streamed(analyzer, engine, tmp_path):
+    transfers = tmp_path / "transfers.csv"
+    transfers.write_text(
+        "Kind,Date,Buy currency,Buy amount,Sell currency,Sell amount,Fee currency,Fee amount,Exchange,Mark,Comment\n"
+        "Deposit,2021-01-01T00:00:00,USDT,10000,,0,,0,Bitshares,-1,1.11.1\n"
+    )
+    trades = tmp_path / "trades.csv"
+    trades.write_text(
+        "Kind,Date,Buy currency,Buy amount,Sell currency,Sell amount,Fee currency,Fee amount,Exchange,Mark,Comment\n"
+        "Trade,2021-01-02T00:00:00,BTC,0.1,USDT,3000,BTC,0,Bitshares,-1,1.11.2\n"
+        "Trade,2021-01-03T00:00:00,BTC,0.2,USDT,6000,BTC,0,Bitshares,-1,1.11.3\n"
+    )
+    files = [str(transfers), str(trades)]
+    analyzer.append_csvs(files)
+    analyzer.run_analysis()
+
+    streamed = CumulativeAnalyzer()
+    streamed.stream_csvs(files)
+    streamed.run_analysis(engine=engine)
+
+    assert streamed.transfer_stats == analyzer.transfer_stats
+    assert streamed.trade_stats == analyzer.trade_stats
+    assert streamed.trade_stats["USDT-BTC"].acquired_amount == Decimal("0.3")
+
+
+def test_run_analysis_table(analyzer, engine, tmp_path):
+    trades = tmp_path / "trades.csv"
+    trades.write_text(
+        "Kind,Date,Buy currency,Buy amount,Sell currency,Sell amount,Fee currency,Fee amount,Exchange,Mark,Comment\n"
+        "Deposit,2021-01-01T00:00:00,USDT,10000,,0,,0,Bitshares,-1,1.11.1\n"
+        "Trade,2021-01-02T00:00:00,BTC,0.10,USDT,3000,BTC,0,Bitshares,-1,1.11.2\n"
+        "Trade,2021-01-03T00:00:00,BTC,0.2,USDT,6000.00,BTC,0,Bitshares,-1,1.11.3\n"
+    )
+    analyzer.append_csvs([str(trades)])
+    analyzer.run_analysis()
+
+    table = CumulativeAnalyzer()
+    table.load_table([str(trades)])
+    table.run_analysis(engine=engine)
+
+    assert len(table.trades) == 3
+    assert table.transfer_stats == analyzer.transfer_stats
+    assert table.trade_stats == analyzer.trade_stats
+    assert str(table.trade_stats["USDT-BTC"].spent_amount) == str(analyzer.trade_stats["USDT-BTC"].spent_amount)
+
+
+def make_history(seed, size=300):
+    rnd = random.Random(seed)
+    assets = ["BTS", "USD", "BTC", "CNY"]
+    amounts = ["0", "1", "0.1", "0.10", "12.3456", "1E+2", "0.30000000000000004", "99999999.99999999"]
+    dtime = pd.Timestamp("2021-01-01", tz="UTC")
+    trades = []
+    for _ in range(size):
+        # Equal timestamps are allowed
+        dtime += pd.Timedelta(hours=rnd.randint(0, 3))
+        kind = rnd.choice([TradeKind.DEPOSIT, TradeKind.WITHDRAWAL, TradeKind.TRADE]).value
+        buycur, sellcur = rnd.sample(assets, 2)
+        if kind == TradeKind.DEPOSIT.value:
+            sellcur = None
+        elif kind == TradeKind.WITHDRAWAL.value:
+            buycur = None
+        trades.append(
+            Trade(
+                kind=kind,
+                dtime=dtime,
+                buy_currency=buycur,
+                buy_amount=Decimal(rnd.choice(amounts)),
+                sell_currency=sellcur,
+                sell_amount=Decimal(rnd.choice(amounts)),
+            )
+        )
+    return trades
+
+
+def results(analyzer):
+    frames = (analyzer.transfer_results, analyzer.trade_results, analyzer.trade_delta_results)
+    # Compare string forms to check Decimal exponents as well
+    return [frame.astype(str).values.tolist() for frame in frames]
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize(
+    "start, end", [(None, None), ("2021-01-05", None), (None, "2021-01-10"), ("2021-01-05", "2021-01-10")]
+)
+def test_engines_same_results(seed, start, end):
+    start = pd.Timestamp(start, tz="UTC") if start else None
+    end = pd.Timestamp(end, tz="UTC") if end else None
+    expected = None
+    for engine in ENGINES:
+        analyzer = CumulativeAnalyzer()
+        analyzer.th.tlist.extend(make_history(seed))
+        analyzer.run_analysis(start, end, engine=engine)
+        if expected is None:
+            expected = analyzer
+            continue
+        assert analyzer.transfer_stats == expected.transfer_stats
+        assert analyzer.trade_stats == expected.trade_stats
+        assert analyzer.trade_delta_stats == expected.trade_delta_stats
+        assert results(analyzer) == results(expected)
+
+
+def test_run_analysis_empty(analyzer, engine):
+    analyzer.run_analysis(engine=engine)
+    assert analyzer.transfer_results.empty
+    assert analyzer.trade_results.empty
+
+
+def test_run_analysis_unexpected_kind(analyzer, engine):
+    analyzer.th.tlist.append(
+        Trade(
+            kind="Airdrop",
+            dtime=pd.Timestamp("2021-01-01", tz="UTC"),
+            buy_currency="BTC",
+            buy_amount=Decimal("1"),
+            sell_currency=None,
+            sell_amount=ZERO,
+        )
+    )
+    with pytest.raises(ValueError, match="Airdrop"):
+        analyzer.run_analysis(engine=engine)
+
+
+def test_run_analysis_unknown_engine(analyzer):
+    with pytest.raises(ValueError, match="Unknown engine: spreadsheet"):
+        analyzer.run_analysis(engine="spreadsheet")
+
+
 def test_calc_trade_delta_1(analyzer):
     """Partially sold"""
     spent_usdt = Decimal("10000")
@@ -1,33 +1,293 @@
+import asyncio
+import copy
+import itertools
+import json
+import threading
+from datetime import datetime
+from decimal import Decimal
+
 import pytest
 
-from bitshares_tradehistory_analyzer.history_downloader import HistoryDownloader
+from bitshares_tradehistory_analyzer import history_downloader
+from bitshares_tradehistory_analyzer.checkpoint import checkpoint_path, load_checkpoint
+from bitshares_tradehistory_analyzer.history_downloader import (
+    HistoryDownloader,
+    get_continuation_point,
+    split_time_range,
+)
+from bitshares_tradehistory_analyzer.multi_wrapper import MultiWrapper
+from bitshares_tradehistory_analyzer.page_cache import PageCache, ReplayWrapper
+from bitshares_tradehistory_analyzer.parsed_op import ParsedOp
+from bitshares_tradehistory_analyzer.wrapper import BaseWrapper
 
 BITSHARES_API_NODE_URL = "wss://eu.nodes.bitshares.ws"
 ES_WRAPPER_URL = "https://api.bitshares.ws/openexplorer/es/"
+ACCOUNT_ID = '1.2.100'
 
 
-def test_get_continuation_point():
-    ...
+def make_entry(op_num, op_type, block_time, op):
+    return {
+        'account_history': {'account': ACCOUNT_ID, 'operation_id': f'1.11.{op_num}', 'sequence': op_num},
+        'operation_history': {'op': json.dumps([op_type, op]), 'operation_result': '[0,{}]'},
+        'operation_type': op_type,
+        'block_data': {'block_time': block_time},
+    }
 
 
-def test_fetch_transfers_from_scratch():
-    ...
+def make_history():
+    """Transfers and trades of a test account, several ops are sharing same block time"""
+    entries = []
+    for i in range(10):
+        block_time = '2020-01-01T00:00:{:02d}'.format(i // 2)
+        transfer = {
+            'from': '1.2.1',
+            'to': ACCOUNT_ID,
+            'amount': {'amount': 1000 + i, 'asset_id': '1.3.0'},
+            'fee': {'amount': 0, 'asset_id': '1.3.0'},
+        }
+        entries.append(make_entry(100 + i, 0, block_time, transfer))
+    for i in range(11):
+        block_time = '2020-02-{:02d}T00:00:00'.format(1 + i // 2)
+        trade = {
+            'order_id': '1.7.{}'.format(i // 4),
+            'pays': {'amount': 100 + i, 'asset_id': '1.3.0'},
+            'receives': {'amount': 10 + i, 'asset_id': '1.3.1'},
+            'fee': {'amount': 1, 'asset_id': '1.3.1'},
+        }
+        entries.append(make_entry(200 + i, 4, block_time, trade))
+    return entries
 
 
-def test_fetch_transfers_from_previous_point():
-    ...
+class FakeWrapper(BaseWrapper):
+    """Serves history entries the same way as ES wrapper does"""
 
+    def __init__(self, entries, size=3, **kwargs):
+        super().__init__('https://example.com/', ACCOUNT_ID, size=size, **kwargs)
+        self.entries = entries
+        self.version = 2
 
-def test_fetch_trades_from_scratch():
-    ...
+    def _select(self, params, **kwargs):
+        url, payload = self._build_query(params, **kwargs)
+        entries = [
+            entry
+            for entry in self.entries
+            if entry['operation_type'] == payload['operation_type']
+            and entry['block_data']['block_time'] >= payload.get('from_date', '')
+            and entry['block_data']['block_time'] <= payload.get('to_date', '9999')
+        ]
+        start = payload.get('from_', 0)
+        end = start + payload['size']
+        page = copy.deepcopy(entries[start:end])
+        self._save_page(url, payload, page)
+        return page
 
+    def _query(self, params, *args, **kwargs):
+        return self._select(params, **kwargs)
 
-def test_fetch_trades_from_previous_point():
-    ...
 
+class FakeAsyncWrapper(FakeWrapper):
+    async def __aenter__(self):
+        return self
 
-def test_fetch_trades_from_scratch_no_aggregated():
-    ...
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+    async def _query(self, params, *args, **kwargs):
+        return self._select(params, **kwargs)
+
+
+class FakeParser:
+    """Parses entries without asset lookups, using asset ids as symbols"""
+
+    def __init__(self, bitshares_instance, account, asset_cache=None):
+        self.account = {'id': ACCOUNT_ID, 'name': account}
+
+    def prefetch(self, entries):
+        pass
+
+    @staticmethod
+    def _op(entry):
+        return json.loads(entry['operation_history']['op'])[1]
+
+    def parse_transfer_entry(self, entry):
+        op = self._op(entry)
+        return ParsedOp(
+            kind='Deposit',
+            date=entry['block_data']['block_time'],
+            buy_cur=op['amount']['asset_id'],
+            buy_amount=Decimal(op['amount']['amount']).scaleb(-5),
+            comment=entry['account_history']['operation_id'],
+        )
+
+    def parse_trade_entry(self, entry):
+        op = self._op(entry)
+        data = ParsedOp(
+            kind='Trade',
+            date=entry['block_data']['block_time'],
+            buy_cur=op['receives']['asset_id'],
+            buy_amount=Decimal(op['receives']['amount'] - op['fee']['amount']).scaleb(-4),
+            sell_cur=op['pays']['asset_id'],
+            sell_amount=Decimal(op['pays']['amount']).scaleb(-5),
+            fee_cur=op['fee']['asset_id'],
+            fee_amount=Decimal(op['fee']['amount']).scaleb(-4),
+            comment=entry['account_history']['operation_id'],
+            order_id=op['order_id'],
+            prec=5,
+        )
+        data.price = data.buy_amount / data.sell_amount
+        data.price_inverted = data.sell_amount / data.buy_amount
+        return data
+
+    def parse_settle_entry(self, entry):
+        raise NotImplementedError
+
+
+@pytest.fixture()
+def history():
+    return make_history()
+
+
+@pytest.fixture()
+def make_downloader(monkeypatch, tmp_path, history):
+    monkeypatch.setattr(history_downloader, 'BitShares', lambda node: None)
+    monkeypatch.setattr(history_downloader, 'Parser', FakeParser)
+
+    def _make_downloader(output_directory='out', entries=None, **kwargs):
+        downloader = HistoryDownloader(
+            account='test',
+            wrapper_url='https://example.com/',
+            api_node=BITSHARES_API_NODE_URL,
+            output_directory=str(tmp_path / output_directory),
+            **kwargs,
+        )
+        downloader.wrapper = FakeWrapper(history if entries is None else entries, page_cache=downloader.page_cache)
+        monkeypatch.setattr(
+            history_downloader, 'AsyncWrapper', lambda *args, **kw: FakeAsyncWrapper(downloader.wrapper.entries)
+        )
+        return downloader
+
+    return _make_downloader
+
+
+def read_lines(filename):
+    with open(filename) as fd:
+        return fd.readlines()
+
+
+def test_get_continuation_point(tmp_path):
+    filename = tmp_path / 'trades.csv'
+    assert get_continuation_point(filename) == ('2010-10-10', None)
+
+    filename.write_text(
+        'Kind,Date,Buy currency,Buy amount,Sell currency,Sell amount,Fee currency,Fee amount,Exchange,Mark,Comment\n'
+        'Trade,2020-02-01T00:00:01,1.3.1,0.0013,1.3.0,0.00205,1.3.1,0.0001,Bitshares,-1,1.11.204 1.11.205\n'
+    )
+    assert get_continuation_point(filename) == ('2020-02-01T00:00:01', '1.11.205')
+
+
+def test_fetch_transfers_from_scratch(make_downloader):
+    downloader = make_downloader()
+    downloader.fetch_transfers()
+    lines = read_lines(downloader.transfers_file)
+    assert len(lines) == 11
+    assert lines[-1].split(',')[-1].strip() == '1.11.109'
+
+
+def test_fetch_transfers_from_previous_point(make_downloader, history):
+    downloader = make_downloader(output_directory='full')
+    downloader.fetch_transfers()
+
+    partial_downloader = make_downloader(output_directory='partial', entries=history[:5])
+    partial_downloader.fetch_transfers()
+    partial_downloader.wrapper.entries = history
+    partial_downloader.fetch_transfers()
+
+    assert read_lines(partial_downloader.transfers_file) == read_lines(downloader.transfers_file)
+
+
+def test_fetch_trades_from_scratch(make_downloader):
+    downloader = make_downloader()
+    downloader.fetch_trades()
+    lines = read_lines(downloader.trades_file)
+    # 3 orders
+    assert len(lines) == 4
+    assert lines[1].split(',')[-1].split() == ['1.11.200', '1.11.201', '1.11.202', '1.11.203']
+
+
+def test_fetch_trades_from_previous_point(make_downloader, history):
+    downloader = make_downloader(entries=history[:16])
+    downloader.fetch_trades()
+    downloader.wrapper.entries = history
+    downloader.fetch_trades()
+
+    op_ids = [op_id for line in read_lines(downloader.trades_file)[1:] for op_id in line.split(',')[-1].split()]
+    assert op_ids == ['1.11.{}'.format(200 + i) for i in range(11)]
+
+
+def test_fetch_from_checkpoint_drops_trailing_garbage(make_downloader, history):
+    downloader = make_downloader(output_directory='full')
+    downloader.fetch_transfers()
+
+    partial_downloader = make_downloader(output_directory='partial', entries=history[:5])
+    partial_downloader.fetch_transfers()
+    assert load_checkpoint(partial_downloader.transfers_file).last_op_id == '1.11.104'
+    # Interrupted write
+    with open(partial_downloader.transfers_file, 'a') as fd:
+        fd.write('Deposit,2020-01-01T00:00:03,1.3.0,0.0')
+    partial_downloader.wrapper.entries = history
+    partial_downloader.fetch_transfers()
+
+    assert read_lines(partial_downloader.transfers_file) == read_lines(downloader.transfers_file)
+
+
+@pytest.mark.parametrize('use_async', [False, True])
+def test_fetch_trades_from_checkpoint_continues_aggregation(make_downloader, history, use_async):
+    downloader = make_downloader(output_directory='full')
+    downloader.fetch_trades()
+
+    # Order 1.7.1 is filled partially
+    partial_downloader = make_downloader(output_directory='partial', entries=history[:16])
+    partial_downloader.fetch_trades()
+    assert load_checkpoint(partial_downloader.trades_file).pending['order_id'] == '1.7.1'
+    partial_downloader.wrapper.entries = history
+    if use_async:
+        asyncio.run(partial_downloader.afetch_all())
+    else:
+        partial_downloader.fetch_trades()
+
+    assert read_lines(partial_downloader.trades_file) == read_lines(downloader.trades_file)
+
+
+def test_fetch_trades_without_checkpoint(make_downloader, history):
+    downloader = make_downloader(entries=history[:16])
+    downloader.fetch_trades()
+    checkpoint_path(downloader.trades_file).unlink()
+    downloader.wrapper.entries = history
+    downloader.fetch_trades()
+
+    op_ids = [op_id for line in read_lines(downloader.trades_file)[1:] for op_id in line.split(',')[-1].split()]
+    assert op_ids == ['1.11.{}'.format(200 + i) for i in range(11)]
+
+
+def test_fetch_without_checkpoint_drops_torn_line(make_downloader, history):
+    downloader = make_downloader(output_directory='full')
+    downloader.fetch_transfers()
+
+    partial_downloader = make_downloader(output_directory='partial', entries=history[:5], flush_rows=4)
+    partial_downloader.fetch_transfers()
+    checkpoint_path(partial_downloader.transfers_file).unlink()
+    with open(partial_downloader.transfers_file, 'a') as fd:
+        fd.write('Deposit,2020-01-01T00:00:03,1.3.0,0.0')
+    partial_downloader.wrapper.entries = history
+    partial_downloader.fetch_transfers()
+
+    assert read_lines(partial_downloader.transfers_file) == read_lines(downloader.transfers_file)
+
+
+def test_fetch_trades_from_scratch_no_aggregated(make_downloader):
+    downloader = make_downloader(no_aggregate=True)
+    downloader.fetch_trades()
+    assert len(read_lines(downloader.trades_file)) == 12
 
 
 @pytest.mark.vcr()
@@ -40,3 +300,248 @@ def test_fetch_settlements_in_gs_state_from_scratch():
 
 def test_fetch_settlements_in_gs_state_from_previous_point():
     ...
+
+
+def test_async_fetch_is_identical(make_downloader):
+    downloader = make_downloader(output_directory='sync')
+    downloader.fetch_transfers()
+    downloader.fetch_trades()
+
+    async_downloader = make_downloader(output_directory='async')
+    asyncio.run(async_downloader.afetch_all())
+
+    assert read_lines(async_downloader.transfers_file) == read_lines(downloader.transfers_file)
+    assert read_lines(async_downloader.trades_file) == read_lines(downloader.trades_file)
+
+
+def test_async_fetch_parses_outside_event_loop(make_downloader):
+    downloader = make_downloader()
+    parse_trade_entry = downloader.parser.parse_trade_entry
+    calls = []
+
+    def record_parse(entry):
+        calls.append((threading.get_ident(), downloader.parser_lock.locked()))
+        return parse_trade_entry(entry)
+
+    downloader.parser.parse_trade_entry = record_parse
+    asyncio.run(downloader.afetch_all())
+
+    assert calls
+    assert all(ident != threading.get_ident() and locked for ident, locked in calls)
+
+
+def test_failover_options_are_passed_only_to_multi_wrapper(make_downloader, monkeypatch, tmp_path):
+    downloader = HistoryDownloader(
+        account='test',
+        wrapper_url=['https://a.example.com/', 'https://b.example.com/'],
+        api_node=BITSHARES_API_NODE_URL,
+        output_directory=str(tmp_path / 'failover'),
+        wrapper_options={'size': 50},
+        failover_options={'hedge_percentile': 90, 'cooldown': 5},
+    )
+    assert isinstance(downloader.wrapper, MultiWrapper)
+    assert downloader.wrapper.hedge_percentile == 90
+    assert downloader.wrapper.endpoints[0].cooldown == 5
+
+    async_options = {}
+
+    def make_async_wrapper(url, **kwargs):
+        async_options.update(kwargs)
+        return FakeAsyncWrapper(make_history())
+
+    monkeypatch.setattr(history_downloader, 'AsyncWrapper', make_async_wrapper)
+    asyncio.run(downloader.afetch_all())
+    assert async_options == {'account_id': ACCOUNT_ID, 'size': 50}
+
+
+def test_close_stops_multi_wrapper_threads(make_downloader, tmp_path):
+    downloader = HistoryDownloader(
+        account='test',
+        wrapper_url=['https://a.example.com/', 'https://b.example.com/'],
+        api_node=BITSHARES_API_NODE_URL,
+        output_directory=str(tmp_path / 'failover'),
+    )
+    wrapper = downloader.wrapper
+    downloader.close()
+    with pytest.raises(RuntimeError, match='shutdown'):
+        wrapper.executor.submit(print)
+    assert 'wrapper' not in downloader.__dict__
+
+
+def test_fetch_all_parallel_is_identical(make_downloader):
+    downloader = make_downloader(output_directory='serial')
+    downloader.fetch_transfers()
+    downloader.fetch_trades()
+
+    parallel_downloader = make_downloader(output_directory='parallel')
+    parallel_downloader.fetch_all(jobs=3)
+
+    assert read_lines(parallel_downloader.transfers_file) == read_lines(downloader.transfers_file)
+    assert read_lines(parallel_downloader.trades_file) == read_lines(downloader.trades_file)
+
+
+def test_split_time_range():
+    windows = split_time_range('2020-01-01T00:00:00', datetime(2020, 1, 4), 3)
+    assert windows == [
+        ('2020-01-01T00:00:00', '2020-01-02T00:00:00'),
+        ('2020-01-02T00:00:00', '2020-01-03T00:00:00'),
+        ('2020-01-03T00:00:00', None),
+    ]
+    assert split_time_range('2020-01-01T00:00:00', datetime(2020, 1, 1), 3) == [('2020-01-01T00:00:00', None)]
+
+
+class FrozenDatetime(datetime):
+    @classmethod
+    def utcnow(cls):
+        return datetime(2020, 2, 7)
+
+
+def test_fetch_trades_sharded_is_identical(make_downloader, monkeypatch):
+    monkeypatch.setattr(history_downloader, 'datetime', FrozenDatetime)
+    downloader = make_downloader(output_directory='serial')
+    downloader.fetch_trades()
+
+    sharded_downloader = make_downloader(output_directory='sharded', backfill_shards=3)
+    sharded_downloader.fetch_trades()
+
+    assert read_lines(sharded_downloader.trades_file) == read_lines(downloader.trades_file)
+
+
+def test_fetch_trades_sharded_limits_jobs(make_downloader, monkeypatch):
+    monkeypatch.setattr(history_downloader, 'datetime', FrozenDatetime)
+    downloader = make_downloader(output_directory='serial')
+    downloader.fetch_trades()
+
+    sharded_downloader = make_downloader(output_directory='sharded', backfill_shards=6, backfill_jobs=2)
+    fetch_window = sharded_downloader._fetch_window
+    lock = threading.Lock()
+    running = [0]
+    max_running = [0]
+
+    def count_running(*args):
+        with lock:
+            running[0] += 1
+            max_running[0] = max(max_running[0], running[0])
+        try:
+            return fetch_window(*args)
+        finally:
+            with lock:
+                running[0] -= 1
+
+    sharded_downloader._fetch_window = count_running
+    sharded_downloader.fetch_trades()
+
+    assert max_running[0] <= 2
+    assert read_lines(sharded_downloader.trades_file) == read_lines(downloader.trades_file)
+
+
+def test_fetch_strict_cursor_busy_block(make_downloader, history):
+    """More entries share the same block time than fit into a page"""
+    busy_history = copy.deepcopy(history)
+    for entry in busy_history:
+        entry['block_data']['block_time'] = '2020-03-01T00:00:00'
+    downloader = make_downloader(output_directory='strict', entries=busy_history, strict_cursor=True)
+    downloader.fetch_transfers()
+    downloader.fetch_trades()
+
+    transfers = read_lines(downloader.transfers_file)
+    assert [line.split(',')[-1].strip() for line in transfers[1:]] == ['1.11.{}'.format(100 + i) for i in range(10)]
+    op_ids = [op_id for line in read_lines(downloader.trades_file)[1:] for op_id in line.split(',')[-1].split()]
+    assert op_ids == ['1.11.{}'.format(200 + i) for i in range(11)]
+
+
+@pytest.mark.parametrize('use_async', [False, True])
+def test_fetch_busy_block(make_downloader, history, use_async):
+    """Page size is grown when more entries share the same block time than fit into a page"""
+    busy_history = copy.deepcopy(history)
+    for entry in busy_history:
+        entry['block_data']['block_time'] = '2020-03-01T00:00:00'
+    downloader = make_downloader(output_directory='busy', entries=busy_history)
+    if use_async:
+        asyncio.run(downloader.afetch_all())
+    else:
+        downloader.fetch_transfers()
+        downloader.fetch_trades()
+
+    transfers = read_lines(downloader.transfers_file)
+    assert [line.split(',')[-1].strip() for line in transfers[1:]] == ['1.11.{}'.format(100 + i) for i in range(10)]
+    op_ids = [op_id for line in read_lines(downloader.trades_file)[1:] for op_id in line.split(',')[-1].split()]
+    assert op_ids == ['1.11.{}'.format(200 + i) for i in range(11)]
+
+
+def test_fetch_strict_cursor_from_previous_point(make_downloader, history):
+    downloader = make_downloader(output_directory='full')
+    downloader.fetch_transfers()
+
+    partial_downloader = make_downloader(output_directory='partial', entries=history[:5], strict_cursor=True)
+    partial_downloader.fetch_transfers()
+    partial_downloader.wrapper.entries = history
+    partial_downloader.fetch_transfers()
+
+    assert read_lines(partial_downloader.transfers_file) == read_lines(downloader.transfers_file)
+
+
+class VaryingSizeWrapper(FakeWrapper):
+    """Changes page size on every request"""
+
+    def __init__(self, entries, sizes):
+        super().__init__(entries)
+        self.sizes = itertools.cycle(sizes)
+
+    def page_size(self):
+        return next(self.sizes)
+
+
+def test_fetch_varying_page_size(make_downloader, history):
+    downloader = make_downloader(output_directory='fixed')
+    downloader.fetch_transfers()
+    downloader.fetch_trades()
+
+    varying_downloader = make_downloader(output_directory='varying', strict_cursor=True)
+    varying_downloader.wrapper = VaryingSizeWrapper(history, [5, 2, 7, 3])
+    varying_downloader.fetch_transfers()
+    varying_downloader.fetch_trades()
+
+    assert read_lines(varying_downloader.transfers_file) == read_lines(downloader.transfers_file)
+    assert read_lines(varying_downloader.trades_file) == read_lines(downloader.trades_file)
+
+
+def test_replay_is_identical(make_downloader, tmp_path):
+    page_cache_dir = str(tmp_path / 'pages')
+    downloader = make_downloader(page_cache_dir=page_cache_dir)
+    downloader.fetch_all()
+
+    replay_downloader = make_downloader('replay', page_cache_dir=page_cache_dir, replay=True)
+    # Stale output is rebuilt from scratch
+    with open(replay_downloader.trades_file, 'w') as fd:
+        fd.write('garbage\n')
+    # Use replay wrapper instead of fake one
+    del replay_downloader.wrapper
+    replay_downloader.fetch_all()
+    assert isinstance(replay_downloader.wrapper, ReplayWrapper)
+
+    for name in ('transfers_file', 'trades_file', 'global_settlements_file'):
+        assert read_lines(getattr(replay_downloader, name)) == read_lines(getattr(downloader, name))
+    assert len(read_lines(replay_downloader.trades_file)) > 1
+
+
+@pytest.mark.parametrize(
+    'query',
+    [
+        {},
+        {'from_date': '2020-01-01T00:00:02'},
+        {'from_date': '2020-01-01T00:00:02', 'from_': 1, 'size': 4},
+        {'from_date': '2020-01-01T00:00:01', 'to_date': '2020-01-01T00:00:03'},
+        {'from_date': '2020-01-01T00:00:01', 'to_date': '2020-01-01T00:00:03', 'from_': 5},
+        {'from_date': '2020-01-01T00:00:01', 'to_date': '2020-01-01T00:00:03', 'from_': 8},
+        {'from_date': '2021-01-01'},
+    ],
+)
+def test_replay_wrapper_pages_same_as_wrapper(history, tmp_path, query):
+    page_cache = PageCache(str(tmp_path))
+    wrapper = FakeWrapper(history, size=100, page_cache=page_cache)
+    wrapper.get_transfers()
+
+    replay_wrapper = ReplayWrapper(page_cache, ACCOUNT_ID, size=3)
+    wrapper.size = 3
+    assert replay_wrapper.get_transfers(**query) == wrapper.get_transfers(**query)
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from bench_json_decoder import decode_pages, load_responses
+from bitshares_tradehistory_analyzer import json_decoder
+
+
+@pytest.fixture(params=list(json_decoder.DECODERS))
+def decoder(request):
+    json_decoder.set_decoder(request.param)
+    yield request.param
+    json_decoder._decoder = json_decoder.DECODERS.get('orjson', json.loads)
+
+
+def test_same_result_on_recorded_pages():
+    responses = load_responses('tests/cassettes/*/*.yaml')
+    assert responses
+    reference = decode_pages(json.loads, responses)
+    for loads in json_decoder.DECODERS.values():
+        assert decode_pages(loads, responses) == reference
+
+
+@pytest.mark.parametrize(
+    'document',
+    [
+        '{"a": 123456789012345678901234567890}',
+        b'[18446744073709551616, -9223372036854775809]',
+        '[18446744073709551615, -9223372036854775808, 1.5]',
+    ],
+)
+def test_long_integers_are_exact(decoder, document):
+    result = json_decoder.loads(document)
+    expected = json.loads(document)
+    assert result == expected
+    values = result.values() if isinstance(result, dict) else result
+    expected_values = expected.values() if isinstance(expected, dict) else expected
+    assert [type(value) for value in values] == [type(value) for value in expected_values]
+
+
+@pytest.mark.parametrize('document', ['', b'', '[1, 2', 'nan'])
+def test_invalid_document(decoder, document):
+    with pytest.raises(json.JSONDecodeError):
+        json_decoder.loads(document)
+
+
+def test_unknown_decoder():
+    with pytest.raises(ValueError, match='Unknown JSON decoder nope'):
+        json_decoder.set_decoder('nope')
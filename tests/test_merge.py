@@ -0,0 +1,38 @@
+import random
+
+import pytest
+
+from bitshares_tradehistory_analyzer.merge import ensure_sorted, is_sorted, merge_sorted
+
+
+def key(item):
+    return item[0]
+
+
+def test_is_sorted():
+    assert is_sorted([], key)
+    assert is_sorted([(1, 'a'), (1, 'b'), (2, 'c')], key)
+    assert not is_sorted([(2, 'a'), (1, 'b')], key)
+
+
+def test_same_as_stable_sort():
+    rnd = random.Random(1)
+    sequences = []
+    for num in range(5):
+        sequence = [(rnd.randint(0, 20), num, i) for i in range(rnd.randint(0, 30))]
+        # Every second sequence is out of order
+        if num % 2:
+            sequence.sort(key=key)
+        sequences.append(sequence)
+
+    expected = []
+    for sequence in sequences:
+        expected = sorted(expected + sequence, key=key)
+    assert list(merge_sorted(sequences, key)) == expected
+
+
+def test_ensure_sorted():
+    items = [(1, 'a'), (1, 'b'), (2, 'c')]
+    assert list(ensure_sorted(items, key, 'items')) == items
+    with pytest.raises(ValueError, match='items is not sorted: item 1'):
+        list(ensure_sorted([(2, 'a'), (1, 'b')], key, 'items'))
@@ -0,0 +1,93 @@
+import json
+import time
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+
+from bitshares_tradehistory_analyzer.multi_wrapper import MultiWrapper
+
+
+class MockResponse:
+    def __init__(self, data):
+        self.data = data
+        self.content = json.dumps(data).encode()
+
+    def json(self):
+        return self.data
+
+    def raise_for_status(self):
+        return None
+
+
+@pytest.fixture()
+def endpoints(monkeypatch):
+    """Fake endpoints: url -> response function"""
+    handlers = {}
+
+    def get(url, params=None, timeout=None):
+        for base_url, handler in handlers.items():
+            if url.startswith(base_url):
+                return handler()
+        raise requests.exceptions.ConnectionError(url)
+
+    monkeypatch.setattr(requests.Session, 'get', MagicMock(side_effect=get))
+    return handlers
+
+
+def test_failover(endpoints):
+    endpoints['https://a.example.com/'] = MagicMock(side_effect=requests.exceptions.ConnectionError())
+    endpoints['https://b.example.com/'] = lambda: MockResponse(['b'])
+    wrapper = MultiWrapper(['https://a.example.com/', 'https://b.example.com/'], '1.2.222', max_retries=0)
+
+    assert wrapper.get_trades() == ['b']
+    assert wrapper.stats.retries == 1
+    assert [endpoint.url for endpoint in wrapper.ranked_endpoints()] == [
+        'https://b.example.com/',
+        'https://a.example.com/',
+    ]
+    assert wrapper.get_trades() == ['b']
+
+
+def test_all_endpoints_failed(endpoints):
+    wrapper = MultiWrapper(['https://a.example.com/', 'https://b.example.com/'], '1.2.222', max_retries=0)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        wrapper.get_trades()
+
+
+def test_hedged_request(endpoints):
+    slow = [False]
+
+    def slow_handler():
+        if slow[0]:
+            time.sleep(0.5)
+        return MockResponse(['a'])
+
+    endpoints['https://a.example.com/'] = slow_handler
+    endpoints['https://b.example.com/'] = lambda: MockResponse(['b'])
+    wrapper = MultiWrapper(
+        ['https://a.example.com/', 'https://b.example.com/'], '1.2.222', hedge_percentile=90, hedge_min_requests=3
+    )
+    endpoint_a, endpoint_b = wrapper.endpoints
+    for latency in (0.01, 0.01, 0.02):
+        endpoint_a.get_wrapper().stats.add(latency)
+    for latency in (0.1, 0.1, 0.1):
+        endpoint_b.get_wrapper().stats.add(latency)
+    assert wrapper.ranked_endpoints()[0] is endpoint_a
+
+    slow[0] = True
+    start = time.monotonic()
+    assert wrapper.get_trades() == ['b']
+    assert time.monotonic() - start < 0.4
+
+
+def test_close(endpoints):
+    endpoints['https://a.example.com/'] = lambda: MockResponse(['a'])
+    wrapper = MultiWrapper(['https://a.example.com/', 'https://b.example.com/'], '1.2.222')
+    assert wrapper.get_trades() == ['a']
+    session_close = MagicMock()
+    wrapper.session.close = session_close
+    wrapper.close()
+    session_close.assert_called_once_with()
+    with pytest.raises(RuntimeError, match='shutdown'):
+        wrapper.get_trades()
@@ -0,0 +1,95 @@
+import json
+import logging
+import os
+
+import pytest
+
+from bitshares_tradehistory_analyzer.page_parser import PAGE_PARSERS, ProcessParser
+from bitshares_tradehistory_analyzer.parser import Parser
+
+ASSETS = [
+    {'id': '1.3.0', 'symbol': 'BTS', 'precision': 5},
+    {'id': '1.3.562', 'symbol': 'OPEN.BTC', 'precision': 8},
+    {'id': '1.3.1325', 'symbol': 'RUDEX.GOLOS', 'precision': 3},
+    {'id': '1.3.1621', 'symbol': 'RUDEX.KRM', 'precision': 8},
+    {'id': '1.3.2635', 'symbol': 'ZEPH', 'precision': 5},
+]
+
+
+def load_entries(name):
+    with open('tests/fixture_data/{}.json'.format(name)) as fd:
+        entries = json.load(fd)
+    # Some fixtures contain single entry
+    return entries if isinstance(entries, list) else [entries]
+
+
+@pytest.fixture()
+def parser():
+    # The last asset is unknown at workers start
+    snapshot = {'account': {'id': '1.2.100678', 'name': 'aleks'}, 'assets': ASSETS[:-1], 'accounts': []}
+    return Parser.from_snapshot_data(snapshot)
+
+
+@pytest.mark.parametrize(
+    'kind, names',
+    [
+        ('trades', ['trade', 'trade_null_op_object'] * 5),
+        ('transfers', ['transfer', 'transfer_null_op_object', 'transfer']),
+    ],
+)
+def test_process_parser_is_identical(parser, kind, names):
+    process_parser = ProcessParser(parser, workers=2)
+    parser.assets.load(ASSETS[-1:])
+    pages = [load_entries(name) for name in names]
+    try:
+        result = list(process_parser.imap(kind, pages))
+    finally:
+        process_parser.close()
+    assert result == [PAGE_PARSERS[kind](parser, page) for page in pages]
+
+
+def test_process_parser_sends_learned_assets_until_workers_have_them(parser):
+    process_parser = ProcessParser(parser, workers=1)
+    sent = []
+    submit = process_parser.executor.submit
+
+    def record_submit(func, kind, entries, learned_from, assets):
+        sent.append((learned_from, len(assets)))
+        return submit(func, kind, entries, learned_from, assets)
+
+    process_parser.executor.submit = record_submit
+    # Trade page references asset unknown to worker, so main process learns it
+    process_parser._learned = [ASSETS[-1]]
+    pages = [load_entries('trade')] * 4
+    try:
+        list(process_parser.imap('trades', pages))
+        list(process_parser.imap('trades', pages))
+    finally:
+        process_parser.close()
+    assert sent[0] == (0, 1)
+    # Once worker reported the asset, it's not sent anymore
+    assert sent[-1] == (1, 0)
+
+
+def test_process_parser_logs_in_main_process(parser, caplog):
+    caplog.set_level(logging.INFO, logger='bitshares_tradehistory_analyzer')
+    process_parser = ProcessParser(parser, workers=1)
+    try:
+        list(process_parser.imap('transfers', [load_entries('transfer')]))
+    finally:
+        process_parser.close()
+    records = [record for record in caplog.records if record.getMessage().startswith('Transfer: ')]
+    assert records
+    # Page is parsed by worker
+    assert all(record.process != os.getpid() for record in records)
+
+
+def test_process_parser_learns_only_page_assets(parser):
+    process_parser = ProcessParser(parser, workers=1)
+    unrelated = {'id': '1.3.1', 'symbol': 'UNRELATED', 'precision': 4}
+    parser.assets.load(ASSETS[-1:] + [unrelated])
+    try:
+        list(process_parser.imap('transfers', [load_entries('transfer_null_op_object')]))
+    finally:
+        process_parser.close()
+    assert process_parser._learned == ASSETS[-1:]
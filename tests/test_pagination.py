@@ -0,0 +1,74 @@
+from bitshares_tradehistory_analyzer.pagination import HistoryCursor, PageSizer, SequenceCursor
+
+
+def make_entry(sequence, block_time):
+    return {
+        'account_history': {'operation_id': '1.11.{}'.format(1000 + sequence), 'sequence': sequence},
+        'block_data': {'block_time': block_time},
+    }
+
+
+def op_ids(entries):
+    return [entry['account_history']['operation_id'] for entry in entries]
+
+
+def test_history_cursor_skips_until_last_op():
+    cursor = HistoryCursor('2020-01-01T00:00:00', last_op_id='1.11.1002')
+    page = [make_entry(1, '2020-01-01T00:00:00'), make_entry(2, '2020-01-01T00:00:00'), make_entry(3, '2020-01-02')]
+    assert op_ids(cursor.consume(page)) == ['1.11.1003']
+    assert cursor.params() == {'from_date': '2020-01-02'}
+    assert cursor.last_op_id == '1.11.1003'
+
+
+def test_history_cursor_keeps_last_op_until_found():
+    cursor = HistoryCursor('2020-01-01T00:00:00', last_op_id='1.11.1003')
+    page = [make_entry(1, '2020-01-01T00:00:00'), make_entry(2, '2020-01-01T00:00:00')]
+    assert cursor.consume(page) == []
+    assert cursor.last_op_id == '1.11.1003'
+    page.append(make_entry(3, '2020-01-01T00:00:00'))
+    page.append(make_entry(4, '2020-01-01T00:00:00'))
+    assert op_ids(cursor.consume(page)) == ['1.11.1004']
+    assert cursor.last_op_id == '1.11.1004'
+
+
+def test_page_sizer_grows_in_busy_block():
+    cursor = HistoryCursor('2020-01-01')
+    sizer = PageSizer(lambda: 2, cursor)
+    busy_page = [make_entry(1, '2020-01-02'), make_entry(2, '2020-01-02')]
+    cursor.consume(busy_page)
+    assert sizer.next_size(2, busy_page) == 2
+    # Full page without new entries
+    assert sizer.next_size(2, cursor.consume(busy_page)) == 4
+    new_entries = cursor.consume(busy_page + [make_entry(3, '2020-01-02'), make_entry(4, '2020-01-02')])
+    assert sizer.next_size(4, new_entries) == 4
+    # Busy block is passed
+    assert sizer.next_size(4, cursor.consume([make_entry(4, '2020-01-02'), make_entry(5, '2020-01-03')])) == 2
+
+
+def test_sequence_cursor_offset():
+    cursor = SequenceCursor('2010-10-10')
+    page = [make_entry(1, '2020-01-01'), make_entry(2, '2020-01-02'), make_entry(3, '2020-01-02')]
+    assert op_ids(cursor.consume(page)) == op_ids(page)
+    assert cursor.params() == {'from_date': '2020-01-02', 'from_': 2}
+
+    page = [make_entry(4, '2020-01-02'), make_entry(5, '2020-01-02')]
+    assert op_ids(cursor.consume(page)) == op_ids(page)
+    assert cursor.params() == {'from_date': '2020-01-02', 'from_': 4}
+
+
+def test_sequence_cursor_drops_seen_entries():
+    cursor = SequenceCursor('2020-01-02', sequence=3)
+    page = [make_entry(2, '2020-01-02'), make_entry(3, '2020-01-02'), make_entry(4, '2020-01-02')]
+    assert op_ids(cursor.consume(page)) == ['1.11.1004']
+    assert cursor.sequence == 4
+
+
+def test_sequence_cursor_continue_from_op_id():
+    cursor = SequenceCursor('2020-01-02', last_op_id='1.11.1003')
+    page = [make_entry(2, '2020-01-02'), make_entry(3, '2020-01-02')]
+    assert cursor.consume(page) == []
+    assert cursor.sequence == 3
+    assert cursor.params() == {'from_date': '2020-01-02', 'from_': 2}
+
+    page = [make_entry(4, '2020-01-02')]
+    assert op_ids(cursor.consume(page)) == ['1.11.1004']
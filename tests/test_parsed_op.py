@@ -0,0 +1,35 @@
+import pickle
+from decimal import Decimal
+
+from bitshares_tradehistory_analyzer.consts import HEADER
+from bitshares_tradehistory_analyzer.parsed_op import ParsedOp
+
+
+def test_to_csv_line():
+    parsed_op = ParsedOp(
+        kind='Trade',
+        date='2019-01-02T03:04:05',
+        buy_cur='USD',
+        buy_amount=Decimal('1.2300'),
+        sell_cur='BTS',
+        sell_amount=Decimal('10.00000'),
+        fee_cur='USD',
+        fee_amount=Decimal('0.0010'),
+        comment='1.11.1 1.11.2',
+        order_id='1.7.1',
+    )
+    line = parsed_op.to_csv_line()
+    assert line == 'Trade,2019-01-02T03:04:05,USD,1.2300,BTS,10.00000,USD,0.0010,Bitshares,-1,1.11.1 1.11.2\n'
+    assert len(line.split(',')) == len(HEADER.split(','))
+
+
+def test_defaults():
+    parsed_op = ParsedOp(kind='Deposit', buy_cur='BTS', buy_amount=950.0)
+    assert parsed_op.to_csv_line() == 'Deposit,,BTS,950.0,,0,,0,Bitshares,-1,\n'
+    assert parsed_op.as_dict()['order_id'] == ''
+
+
+def test_pickle():
+    parsed_op = ParsedOp(kind='Trade', sell_amount=Decimal('1.5'), price=Decimal('2'))
+    assert pickle.loads(pickle.dumps(parsed_op)) == parsed_op
+    assert parsed_op != ParsedOp(kind='Trade')
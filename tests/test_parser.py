@@ -1,8 +1,11 @@
 import json
+import logging
+from decimal import Decimal
 
 import pytest
 
-from bitshares_tradehistory_analyzer.parser import Parser, UnsupportedSettleEntry
+from bitshares_tradehistory_analyzer import json_decoder
+from bitshares_tradehistory_analyzer.parser import Parser, UnsupportedSettleEntry, collect_object_ids
 
 
 def load_full_json(filename):
@@ -67,18 +70,18 @@ def settlement_gs_entry_old_style():
 
 def test_parse_transfer_entry(parser, transfer_entry, transfer_entry_null_op_object):
     data = parser.parse_transfer_entry(transfer_entry)
-    assert data['buy_amount'] > 0
+    assert data.buy_amount > 0
 
     data = parser.parse_transfer_entry(transfer_entry_null_op_object)
-    assert data['buy_amount'] > 0
+    assert data.buy_amount > 0
 
 
 def test_parse_trade_entry(parser, trade_entry, trade_entry_null_op_object):
     data = parser.parse_trade_entry(trade_entry)
-    assert data['buy_amount'] > 0
+    assert data.buy_amount > 0
 
     data = parser.parse_trade_entry(trade_entry_null_op_object)
-    assert data['buy_amount'] > 0
+    assert data.buy_amount > 0
 
 
 def test_parse_regular_settle_entry(parser, settlement_regular_entry):
@@ -93,11 +96,90 @@ def test_parse_regular_settle_entry_new_style(parser, settlement_regular_entry_n
 
 def test_parse_gs_settle_entry_old(parser, settlement_gs_entry_old_style):
     data = parser.parse_settle_entry(settlement_gs_entry_old_style)
-    assert data['buy_amount'] > 0
-    assert data['sell_amount'] > 0
+    assert data.buy_amount > 0
+    assert data.sell_amount > 0
 
 
 def test_parse_gs_settle_entry_new(parser, settlement_gs_entry_new_style):
     data = parser.parse_settle_entry(settlement_gs_entry_new_style)
-    assert data['buy_amount'] > 0
-    assert data['sell_amount'] > 0
+    assert data.buy_amount > 0
+    assert data.sell_amount > 0
+
+
+def test_collect_object_ids(trade_entry, transfer_entry):
+    asset_ids = set()
+    account_ids = set()
+    collect_object_ids(trade_entry['operation_history']['op_object'], asset_ids, account_ids)
+    assert asset_ids == {'1.3.0', '1.3.562'}
+    assert account_ids == set()
+    collect_object_ids(transfer_entry['operation_history']['op_object'], asset_ids, account_ids)
+    assert len(account_ids) == 2
+
+
+def test_parse_transfer_entry_direction(parser, transfer_entry, caplog):
+    caplog.set_level(logging.WARNING, logger='bitshares_tradehistory_analyzer.parser')
+    op = transfer_entry['operation_history']['op_object']
+    op['from'] = parser.account['id']
+    lookups = parser.accounts.lookups
+    data = parser.parse_transfer_entry(transfer_entry)
+    assert data.kind == 'Withdrawal'
+
+    op['from'], op['to'] = op['to'], op['from']
+    data = parser.parse_transfer_entry(transfer_entry)
+    assert data.kind == 'Deposit'
+    # Account names are not needed without logging
+    assert parser.accounts.lookups == lookups
+
+
+@pytest.fixture()
+def snapshot_file(tmp_path):
+    snapshot = {
+        'account': {'id': '1.2.100678', 'name': 'aleks'},
+        'assets': [
+            {'id': '1.3.0', 'symbol': 'BTS', 'precision': 5},
+            {'id': '1.3.562', 'symbol': 'OPEN.BTC', 'precision': 8},
+        ],
+        'accounts': [{'id': '1.2.100678', 'name': 'aleks'}],
+    }
+    filename = str(tmp_path / 'snapshot.json')
+    with open(filename, 'w') as fd:
+        json.dump(snapshot, fd)
+    return filename
+
+
+def test_offline_parser(snapshot_file, tmp_path, trade_entry, transfer_entry):
+    parser = Parser.from_snapshot(snapshot_file)
+
+    data = parser.parse_trade_entry(trade_entry)
+    assert data.sell_cur == 'BTS'
+    assert data.buy_cur == 'OPEN.BTC'
+    assert data.buy_amount == Decimal('0.27372728')
+
+    data = parser.parse_transfer_entry(transfer_entry)
+    assert data.kind == 'Deposit'
+    assert data.buy_amount == 950.0
+
+    exported = str(tmp_path / 'exported.json')
+    parser.export_snapshot(exported)
+    assert load_full_json(exported) == load_full_json(snapshot_file)
+
+
+def test_offline_parser_unknown_asset(snapshot_file, trade_entry):
+    parser = Parser.from_snapshot(snapshot_file)
+    trade_entry['operation_history']['op_object']['receives']['asset_id'] = '1.3.1'
+    with pytest.raises(KeyError):
+        parser.parse_trade_entry(trade_entry)
+
+
+def test_offline_parser_decodes_entry_once(snapshot_file, trade_entry, monkeypatch):
+    parser = Parser.from_snapshot(snapshot_file)
+    asset_ids = set()
+    parser.collect_ids([trade_entry], asset_ids)
+    assert asset_ids == {'1.3.0', '1.3.562'}
+
+    def fail(data):
+        raise AssertionError('Entry is decoded again')
+
+    monkeypatch.setattr(json_decoder, 'loads', fail)
+    data = parser.parse_trade_entry(trade_entry)
+    assert data.buy_amount == Decimal('0.27372728')
@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+
+from bitshares_tradehistory_analyzer.pipeline import Pipeline, Stage
+
+
+def test_stage_order_and_finish():
+    stage = Stage('double', range(10), func=lambda x: x * 2, finish=lambda: 'end')
+    assert list(stage) == [x * 2 for x in range(10)] + ['end']
+    assert stage.stats.items == 10
+
+
+def test_stage_error_propagated():
+    def source():
+        yield 1
+        raise ValueError('broken page')
+
+    stage = Stage('fetch', source())
+    items = iter(stage)
+    assert next(items) == 1
+    with pytest.raises(ValueError, match='broken page'):
+        next(items)
+
+
+def test_stages_overlap():
+    """Next item is fetched while the current one is processed downstream"""
+    fetched = []
+    second_fetched = threading.Event()
+
+    def source():
+        for item in range(3):
+            fetched.append(item)
+            if item == 1:
+                second_fetched.set()
+            yield item
+
+    def process(item):
+        if item == 0:
+            assert second_fetched.wait(timeout=5)
+        return item
+
+    pipeline = Pipeline('test', maxsize=1)
+    stage = pipeline.stage('process', pipeline.stage('fetch', source()), process)
+    written = []
+    pipeline.run('write', stage, written.append)
+    assert written == [0, 1, 2]
+    assert [stage.stats.items for stage in pipeline.stages] == [3, 3]
+    assert pipeline.sink.items == 3
+    assert 'process: 3 items' in str(pipeline)
+
+
+def test_stage_close():
+    stage = Stage('fetch', iter(range(1000)), maxsize=1)
+    for item in stage:
+        if item == 2:
+            break
+    stage._thread.join(timeout=5)
+    assert not stage._thread.is_alive()
+    assert stage.stats.items < 1000
@@ -0,0 +1,34 @@
+import pytest
+
+from bitshares_tradehistory_analyzer import rate_limiter
+from bitshares_tradehistory_analyzer.rate_limiter import TokenBucket, get_rate_limiter
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(rate_limiter.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_token_bucket_reserve(clock):
+    bucket = TokenBucket(rate=2, burst=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.5)
+    # Next caller is queued after the previous one
+    assert bucket.reserve() == pytest.approx(1)
+
+    clock[0] += 10
+    assert bucket.reserve() == 0
+
+
+def test_token_bucket_invalid_rate():
+    with pytest.raises(ValueError, match='Rate must be positive'):
+        TokenBucket(rate=0)
+
+
+def test_rate_limiter_shared_per_url():
+    limiter = get_rate_limiter('https://example.com/', 5)
+    assert get_rate_limiter('https://example.com/', 5) is limiter
+    assert get_rate_limiter('https://example.org/', 5) is not limiter
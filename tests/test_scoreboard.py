@@ -0,0 +1,54 @@
+from unittest.mock import MagicMock
+
+import requests
+
+from bitshares_tradehistory_analyzer.scoreboard import (
+    WrapperScore,
+    load_scoreboard,
+    probe_wrappers,
+    rank_wrappers,
+    save_scoreboard,
+)
+
+
+class MockResponseGood:
+    content = b'[]'
+
+    @staticmethod
+    def json():
+        return []
+
+    def raise_for_status(self):
+        return None
+
+
+def mock_get(url, **kwargs):
+    if url.startswith('https://dead.example.com'):
+        raise requests.exceptions.ConnectionError()
+    return MockResponseGood()
+
+
+def test_probe_wrappers(monkeypatch):
+    get = MagicMock(side_effect=mock_get)
+    monkeypatch.setattr(requests.Session, 'get', get)
+    scores = probe_wrappers(['https://dead.example.com/', 'https://alive.example.com/'], probes=3)
+    assert [score.url for score in scores] == ['https://alive.example.com/', 'https://dead.example.com/']
+    alive, dead = scores
+    assert alive.alive and alive.version == 1
+    # Version detection plus probes
+    assert alive.requests == 4
+    assert alive.p50 is not None and alive.p95 is not None
+    assert not dead.alive and dead.p50 is None
+
+
+def test_scoreboard_roundtrip(tmp_path):
+    scores = [
+        WrapperScore(url='https://slow.example.com/', alive=True, version=2, p50=1.5, p95=3.0),
+        WrapperScore(url='https://dead.example.com/', alive=False),
+        WrapperScore(url='https://fast.example.com/', alive=True, version=1, p50=0.2, p95=0.4),
+    ]
+    filename = str(tmp_path / 'scoreboard.json')
+    save_scoreboard(filename, scores)
+    loaded = load_scoreboard(filename)
+    assert loaded == scores
+    assert rank_wrappers(loaded) == ['https://fast.example.com/', 'https://slow.example.com/']
@@ -0,0 +1,170 @@
+import random
+from decimal import Decimal, localcontext
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bitshares_tradehistory_analyzer.trade_table import (
+    AMOUNT_COLUMNS,
+    CODE_COLUMNS,
+    TradeTable,
+    join_decimal,
+    split_decimal,
+    sum_decimals,
+)
+
+
+def make_trade(dtime, kind='Trade', buycur='BTC', buyval='0.1', sellcur='USD', sellval='3000.00', comment='1.11.1'):
+    return SimpleNamespace(
+        kind=kind,
+        dtime=pd.Timestamp(dtime, tz='UTC'),
+        buycur=buycur,
+        buyval=Decimal(buyval),
+        sellcur=sellcur,
+        sellval=Decimal(sellval),
+        feecur=buycur,
+        feeval=0,
+        exchange='Bitshares',
+        mark='-1',
+        comment=comment,
+    )
+
+
+@pytest.fixture()
+def trades():
+    return [
+        make_trade('2021-01-01', kind='Deposit', buyval='10000', sellcur=None, sellval='0', comment='1.11.1'),
+        make_trade('2021-01-02 12:34:56', buyval='0.12345678', sellval='3000.0', comment='1.11.2'),
+        make_trade('2021-01-03', buycur='USD', buyval='6000.10', sellcur='BTC', sellval='1E+2', comment='1.11.3'),
+    ]
+
+
+@pytest.mark.parametrize(
+    'value', ['0', '0.000', '1.50', '-12.345', '1E+3', '0.30000000000000004', '9223372036854775807']
+)
+def test_split_join_decimal(value):
+    mantissa, exponent = split_decimal(Decimal(value))
+    restored = join_decimal(mantissa, exponent)
+    assert restored == Decimal(value)
+    assert str(restored) == str(Decimal(value))
+
+
+def test_split_decimal_special():
+    with pytest.raises(ValueError, match='Cannot store NaN'):
+        split_decimal(Decimal('NaN'))
+
+
+def test_rows_same_as_trades(trades):
+    table = TradeTable.from_trades(trades)
+    assert len(table) == len(trades)
+    for trade, row in zip(trades, table):
+        for name in CODE_COLUMNS + AMOUNT_COLUMNS + ('dtime', 'comment'):
+            assert getattr(row, name) == getattr(trade, name)
+        assert str(row.buyval) == str(trade.buyval)
+        assert str(row.sellval) == str(trade.sellval)
+    assert table[-1].comment == '1.11.3'
+    with pytest.raises(IndexError):
+        table[3]
+    with pytest.raises(AttributeError):
+        table[0].price
+
+
+def test_columns(trades):
+    table = TradeTable.from_trades(trades)
+    assert list(table.column('dtime')) == [np.datetime64(trade.dtime.tz_convert(None)) for trade in trades]
+    assert list(table.values_of('buycur')) == ['BTC', 'BTC', 'USD']
+    assert list(table.values_of('sellcur')) == [None, 'USD', 'BTC']
+    assert list(table.column('buycur')) == [table.find_code('BTC')] * 2 + [table.find_code('USD')]
+    assert table.find_code('ETH') is None
+    assert list(table.column('comment')) == ['1.11.1', '1.11.2', '1.11.3']
+
+    mantissas, exponents = table.amounts('buyval')
+    assert mantissas.dtype == np.int64
+    assert list(mantissas) == [10000, 12345678, 600010]
+    assert list(exponents) == [0, -8, -2]
+
+
+def test_interned_values(trades):
+    table = TradeTable.from_trades(trades * 100)
+    assert len(table) == 300
+    assert sorted(map(str, table.values)) == sorted(
+        map(str, ['Deposit', 'Trade', 'BTC', 'USD', None, 'Bitshares', '-1'])
+    )
+    # Much less than a Trade object per row
+    assert table.nbytes <= 80 * len(table)
+
+
+def test_column_copies(trades):
+    table = TradeTable.from_trades(trades[:2])
+    dtimes = table.column('dtime')
+    # Table can grow while column copies are in use
+    table.append(trades[2])
+    assert len(dtimes) == 2
+    assert len(table.column('dtime')) == 3
+
+
+def test_long_amounts(trades):
+    table = TradeTable.from_trades(trades)
+    table.append(make_trade('2021-01-04', buyval='123456789012.34567891', comment='1.11.4'))
+    table.append(make_trade('2021-01-05', buyval='0.5', comment='1.11.5'))
+
+    assert len(table) == 5
+    assert str(table[3].buyval) == '123456789012.34567891'
+    assert str(table[4].buyval) == '0.5'
+    mantissas, exponents = table.amounts('buyval')
+    assert mantissas.dtype == object
+    assert list(mantissas)[3:] == [12345678901234567891, 5]
+    assert table.amounts('sellval')[0].dtype == np.int64
+    groups = np.zeros(len(table), dtype=np.int64)
+    assert sum_decimals(mantissas, exponents, groups, 1) == [sum(trade.buyval for trade in table)]
+
+
+def test_exponent_out_of_range_keeps_table(trades):
+    table = TradeTable.from_trades(trades)
+    with pytest.raises(ValueError, match='buyval'):
+        table.append(make_trade('2021-01-04', buyval='1E-200', buycur='ETH'))
+
+    assert len(table) == 3
+    assert all(len(column) == 3 for column in table._codes.values())
+    assert all(len(column) == 3 for pair in table._amounts.values() for column in pair)
+    assert table.find_code('ETH') is None
+
+
+def sequential_sums(values, groups, n_groups):
+    sums = [Decimal('0')] * n_groups
+    for value, group in zip(values, groups):
+        sums[group] += value
+    return sums
+
+
+def check_sums(values, groups, n_groups):
+    pairs = [split_decimal(value) for value in values]
+    mantissas = np.array([mantissa for mantissa, _ in pairs], dtype=np.int64)
+    exponents = np.array([exponent for _, exponent in pairs], dtype=np.int8)
+    result = sum_decimals(mantissas, exponents, np.array(groups, dtype=np.int64), n_groups)
+    expected = sequential_sums(values, groups, n_groups)
+    assert list(map(str, result)) == list(map(str, expected))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_sum_decimals_same_as_sequential(seed):
+    rnd = random.Random(seed)
+    amounts = ['0', '1', '0.10', '1E+2', '12.3456', '0.30000000000000004', '99999999.99999999', '-0.5']
+    values = [Decimal(rnd.choice(amounts)) for _ in range(200)]
+    groups = [rnd.randrange(4) for _ in values]
+    # The last group is empty
+    check_sums(values, groups, 5)
+
+
+def test_sum_decimals_rounding():
+    # Sum doesn't fit into context precision, so it's rounded the same way as by sequential addition
+    with localcontext() as ctx:
+        ctx.prec = 10
+        check_sums([Decimal('123456789'), Decimal('0.123456789'), Decimal('0.5')], [0, 0, 0], 1)
+
+
+def test_sum_decimals_empty():
+    empty = np.array([], dtype=np.int64)
+    assert sum_decimals(empty, empty.astype(np.int8), empty, 2) == [Decimal('0'), Decimal('0')]
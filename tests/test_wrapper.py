@@ -3,7 +3,8 @@ from unittest.mock import MagicMock
 import pytest
 import requests
 
-from bitshares_tradehistory_analyzer.wrapper import Wrapper
+from bitshares_tradehistory_analyzer import wrapper as wrapper_module
+from bitshares_tradehistory_analyzer.wrapper import PageSizeController, Wrapper
 
 
 @pytest.fixture()
@@ -12,6 +13,8 @@ def working_es_url():
 
 
 class MockResponseGood:
+    content = b'{"foo": "bar"}'
+
     @staticmethod
     def json():
         return {'foo': 'bar'}
@@ -26,18 +29,56 @@ class MockResponseBad:
         raise requests.exceptions.HTTPError('error', response=self)
 
 
+class MockResponseServerError:
+    def raise_for_status(self):
+        self.status_code = 502
+        raise requests.exceptions.HTTPError('error', response=self)
+
+
 def test_version_autodetect_1(monkeypatch):
-    monkeypatch.setattr(requests, 'get', MagicMock(return_value=MockResponseGood()))
+    monkeypatch.setattr(requests.Session, 'get', MagicMock(return_value=MockResponseGood()))
     wrapper = Wrapper('https://example.com', '1.2.222')
     assert wrapper.version == 1
 
 
 def test_version_autodetect_2(monkeypatch):
-    monkeypatch.setattr(requests, 'get', MagicMock(return_value=MockResponseBad()))
+    monkeypatch.setattr(requests.Session, 'get', MagicMock(return_value=MockResponseBad()))
     wrapper = Wrapper('https://example.com', '1.2.222')
     assert wrapper.version == 2
 
 
+def test_session_reused(monkeypatch):
+    get = MagicMock(return_value=MockResponseGood())
+    monkeypatch.setattr(requests.Session, 'get', get)
+    wrapper = Wrapper('https://example.com', '1.2.222')
+    session = wrapper.session
+    wrapper.get_trades()
+    wrapper.get_transfers()
+    assert wrapper.session is session
+    assert get.call_count == 3
+    assert wrapper.stats.requests == 3
+    assert wrapper.stats.last is not None
+
+
+def test_retry_on_server_error(monkeypatch):
+    get = MagicMock(side_effect=[MockResponseServerError(), requests.exceptions.ConnectionError(), MockResponseGood()])
+    monkeypatch.setattr(requests.Session, 'get', get)
+    wrapper = Wrapper('https://example.com', '1.2.222', backoff_factor=0)
+    assert wrapper.version == 1
+    assert get.call_count == 3
+    assert wrapper.stats.retries == 2
+    assert wrapper.stats.errors == 2
+
+
+def test_retries_exhausted(monkeypatch):
+    monkeypatch.setattr(requests.Session, 'get', MagicMock(return_value=MockResponseGood()))
+    wrapper = Wrapper('https://example.com', '1.2.222', max_retries=2, backoff_factor=0)
+    monkeypatch.setattr(requests.Session, 'get', MagicMock(return_value=MockResponseServerError()))
+    with pytest.raises(requests.exceptions.HTTPError):
+        wrapper.get_trades()
+    assert wrapper.stats.retries == 2
+
+
 @pytest.mark.vcr()
 def test_is_alive_wrapper_ok():
     assert Wrapper.is_alive_v2("https://api.bitshares.ws/") is True
@@ -80,3 +121,65 @@ def test_get_global_settlements(working_es_url):
     settlements = wrapper.get_global_settlements()
     assert settlements is not None
     assert len(settlements) == 5
+
+
+def test_page_size_controller_grow():
+    controller = PageSizeController(size=100, max_size=300, target_latency=2)
+    controller.observe(100, count=100, latency=0.1, nbytes=1000)
+    assert controller.size == 150
+    controller.observe(150, count=150, latency=0.1, nbytes=1000)
+    controller.observe(225, count=225, latency=0.1, nbytes=1000)
+    assert controller.size == 300
+    # Last page is not full, keep the size
+    controller.observe(300, count=10, latency=0.1, nbytes=1000)
+    assert controller.size == 300
+
+
+def test_page_size_controller_shrink():
+    controller = PageSizeController(size=100, min_size=30, target_latency=2, max_bytes=10000)
+    controller.observe(100, count=100, latency=3, nbytes=1000)
+    assert controller.size == 50
+    controller.observe(50, count=50, latency=0.1, nbytes=20000)
+    assert controller.size == 30
+    controller = PageSizeController(size=100, min_size=30)
+    controller.observe(100, count=0, latency=0.1, nbytes=0, error=True)
+    assert controller.size == 50
+
+
+def test_adaptive_page_size(monkeypatch):
+    monkeypatch.setattr(requests.Session, 'get', MagicMock(return_value=MockResponseGood()))
+    wrapper = Wrapper('https://example.com', '1.2.222', size=100, adaptive_size={'max_size': 1000})
+    assert wrapper.page_size() == 100
+    wrapper.size_controller.observe(100, count=100, latency=0.1, nbytes=1000)
+    assert wrapper.page_size() == 150
+    wrapper.get_trades(size=wrapper.page_size())
+    assert requests.Session.get.call_args.kwargs['params']['size'] == 150
+
+
+def test_rate_limit_per_url(monkeypatch):
+    monkeypatch.setattr(requests.Session, 'get', MagicMock(return_value=MockResponseGood()))
+    rate_limits = {'https://example.org': 10}
+    wrapper1 = Wrapper('https://example.com', '1.2.222', rate_limit=100, rate_limits=rate_limits)
+    wrapper2 = Wrapper('https://example.com', '1.2.333', rate_limit=100, rate_limits=rate_limits)
+    wrapper3 = Wrapper('https://example.org', '1.2.222', rate_limit=100, rate_limits=rate_limits)
+    assert wrapper1.rate_limiter is wrapper2.rate_limiter
+    assert wrapper3.rate_limiter.rate == 10
+    assert Wrapper('https://example.com', '1.2.222', rate_limit=0).rate_limiter is None
+    assert Wrapper('https://example.org', '1.2.222', rate_limits={'https://example.org': 0}).rate_limiter is None
+
+
+def test_default_rate_limit(monkeypatch):
+    monkeypatch.setattr(requests.Session, 'get', MagicMock(return_value=MockResponseGood()))
+    # Disabled for other tests in conftest.py
+    monkeypatch.setattr(wrapper_module, 'DEFAULT_RATE_LIMIT', 1.0)
+    assert Wrapper('https://example.net', '1.2.222').rate_limiter.rate == 1.0
+    assert Wrapper('https://example.info', '1.2.222', rate_limit=None).rate_limiter.rate == 1.0
+
+
+def test_close_keeps_shared_session(monkeypatch):
+    monkeypatch.setattr(requests.Session, 'get', MagicMock(return_value=MockResponseGood()))
+    monkeypatch.setattr(requests.Session, 'close', MagicMock())
+    Wrapper('https://example.com', '1.2.222', session=requests.Session()).close()
+    requests.Session.close.assert_not_called()
+    Wrapper('https://example.com', '1.2.222').close()
+    requests.Session.close.assert_called_once_with()